@@ -1,11 +1,18 @@
-from flask import Flask, redirect, request, session, jsonify
-from oauth import get_flow, get_credentials, get_user_data
+from flask import Flask, Response, redirect, request, session, jsonify, stream_with_context
+from oauth import get_flow, get_credentials, get_user_data, get_user_data_with_report
 from models import User
-from db_utils import get_suggestions, send_user, get_users_with_same_assignment, create_user, fetch_user_free_times_before_due
+from db_utils import get_suggestions, get_suggestions_for_email, get_batch_suggestions, send_user, get_users_with_same_assignment, create_user, fetch_user_free_times_before_due, get_cohort_overlap_matrix, get_study_groups
 from oauth import get_user_data
+from store import get_store
+from client_cache import client_cache
+from calendar_fetch import FetchResult
+from scheduler import suggestion_scheduler
+from retention import RETENTION_GRACE_HOURS, retention_job, run_retention
 from flask_cors import CORS
+import metrics
 import json
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 import os
 
 app = Flask(__name__)
@@ -13,7 +20,10 @@ app.secret_key = "dev-key"
 
 # Update to use HTTP for local development
 FRONTEND_URL = ["http://localhost:3000", "http://127.0.0.1:3000"]
+# Required in the X-Admin-Token header of /api/admin routes and /api/suggestions/batch; unset disables them
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
 CORS(app, supports_credentials=True, origins=FRONTEND_URL)
+metrics.init_app(app)
 
 @app.route("/")
 def index():
@@ -42,8 +52,10 @@ def oauth2callback():
     }
     
     # Get user data from Google
-    user = get_user_data(creds)
-    send_user(user)
+    user, fetched = get_user_data_with_report(creds)
+    session["user_email"] = user.email
+    client_cache.put_credentials(user.email, creds)
+    save_user(user, fetched)
     
     # Redirect back to frontend with success
     return redirect(f"{FRONTEND_URL[0]}/?auth=success")
@@ -54,31 +66,73 @@ def get_current_user():
         print("Attempting to get credentials...")
         creds = get_credentials()
         print("Got credentials, getting user data...")
-        user = get_user_data(creds)
+        user, fetched = get_user_data_with_report(creds)
         print(f"Got user data: {user.name}, {user.email}")
-        
-        response_data = {
-            "name": user.name,
-            "email": user.email,
-            "assignments": [{"title": a['title'], "due": a['due'].isoformat()} for a in user.assignments],
-            "free_time": [{"start": t['start'].isoformat(), "end": t['end'].isoformat()} for t in user.free_time]
-        }
-        print(f"Sending response: {response_data}")
-        return jsonify(response_data)
+        return jsonify(current_user_payload(user, fetched))
     except Exception as e:
         print(f"Error in get_current_user: {str(e)}")
         return jsonify({"error": str(e)}), 401
 
+def current_user_payload(user: User, fetched: FetchResult) -> Dict[str, Any]:
+    response_data = {
+        "name": user.name,
+        "email": user.email,
+        "assignments": [{"title": a.title, "due": a.due.isoformat()} for a in user.assignments],
+        "free_time": [t.to_dict() for t in user.free_time]
+    }
+    if not fetched.complete:
+        response_data["calendar_sync"] = fetched.report()
+    return response_data
+
+def save_user(user: User, fetched: FetchResult) -> None:
+    if not fetched.complete:
+        # A calendar that failed adds no busy time, so the free time and
+        # template built without it would show the user as free; keep the stored ones
+        print(f"⚠️ Keeping stored free time for {user.email}: {fetched.report()}")
+        user = User(user.name, user.email, user.assignments)
+    send_user(user)
+
+def fresh_suggestions(user: User, fetched: FetchResult) -> List[Dict[str, Any]]:
+    # A partial fetch may have missed assignments; the stored user has every one seen so far
+    if not fetched.complete:
+        suggestions = get_suggestions_for_email(user.email)
+        if suggestions is not None:
+            return suggestions
+    return get_suggestions(user)
+
+def precomputed_suggestions() -> Optional[List[Dict[str, Any]]]:
+    # With the background scheduler running, stored users are served from
+    # the precomputed suggestion cache without a round trip to Google
+    email = session.get("user_email")
+    if suggestion_scheduler.running and email:
+        return get_suggestions_for_email(email)
+    return None
+
 @app.route("/api/suggestions", methods=["POST"])
 def get_suggestions_endpoint():
     try:
         creds = get_credentials()
-        user = get_user_data(creds)
-        suggestions = get_suggestions(user)
+        suggestions = precomputed_suggestions()
+        if suggestions is not None:
+            return jsonify({"suggestions": suggestions})
+        user, fetched = get_user_data_with_report(creds)
+        suggestions = fresh_suggestions(user, fetched)
         return jsonify({"suggestions": suggestions})
     except Exception as e:
         return jsonify({"error": str(e)}), 401
 
+@app.route("/api/suggestions/batch", methods=["POST"])
+def get_batch_suggestions_endpoint():
+    # Returns other users' emails and schedules, so only admins may ask
+    denied = admin_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    emails = data.get("emails", "all")
+    if emails != "all" and not (isinstance(emails, list) and all(isinstance(e, str) for e in emails)):
+        return jsonify({"error": "emails must be a list of addresses or \"all\""}), 400
+    return jsonify({"suggestions": get_batch_suggestions(emails)})
+
 @app.route("/api/user", methods=["POST"])
 def create_user_endpoint():
     data = request.get_json()
@@ -94,25 +148,128 @@ def create_user_endpoint():
     create_user(name, email)
     return f"✅ User {name} saved to local storage!"
 
+# Assignments per NDJSON page when the client doesn't ask for a limit
+ASSIGNMENT_PAGE_SIZE = 500
+
+def _etag(store, version: int, variant: str = "") -> str:
+    return f"{store.instance}-{version}{variant}"
+
+def _not_modified(etag: str) -> Optional[Response]:
+    if etag in request.if_none_match:
+        return _cacheable(Response(status=304), etag)
+    return None
+
+def _cacheable(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    # Let browsers keep the body but always revalidate it
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @app.route("/api/user/<email>", methods=["GET"])
 def get_user_endpoint(email):
-    try:
-        with open("data.json", "r") as f:
-            data = json.load(f)
-            if email in data["users"]:
-                return jsonify(data["users"][email])
-            return jsonify({"error": "User not found"}), 404
-    except FileNotFoundError:
-        return jsonify({"error": "No users found"}), 404
+    store = get_store()
+    store.sync()
+    etag = _etag(store, store.user_version(email))
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    user = store.get_user(email)
+    if user:
+        return _cacheable(jsonify(user), etag)
+    return jsonify({"error": "User not found"}), 404
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route("/api/assignments", methods=["GET"])
 def get_assignments_endpoint():
+    """All assignments as one JSON object, or one page of NDJSON lines.
+
+    NDJSON is chosen with ?format=ndjson or Accept: application/x-ndjson and
+    paged with ?offset= and ?limit=; X-Next-Offset is set while more remain.
+    """
+    store = get_store()
+    # Versions only cover what this process has seen; catch up with other workers first
+    store.sync()
+    ndjson = (request.args.get("format") == "ndjson" or
+              request.accept_mimetypes.best == "application/x-ndjson")
+    if not ndjson:
+        etag = _etag(store, store.version)
+        return _not_modified(etag) or _cacheable(jsonify(store.get_assignments()), etag)
+
     try:
-        with open("data.json", "r") as f:
-            data = json.load(f)
-            return jsonify(data["assignments"])
-    except FileNotFoundError:
-        return jsonify({"assignments": {}})
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = max(1, int(request.args.get("limit", ASSIGNMENT_PAGE_SIZE)))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    etag = _etag(store, store.version, f"-nd-{offset}-{limit}")
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    # One extra row tells whether another page follows
+    page = store.get_assignment_page(offset, limit + 1)
+    more = len(page) > limit
+
+    def lines():
+        for assignment_id, assignment in page[:limit]:
+            yield json.dumps({"id": assignment_id, **assignment}) + "\n"
+
+    response = Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+    if more:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return _cacheable(response, etag)
+
+@app.route("/api/assignments/<assignment_id>/overlaps", methods=["GET"])
+def get_assignment_overlaps_endpoint(assignment_id):
+    include_overlaps = request.args.get("include_overlaps", "").lower() in ("1", "true", "yes")
+    result = get_cohort_overlap_matrix(assignment_id, include_overlaps)
+    if result is None:
+        return jsonify({"error": "Assignment not found"}), 404
+    return jsonify(result)
+
+@app.route("/api/assignments/<assignment_id>/groups", methods=["GET"])
+def get_assignment_groups_endpoint(assignment_id):
+    """Disjoint study groups for the assignment's cohort, longest shared window first.
+
+    ?size=, ?min_size= and ?max_size= bound the group sizes, ?max_groups=
+    stops early and ?min_duration= (minutes) drops shorter windows.
+    """
+    options: Dict[str, Any] = {}
+    try:
+        for name in ("size", "min_size", "max_size", "max_groups"):
+            if name in request.args:
+                options[name] = int(request.args[name])
+        min_duration_minutes = max(0, int(request.args.get("min_duration", 0)))
+    except ValueError:
+        return jsonify({"error": "size, min_size, max_size, max_groups and min_duration must be integers"}), 400
+    try:
+        result = get_study_groups(assignment_id, min_duration_minutes, **options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if result is None:
+        return jsonify({"error": "Assignment not found"}), 404
+    return jsonify(result)
+
+def admin_denied():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled; set ADMIN_TOKEN"}), 403
+    if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Invalid admin token"}), 401
+    return None
+
+@app.route("/api/admin/retention", methods=["POST"])
+def retention_endpoint():
+    denied = admin_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    try:
+        grace_hours = float(data.get("grace_hours", RETENTION_GRACE_HOURS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "grace_hours must be a number"}), 400
+    return jsonify(run_retention(grace_hours=grace_hours, dry_run=bool(data.get("dry_run", False))))
 
 # test get users with the same assignment
 @app.route('/who_is_doing')
@@ -196,7 +353,29 @@ def test_suggestions():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def start_background_jobs() -> None:
+    """Start the suggestion scheduler (with SUGGESTION_SCHEDULER=1) and the retention job in this process.
+
+    Suggestions are cached per process, so every server process that
+    serves requests runs its own scheduler.
+    """
+    if os.environ.get("SUGGESTION_SCHEDULER") == "1":
+        suggestion_scheduler.start()
+    retention_job.start()
+
+def stop_background_jobs() -> None:
+    suggestion_scheduler.stop()
+    retention_job.stop()
+
+def create_app() -> Flask:
+    """App factory for WSGI servers, e.g. gunicorn -w 4 "app:create_app()"; runs once per worker."""
+    start_background_jobs()
+    return app
+
 if __name__ == "__main__":
+    # The debug reloader runs this file twice; only its child serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_jobs()
     app.run(debug=True)
 
 
@@ -0,0 +1,141 @@
+"""ASGI entry point that serves the Google-bound routes without blocking a thread.
+
+Run from the backend directory with
+
+    uvicorn asgi:application --workers 2
+
+GET /api/user/current and POST /api/suggestions await Calendar and userinfo
+calls on one pooled httpx client, so a single worker keeps many of them in
+flight while they wait on Google. Every other route is the Flask app, run
+on the default thread pool with its response buffered. Both paths go
+through the app's own before/after request hooks, so sessions, CORS and
+/metrics behave the same. Each worker starts the suggestion scheduler and
+retention job from the lifespan startup event.
+"""
+import asyncio
+import io
+import sys
+from typing import Any, Awaitable, Callable, Dict
+
+from flask import Response, jsonify
+
+import google_async
+from app import (app, current_user_payload, fresh_suggestions, precomputed_suggestions, start_background_jobs,
+                 stop_background_jobs)
+from oauth import get_credentials
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+async def get_current_user():
+    try:
+        # Reads the session and may refresh the token; both block
+        creds = await asyncio.to_thread(get_credentials)
+        user, fetched = await google_async.get_user_data_async(creds)
+        return jsonify(current_user_payload(user, fetched))
+    except Exception as e:
+        print(f"Error in get_current_user: {str(e)}")
+        return jsonify({"error": str(e)}), 401
+
+
+async def get_suggestions_endpoint():
+    try:
+        creds = await asyncio.to_thread(get_credentials)
+        suggestions = await asyncio.to_thread(precomputed_suggestions)
+        if suggestions is None:
+            user, fetched = await google_async.get_user_data_async(creds)
+            suggestions = await asyncio.to_thread(fresh_suggestions, user, fetched)
+        return jsonify({"suggestions": suggestions})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 401
+
+
+ASYNC_ROUTES = {
+    ("GET", "/api/user/current"): get_current_user,
+    ("POST", "/api/suggestions"): get_suggestions_endpoint,
+}
+
+
+def _environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": scope.get("server", ("localhost", 80))[0],
+        "SERVER_PORT": str(scope.get("server", ("localhost", 80))[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        key = name.decode("latin1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = f"HTTP_{key}"
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive: Receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _serve(view, scope: Scope, receive: Receive, send: Send) -> None:
+    environ = _environ(scope, await _read_body(receive))
+    # Flask keeps the request context in a contextvar, so each task sees its own
+    with app.request_context(environ):
+        response = app.preprocess_request()
+        if response is None:
+            response = await view()
+        response = app.process_response(app.make_response(response))
+        await _send(response, send)
+
+
+async def _serve_wsgi(scope: Scope, receive: Receive, send: Send) -> None:
+    environ = _environ(scope, await _read_body(receive))
+    # Not asgiref's WsgiToAsgi: it runs every request on one shared thread
+    response = await asyncio.to_thread(Response.from_app, app, environ, buffered=True)
+    await _send(response, send)
+
+
+async def _send(response: Response, send: Send) -> None:
+    headers = [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in response.headers.items()]
+    await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": response.get_data()})
+
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_background_jobs()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.to_thread(stop_background_jobs)
+            await google_async.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    view = ASYNC_ROUTES.get((scope.get("method"), scope.get("path")))
+    if view is None:
+        await _serve_wsgi(scope, receive, send)
+    else:
+        await _serve(view, scope, receive, send)
@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+from store import add_listener, assignment_id_for, get_store, iso_to_epoch
+
+# Merge near-duplicate assignments into one cohort ("1") or match exact ids only ("0")
+FUZZY_MATCHING = os.environ.get("FUZZY_MATCHING", "1") == "1"
+# Two copies of an assignment may be due this far apart (timezone slips, late uploads)
+DUE_TOLERANCE = int(os.environ.get("ASSIGNMENT_DUE_TOLERANCE_HOURS", "24")) * 3600
+# Trigram Jaccard similarity two normalized titles need to count as the same work
+MATCH_THRESHOLD = 0.8
+
+BUCKET = 86400
+# Course codes Canvas appends, e.g. "[HM CSCI 151.1 SP25]" or "(CS 158)"
+_SUFFIX = re.compile(r"\[[^\]]*\]|\([^)]*\)")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_title(title: str) -> List[str]:
+    """Lowercase word tokens of a title with bracketed course suffixes removed."""
+    return _WORD.findall(_SUFFIX.sub(" ", title.lower()))
+
+
+def trigrams(tokens: List[str]) -> Set[str]:
+    text = f" {' '.join(tokens)} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Entry:
+    __slots__ = ("assignment_id", "due_ts", "tokens", "grams", "numbers")
+
+    def __init__(self, assignment_id: str, due_ts: int, tokens: List[str]) -> None:
+        self.assignment_id = assignment_id
+        self.due_ts = due_ts
+        self.tokens = frozenset(tokens)
+        self.grams = trigrams(tokens)
+        # "Homework 7" and "Homework 8" are never the same work
+        self.numbers = frozenset(t for t in tokens if t.isdigit())
+
+
+class AssignmentIndex:
+    """Inverted index for finding copies of one assignment under different titles.
+
+    Assignments are blocked by (due day, title token): a lookup only scores
+    the assignments that share a word with the query and are due on the same
+    or a neighbouring day, so the cost depends on those posting lists rather
+    than on the number of assignments. Candidates must be due within
+    DUE_TOLERANCE, carry the same numbers and reach MATCH_THRESHOLD on
+    title trigrams.
+
+    A remove_assignment only takes one student out of a cohort, so removed
+    ids are checked against the store on the next lookup and dropped from
+    the index once their cohort is gone.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._blocks: Dict[Tuple[int, str], Set[str]] = defaultdict(set)
+        # Ids named by remove_assignment records since the last lookup
+        self._removed: Set[str] = set()
+        self._lock = threading.Lock()
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _build(self) -> None:
+        # Read the store outside our lock: the store calls add() while holding its own
+        assignments = list(get_store().get_assignments().values())
+        with self._lock:
+            for assignment in assignments:
+                self._add(assignment["title"], assignment["due"])
+            self.built = True
+
+    def _add(self, title: str, due: str) -> None:
+        assignment_id = assignment_id_for(title, due)
+        if assignment_id in self._entries:
+            return
+        try:
+            due_ts = iso_to_epoch(due)
+        except ValueError:
+            return
+        entry = _Entry(assignment_id, due_ts, normalize_title(title))
+        self._entries[assignment_id] = entry
+        for token in entry.tokens:
+            self._blocks[(due_ts // BUCKET, token)].add(assignment_id)
+
+    def _remove(self, assignment_id: str) -> None:
+        entry = self._entries.pop(assignment_id, None)
+        if entry is None:
+            return
+        for token in entry.tokens:
+            key = (entry.due_ts // BUCKET, token)
+            block = self._blocks.get(key)
+            if block is not None:
+                block.discard(assignment_id)
+                if not block:
+                    del self._blocks[key]
+
+    def add(self, title: str, due: str) -> None:
+        # Kept even before the first build, so nothing added during a build is lost
+        with self._lock:
+            self._removed.discard(assignment_id_for(title, due))
+            self._add(title, due)
+
+    def remove(self, assignment_id: str) -> None:
+        """Note a removal; the entry is dropped on the next lookup if its cohort is gone."""
+        with self._lock:
+            self._removed.add(assignment_id)
+
+    def _drop_removed(self) -> None:
+        with self._lock:
+            pending = set(self._removed)
+        if not pending:
+            return
+        # Read the store outside our lock, as in _build
+        store = get_store()
+        gone = [assignment_id for assignment_id in pending if store.get_assignment(assignment_id) is None]
+        with self._lock:
+            for assignment_id in gone:
+                # Skip ids added back while we were reading
+                if assignment_id in self._removed:
+                    self._remove(assignment_id)
+            self._removed -= pending
+
+    def matches(self, title: str, due: str) -> List[str]:
+        """Ids of the stored assignments that are the same work as (title, due), exact id first, then best match."""
+        try:
+            due_ts = iso_to_epoch(due)
+        except ValueError:
+            return []
+        tokens = normalize_title(title)
+        query = _Entry(assignment_id_for(title, due), due_ts, tokens)
+
+        if not self.built:
+            self._build()
+        self._drop_removed()
+        with self._lock:
+            bucket = due_ts // BUCKET
+            reach = -(-DUE_TOLERANCE // BUCKET)
+            candidates: Set[str] = set()
+            for b in range(bucket - reach, bucket + reach + 1):
+                for token in set(tokens):
+                    candidates |= self._blocks.get((b, token), set())
+
+            scored = []
+            for assignment_id in candidates:
+                entry = self._entries[assignment_id]
+                if abs(entry.due_ts - due_ts) > DUE_TOLERANCE or entry.numbers != query.numbers:
+                    continue
+                union = len(entry.grams | query.grams)
+                score = len(entry.grams & query.grams) / union if union else 0.0
+                if assignment_id == query.assignment_id or score >= MATCH_THRESHOLD:
+                    scored.append((assignment_id != query.assignment_id, -score, abs(entry.due_ts - due_ts), assignment_id))
+        return [item[-1] for item in sorted(scored)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._blocks.clear()
+            self._removed.clear()
+            self.built = False
+
+    def on_record(self, record: Dict[str, Any]) -> None:
+        if record["op"] == "add_assignment":
+            self.add(record["title"], record["due"])
+        elif record["op"] == "remove_assignment":
+            self.remove(assignment_id_for(record["title"], record["due"]))
+        elif record["op"] == "replace":
+            # Rebuilt from the store on the next lookup
+            self.clear()
+
+
+assignment_index = AssignmentIndex()
+add_listener(assignment_index.on_record)
@@ -0,0 +1,205 @@
+import heapq
+import os
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from free_time_index import epoch_to_datetime
+
+Interval = Tuple[int, int]
+
+# "sweep" (common_windows below) or "grid" (availability_grid.AvailabilityGrid)
+OVERLAP_ENGINE = os.environ.get("OVERLAP_ENGINE", "sweep")
+
+# How get_suggestions picks one window out of the per-group-size results
+LARGEST_GROUP = "largest_group"   # longest window for the biggest group that has one
+LONGEST = "longest"               # longest window overall, ties go to the bigger group
+
+
+@dataclass(frozen=True)
+class CommonWindow:
+    start: int
+    end: int
+    members: FrozenSet[Hashable]
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "start": epoch_to_datetime(self.start).isoformat(),
+            "end": epoch_to_datetime(self.end).isoformat(),
+        }
+
+
+def _merge(intervals: List[Interval]) -> List[Interval]:
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def common_windows(availability: Dict[Hashable, List[Interval]], top_k: int = 3,
+                   min_duration: int = 0, min_group_size: int = 2) -> Dict[int, List[CommonWindow]]:
+    """Top windows in which a fixed set of users are all free, for every group size.
+
+    ``availability`` maps a user to their free intervals in epoch seconds.
+    Each user's intervals are merged first, so a user is counted at most once
+    no matter how their blocks overlap. One sweep over the sorted interval
+    boundaries keeps the active users ordered by when they became free; when
+    a user leaves at time t, the longest window of size k ending at t is that
+    user plus the k - 1 others who have been free the longest. Returns
+    {group size: windows sorted longest first}, at most ``top_k`` per size
+    and only windows lasting at least ``min_duration`` seconds.
+    """
+    events: List[Tuple[int, int, Hashable]] = []
+    for user, intervals in availability.items():
+        for start, end in _merge(intervals):
+            # Leaves (0) sort before joins (1) so touching blocks don't overlap
+            events.append((start, 1, user))
+            events.append((end, 0, user))
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    heaps: Dict[int, List[Tuple[int, int, int, CommonWindow]]] = {}
+    active: List[Tuple[int, int]] = []      # (joined_at, user order), sorted
+    joined: Dict[Hashable, Tuple[int, int]] = {}
+    order: Dict[Hashable, int] = {}
+    users: List[Hashable] = []
+    counter = 0
+
+    def offer(size: int, window: CommonWindow) -> None:
+        nonlocal counter
+        heap = heaps.setdefault(size, [])
+        # Longer first, then earlier; counter keeps the tuple comparable
+        item = (window.duration, -window.start, -counter, window)
+        counter += 1
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    i = 0
+    while i < len(events):
+        t = events[i][0]
+        leaving = []
+        while i < len(events) and events[i][0] == t and events[i][1] == 0:
+            leaving.append(events[i][2])
+            i += 1
+
+        seen = set()
+        for user in leaving:
+            user_entry = joined[user]
+            others = [entry for entry in active if entry != user_entry]
+            start = user_entry[0]
+            members = [user_entry[1]]
+            for size in range(2, len(others) + 2):
+                other = others[size - 2]
+                members.append(other[1])
+                start = max(start, other[0])
+                if t - start < max(min_duration, 1):
+                    break
+                if size < min_group_size:
+                    continue
+                heap = heaps.get(size)
+                if heap is not None and len(heap) >= top_k and (t - start, -start) <= heap[0][:2]:
+                    continue
+                if len(leaving) > 1:
+                    # Users leaving together can produce the same window
+                    key = (size, start, frozenset(members))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                offer(size, CommonWindow(start, t, frozenset(users[m] for m in members)))
+
+        for user in leaving:
+            active.pop(bisect_left(active, joined.pop(user)))
+
+        while i < len(events) and events[i][0] == t:
+            user = events[i][2]
+            if user not in order:
+                order[user] = len(users)
+                users.append(user)
+            joined[user] = (t, order[user])
+            insort(active, joined[user])
+            i += 1
+
+    return {
+        size: [item[3] for item in sorted(heap, reverse=True)]
+        for size, heap in sorted(heaps.items())
+    }
+
+
+def choose_window(windows: Dict[int, List[CommonWindow]], policy: str = LARGEST_GROUP) -> Optional[CommonWindow]:
+    if not windows:
+        return None
+    if policy == LARGEST_GROUP:
+        return windows[max(windows)][0]
+    if policy == LONGEST:
+        return max((w[0] for w in windows.values()), key=lambda w: (w.duration, len(w.members)))
+    raise ValueError(f"Unknown window policy: {policy}")
+
+
+def interval_overlaps(a: List[Interval], b: List[Interval]) -> List[Interval]:
+    """Intersections of two sorted, merged interval lists with a two-pointer merge."""
+    overlaps = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            overlaps.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return overlaps
+
+
+def overlap_matrix(availability: Dict[Hashable, List[Interval]],
+                   include_overlaps: bool = False) -> Tuple[List[Hashable], List[List[int]], Dict[Tuple[int, int], List[Interval]]]:
+    """Pairwise shared free seconds for a whole group in one sweep.
+
+    Returns (users, matrix, overlaps) where matrix[i][j] is the number of
+    seconds users[i] and users[j] are both free, and overlaps maps (i, j)
+    with i < j to their shared intervals when ``include_overlaps`` is set.
+    Every shared interval of a pair ends when one of the two leaves, so it
+    is recorded exactly once, at that moment.
+    """
+    users = list(availability)
+    position = {user: i for i, user in enumerate(users)}
+    matrix = [[0] * len(users) for _ in users]
+    overlaps: Dict[Tuple[int, int], List[Interval]] = {}
+
+    events: List[Tuple[int, int, int]] = []
+    for user, intervals in availability.items():
+        for start, end in _merge(intervals):
+            events.append((start, 1, position[user]))
+            events.append((end, 0, position[user]))
+    events.sort()
+
+    active: Dict[int, int] = {}
+    for t, kind, i in events:
+        if kind == 1:
+            active[i] = t
+            continue
+        joined_at = active.pop(i)
+        for j, other_joined_at in active.items():
+            start = max(joined_at, other_joined_at)
+            if start >= t:
+                continue
+            matrix[i][j] += t - start
+            matrix[j][i] += t - start
+            if include_overlaps:
+                overlaps.setdefault((min(i, j), max(i, j)), []).append((start, t))
+
+    for intervals in overlaps.values():
+        intervals.sort()
+    for i, intervals in enumerate(availability.values()):
+        matrix[i][i] = sum(end - start for start, end in _merge(intervals))
+    return users, matrix, overlaps
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from availability import CommonWindow, Interval
+
+SLOT_MINUTES = 15
+# Same two-week window oauth.get_user_data fetches
+HORIZON = timedelta(weeks=2)
+
+
+class AvailabilityGrid:
+    """Free time of a group of users as a users x slots boolean matrix.
+
+    Slot i covers [start + i * slot, start + (i + 1) * slot) and is marked
+    free only if the user is free for the whole slot. Group questions then
+    become array reductions over the matrix instead of Python loops.
+    """
+
+    def __init__(self, start: int, end: int, slot_minutes: int = SLOT_MINUTES) -> None:
+        self.slot = slot_minutes * 60
+        self.start = start - start % self.slot
+        self.n_slots = max(0, -(-(end - self.start) // self.slot))
+        self.users: List[Hashable] = []
+        self._rows: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_availability(cls, availability: Dict[Hashable, List[Interval]], start: int, end: int,
+                          slot_minutes: int = SLOT_MINUTES) -> "AvailabilityGrid":
+        grid = cls(start, end, slot_minutes)
+        for user, intervals in availability.items():
+            grid.add(user, intervals)
+        return grid
+
+    def add(self, user: Hashable, intervals: List[Interval]) -> None:
+        # Mark whole slots with a difference array: +1 at the first fully
+        # covered slot of each interval, -1 after the last one
+        diff = np.zeros(self.n_slots + 1, dtype=np.int32)
+        if intervals:
+            bounds = np.asarray(intervals, dtype=np.int64) - self.start
+            first = np.clip(-(-bounds[:, 0] // self.slot), 0, self.n_slots)
+            last = np.clip(bounds[:, 1] // self.slot, 0, self.n_slots)
+            keep = first < last
+            np.add.at(diff, first[keep], 1)
+            np.add.at(diff, last[keep], -1)
+        self.users.append(user)
+        self._rows.append(np.cumsum(diff[:-1]) > 0)
+        self._matrix = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            if self._rows:
+                self._matrix = np.vstack(self._rows)
+            else:
+                self._matrix = np.zeros((0, self.n_slots), dtype=bool)
+        return self._matrix
+
+    def counts(self) -> np.ndarray:
+        """Number of free users in each slot."""
+        return self.matrix.sum(axis=0)
+
+    def at_least(self, k: int) -> np.ndarray:
+        return self.counts() >= k
+
+    def all_free(self, members: Optional[List[Hashable]] = None) -> np.ndarray:
+        matrix = self.matrix
+        if members is not None:
+            positions = [self.users.index(m) for m in members]
+            matrix = matrix[positions]
+        return matrix.all(axis=0)
+
+    def run_lengths(self) -> np.ndarray:
+        """For every user and slot, how many slots in a row the user has been free up to and including it."""
+        idx = np.arange(self.n_slots)
+        last_busy = np.maximum.accumulate(np.where(self.matrix, -1, idx), axis=1)
+        return idx - last_busy
+
+    @staticmethod
+    def longest_run(mask: np.ndarray) -> Optional[Tuple[int, int]]:
+        """(first slot, end slot) of the longest run of True in a 1-D mask."""
+        if not mask.any():
+            return None
+        idx = np.arange(len(mask))
+        runs = idx - np.maximum.accumulate(np.where(mask, -1, idx))
+        end = int(np.argmax(runs))
+        return end - int(runs[end]) + 1, end + 1
+
+    def best_windows(self, min_group_size: int = 2, min_slots: int = 1) -> Dict[int, List[CommonWindow]]:
+        """Longest window for every group size, in the same shape as common_windows(top_k=1).
+
+        The k users who have been free longest at slot t share a window of
+        the k-th largest run length ending at t, so sorting the run lengths
+        of each slot answers every group size at once.
+        """
+        if not self.users or self.n_slots == 0:
+            return {}
+        runs = self.run_lengths()
+        order = np.argsort(-runs, axis=0, kind="stable")
+        ranked = np.take_along_axis(runs, order, axis=0)
+
+        windows: Dict[int, List[CommonWindow]] = {}
+        for size in range(max(min_group_size, 1), len(self.users) + 1):
+            shared = ranked[size - 1]
+            end_slot = int(np.argmax(shared))
+            length = int(shared[end_slot])
+            if length < min_slots:
+                break
+            members = frozenset(self.users[i] for i in order[:size, end_slot])
+            windows[size] = [CommonWindow(
+                self.start + (end_slot + 1 - length) * self.slot,
+                self.start + (end_slot + 1) * self.slot,
+                members,
+            )]
+        return windows
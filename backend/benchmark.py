@@ -0,0 +1,231 @@
+"""Benchmarks for the scheduling path on a seeded synthetic population.
+
+Run from the backend directory, e.g.
+
+    python benchmark.py --users 10000 --backend json sqlite --engine sweep grid --output bench.json
+
+Every (storage backend, overlap engine) pair gets a fresh store in a
+temporary directory, so data.json is never touched. Results are written as
+JSON: one row per benchmark with call count and latency percentiles in
+milliseconds, ready to diff between runs.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, time as clock, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+from models import Assignment, TimeBlock, User
+from oauth import get_free_blocks
+from store import JsonStore, StorageBackend, assignment_id_for, set_store
+
+# Calendar window the population lives in, like the two weeks oauth fetches
+START = datetime(2025, 4, 7, tzinfo=timezone.utc)
+DAYS = 14
+COURSE_SIZE = 30
+COURSES_PER_USER = (3, 5)
+ASSIGNMENTS_PER_COURSE = 3
+BUSY_BLOCKS_PER_DAY = (2, 6)
+
+SUBJECTS = ["CS", "MATH", "PHYS", "CHEM", "BIO", "ECON", "HIST", "LIT"]
+KINDS = ["Homework", "Quiz", "Lab", "Project Status Update", "Reading Response", "Problem Set"]
+
+
+def generate_population(n_users: int, seed: int = 0) -> List[User]:
+    """Users shaped like db/users.json: shared course assignments and day-by-day free time.
+
+    Courses hold about COURSE_SIZE students each, so cohorts stay realistic
+    as the population grows. Free time is what get_free_blocks leaves around
+    a few random busy blocks per day, the same way real calendars are read.
+    """
+    rng = random.Random(seed)
+    n_courses = max(1, n_users // COURSE_SIZE * max(COURSES_PER_USER) // 2)
+    courses = []
+    for c in range(n_courses):
+        name = f"{rng.choice(SUBJECTS)}{100 + c}"
+        assignments = []
+        for a in range(ASSIGNMENTS_PER_COURSE):
+            due = START + timedelta(days=rng.randrange(1, DAYS), hours=rng.choice([9, 12, 17, 23]))
+            assignments.append((f"{name} {rng.choice(KINDS)} {a + 1}", due))
+        courses.append(assignments)
+
+    users = []
+    for i in range(n_users):
+        busy = []
+        for day in range(DAYS):
+            day_start = START + timedelta(days=day, hours=8)
+            for _ in range(rng.randint(*BUSY_BLOCKS_PER_DAY)):
+                start = day_start + timedelta(minutes=15 * rng.randrange(0, 60))
+                busy.append(TimeBlock(start, start + timedelta(minutes=rng.choice([50, 75, 90, 120]))))
+        busy.sort(key=lambda block: block.start_ts)
+        merged: List[TimeBlock] = []
+        for block in busy:
+            if merged and block.start_ts <= merged[-1].end_ts:
+                merged[-1].end_ts = max(merged[-1].end_ts, block.end_ts)
+            else:
+                merged.append(block)
+
+        assignments = [
+            Assignment(title, due)
+            for course in rng.sample(courses, min(len(courses), rng.randint(*COURSES_PER_USER)))
+            for title, due in course
+        ]
+        free_time = get_free_blocks(merged, START, START + timedelta(days=DAYS), clock(8, 0), clock(23, 59))
+        users.append(User(f"User {i}", f"user{i}@example.com", assignments, free_time))
+    return users
+
+
+def make_store(backend: str, directory: str) -> StorageBackend:
+    if backend == "json":
+        path = os.path.join(directory, "data.json")
+        with open(path, "w") as f:
+            json.dump({"users": {}, "assignments": {}}, f)
+        return JsonStore(path)
+    if backend == "sqlite":
+        from sqlite_store import SqliteStore
+        return SqliteStore(os.path.join(directory, "data.db"))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    ms = lambda seconds: round(seconds * 1000, 4)
+    return {
+        "calls": len(ordered),
+        "total_ms": ms(sum(ordered)),
+        "mean_ms": ms(statistics.fmean(ordered)) if ordered else None,
+        "p50_ms": ms(ordered[len(ordered) // 2]) if ordered else None,
+        "p95_ms": ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]) if ordered else None,
+        "max_ms": ms(ordered[-1]) if ordered else None,
+    }
+
+
+def timed(calls: List[Callable[[], Any]], before: Callable[[], None] = lambda: None) -> Dict[str, Any]:
+    """Time each call on its own; ``before`` runs untimed ahead of every call."""
+    samples = []
+    for call in calls:
+        before()
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def run(users: List[User], backend: str, engine: str, sample: int, seed: int) -> List[Dict[str, Any]]:
+    # Imported here so the store under test is in place before anything reads it
+    import app as flask_app
+    import db_utils
+    from app import app
+    from suggestion_cache import suggestion_cache
+
+    rng = random.Random(seed)
+    picked = rng.sample(users, min(sample, len(users)))
+    rows: List[Tuple[str, Dict[str, Any]]] = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        set_store(make_store(backend, directory))
+        rows.append(("send_user", timed([lambda u=u: db_utils.send_user(u) for u in users])))
+
+        rows.append(("get_suggestions_cold", timed(
+            [lambda u=u: db_utils.get_suggestions(u, engine=engine) for u in picked],
+            before=suggestion_cache.clear,
+        )))
+        for user in picked:
+            db_utils.get_suggestions(user, engine=engine)
+        rows.append(("get_suggestions_warm", timed(
+            [lambda u=u: db_utils.get_suggestions(u, engine=engine) for u in picked]
+        )))
+
+        cohorts = []
+        for user in picked:
+            assignment = rng.choice(user.assignments)
+            cohort = [user.email] + db_utils.get_overlapping_users_for_assignment(
+                user.email, assignment.title, assignment.due)
+            cohorts.append((assignment, cohort))
+        blocks = [
+            (db_utils.fetch_user_free_times_before_due(cohort, assignment.due), len(cohort))
+            for assignment, cohort in cohorts
+        ]
+        rows.append(("find_largest_common_block", timed(
+            [lambda b=b, n=n: db_utils.find_largest_common_block(b, n) for b, n in blocks]
+        )))
+        pairs = [(cohort[0], rng.choice(cohort)) for _, cohort in cohorts]
+        rows.append(("get_overlaps_between_users", timed(
+            [lambda a=a, b=b: db_utils.get_overlaps_between_users(a, b) for a, b in pairs]
+        )))
+
+        client = app.test_client()
+        assignment_ids = [assignment_id_for(a.title, a.due.isoformat()) for a, _ in cohorts]
+        rows.append(("GET /api/user/<email>", timed(
+            [lambda u=u: client.get(f"/api/user/{u.email}") for u in picked]
+        )))
+        rows.append(("GET /api/assignments", timed(
+            [lambda: client.get("/api/assignments") for _ in range(min(sample, 20))]
+        )))
+        rows.append(("GET /api/assignments/<id>/overlaps", timed(
+            [lambda i=i: client.get(f"/api/assignments/{i}/overlaps") for i in assignment_ids]
+        )))
+        batch = [u.email for u in picked]
+        # The batch route is admin-only
+        flask_app.ADMIN_TOKEN = flask_app.ADMIN_TOKEN or "benchmark"
+        admin = {"X-Admin-Token": flask_app.ADMIN_TOKEN}
+        rows.append(("POST /api/suggestions/batch", timed(
+            [lambda: client.post("/api/suggestions/batch", json={"emails": batch}, headers=admin)],
+            before=suggestion_cache.clear,
+        )))
+        set_store(None)
+
+    return [{"backend": backend, "engine": engine, "benchmark": name, **stats} for name, stats in rows]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample", type=int, default=25, help="users timed for the per-user benchmarks")
+    parser.add_argument("--backend", nargs="+", default=["json"], choices=["json", "sqlite"])
+    parser.add_argument("--engine", nargs="+", default=["sweep"], choices=["sweep", "grid"])
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    users = generate_population(args.users, args.seed)
+    generated_in = time.perf_counter() - started
+
+    results = []
+    for backend in args.backend:
+        for engine in args.engine:
+            print(f"⏱️ {backend} / {engine} with {args.users} users", file=sys.stderr)
+            # The code under test prints as it goes; keep that out of the results
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results.extend(run(users, backend, engine, args.sample, args.seed))
+
+    report = {
+        "config": {
+            "users": args.users,
+            "seed": args.seed,
+            "sample": args.sample,
+            "assignments": len({(a.title, a.due_ts) for u in users for a in u.assignments}),
+            "free_blocks": sum(len(u.free_time) for u in users),
+            "generated_in_ms": round(generated_in * 1000, 1),
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
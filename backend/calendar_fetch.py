@@ -0,0 +1,152 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+
+from calendar_sync import PAGE_SIZE, calendar_sync
+from metrics import google_api_call
+from recurring import needs_instances
+
+# Calendars fetched at the same time, across all users
+CALENDAR_FETCH_WORKERS = 8
+# Seconds a single user's login waits for their calendars
+CALENDAR_FETCH_DEADLINE = 10.0
+# What recurring.weekly_rule reads; list_recurring asks only for these
+RECURRING_FIELDS = "nextPageToken,items(id,status,start,end,recurrence)"
+
+_executor = ThreadPoolExecutor(max_workers=CALENDAR_FETCH_WORKERS, thread_name_prefix="calendar-fetch")
+_local = threading.local()
+
+
+def authorized_http(creds) -> AuthorizedHttp:
+    """An authorized transport for this thread; httplib2 connections can't be shared across threads."""
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = _local.http = httplib2.Http()
+    return AuthorizedHttp(creds, http=http)
+
+
+@dataclass
+class FetchResult:
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    # Calendar id -> error message for calendars that failed outright
+    failed: Dict[str, str] = field(default_factory=dict)
+    # Calendars still loading when the deadline passed
+    timed_out: List[str] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed and not self.timed_out
+
+    def report(self) -> Dict[str, Any]:
+        return {"complete": self.complete, "failed_calendars": self.failed, "timed_out_calendars": self.timed_out}
+
+
+def list_events(service, http, calendar_id: str, time_min: datetime, time_max: datetime,
+                fields: Optional[str] = None) -> List[Dict[str, Any]]:
+    """All events of one calendar in [time_min, time_max), following every page.
+
+    Recurring events come once, with their recurrence rules; see recurring.py.
+    ``fields`` trims each item to the listed fields.
+    """
+    events: List[Dict[str, Any]] = []
+    page_token = None
+    while True:
+        with google_api_call("events.list"):
+            response = service.events().list(
+                calendarId=calendar_id,
+                timeMin=time_min.isoformat(),
+                timeMax=time_max.isoformat(),
+                maxResults=PAGE_SIZE,
+                singleEvents=False,
+                pageToken=page_token,
+                fields=fields
+            ).execute(http=http)
+        events += response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return events
+
+
+def list_instances(service, http, calendar_id: str, event_id: str, time_min: datetime,
+                   time_max: datetime) -> List[Dict[str, Any]]:
+    """Occurrences of one recurring event in [time_min, time_max), for rules recurring.py can't expand."""
+    events: List[Dict[str, Any]] = []
+    page_token = None
+    while True:
+        with google_api_call("events.instances"):
+            response = service.events().instances(
+                calendarId=calendar_id,
+                eventId=event_id,
+                timeMin=time_min.isoformat(),
+                timeMax=time_max.isoformat(),
+                maxResults=PAGE_SIZE,
+                pageToken=page_token
+            ).execute(http=http)
+        events += response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return events
+
+
+def list_recurring(service, http, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Dict[str, Any]]:
+    """Recurring events of one calendar in [time_min, time_max), without the one-off events."""
+    events = list_events(service, http, calendar_id, time_min, time_max, fields=RECURRING_FIELDS)
+    return [e for e in events if e.get("recurrence")]
+
+
+def fetch_events(service, creds, calendar_ids: List[str], user_key: str, time_min: datetime,
+                 time_max: datetime, incremental: bool = True,
+                 deadline: float = CALENDAR_FETCH_DEADLINE,
+                 recurring_until: Optional[datetime] = None) -> FetchResult:
+    """Fetch several calendars concurrently on the shared worker pool.
+
+    Whatever has arrived when ``deadline`` seconds have passed is returned;
+    calendars still in flight are listed in ``timed_out`` and those that
+    raised are listed in ``failed``, so callers can tell a partial result
+    from a complete one.
+
+    One-off events are fetched for [time_min, time_max) only. Recurring
+    events are fetched up to ``recurring_until`` when that is later, for the
+    weekly template.
+    """
+    until = max(time_max, recurring_until or time_max)
+
+    def fetch(calendar_id: str) -> List[Dict[str, Any]]:
+        http = authorized_http(creds)
+        if incremental:
+            # The synced copy already holds every recurring event
+            events = calendar_sync.events(service, user_key, calendar_id, time_min, time_max, http=http)
+        else:
+            events = list_events(service, http, calendar_id, time_min, time_max)
+            if until > time_max:
+                seen = {e["id"] for e in events}
+                events += [e for e in list_recurring(service, http, calendar_id, time_max, until)
+                           if e["id"] not in seen]
+        for event in [e for e in events if needs_instances(e)]:
+            events = events + list_instances(service, http, calendar_id, event["id"], time_min, until)
+        return events
+
+    started = time.monotonic()
+    futures = {_executor.submit(fetch, calendar_id): calendar_id for calendar_id in calendar_ids}
+    done, pending = wait(futures, timeout=deadline)
+
+    result = FetchResult()
+    for future in done:
+        calendar_id = futures[future]
+        try:
+            result.events += future.result()
+        except Exception as e:
+            result.failed[calendar_id] = str(e)
+    for future in pending:
+        future.cancel()
+        result.timed_out.append(futures[future])
+
+    if not result.complete:
+        print(f"⚠️ Partial calendar fetch for {user_key} after {time.monotonic() - started:.1f}s: {result.report()}")
+    return result
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+
+from client_cache import MAX_CACHED_USERS
+from metrics import google_api_call
+
+# Events per page requested from events.list
+PAGE_SIZE = 250
+
+
+class SyncTokenExpired(Exception):
+    """Raised by async page fetchers when Google answers 410 Gone."""
+
+
+class CalendarState:
+    """What we know about one calendar: its sync token and its events by id."""
+
+    def __init__(self) -> None:
+        self.sync_token: Optional[str] = None
+        self.events: Dict[str, Dict[str, Any]] = {}
+        # Two requests for the same user may sync the same calendar at once
+        self.lock = threading.Lock()
+
+
+def _event_end(event: Dict[str, Any]) -> Optional[datetime]:
+    # Cancelled occurrences of a recurring event only say which start they cancel
+    end = event.get("end", {}).get("dateTime") or event.get("originalStartTime", {}).get("dateTime")
+    return datetime.fromisoformat(end) if end else None
+
+
+class CalendarSync:
+    """Incremental events.list using Google Calendar sync tokens.
+
+    The first call for a calendar does a full sync from ``time_min`` onwards
+    and keeps the returned nextSyncToken. Later calls send that token and
+    only receive events changed since then, which are merged into the cached
+    copy (cancelled events are removed). A 410 Gone response means Google
+    invalidated the token, so a full sync runs again. A full sync builds a fresh event map and only swaps it in once
+    the last page has arrived, so a sync that fails halfway neither loses
+    the cached events nor keeps ones that were deleted. State is kept for
+    the ``max_users`` most recently seen users.
+
+    Recurring events are listed once with their RRULE (singleEvents=False)
+    and expanded by recurring.py; cancelled occurrences are kept, since they
+    are what removes that occurrence.
+    """
+
+    def __init__(self, max_users: int = MAX_CACHED_USERS) -> None:
+        self.max_users = max_users
+        self._users: "OrderedDict[str, Dict[str, CalendarState]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, user_key: str, calendar_id: str) -> CalendarState:
+        with self._lock:
+            calendars = self._users.setdefault(user_key, {})
+            self._users.move_to_end(user_key)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return calendars.setdefault(calendar_id, CalendarState())
+
+    def reset(self, user_key: Optional[str] = None) -> None:
+        with self._lock:
+            if user_key is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_key, None)
+
+    @staticmethod
+    def _params(state: CalendarState, time_min: datetime) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"singleEvents": False, "maxResults": PAGE_SIZE}
+        if state.sync_token:
+            params["syncToken"] = state.sync_token
+        else:
+            # Sync tokens can't be combined with timeMax or orderBy
+            params["timeMin"] = time_min.isoformat()
+        return params
+
+    @staticmethod
+    def _start(state: CalendarState) -> Dict[str, Dict[str, Any]]:
+        """The event map pages are merged into: a copy of the cached one, or a fresh one for a full sync."""
+        return dict(state.events) if state.sync_token else {}
+
+    @staticmethod
+    def _apply_page(state: CalendarState, events: Dict[str, Dict[str, Any]],
+                    response: Dict[str, Any]) -> Optional[str]:
+        """Merge one events.list page into events. Returns the next page token, if any.
+
+        After the last page, events and the new sync token replace the state's.
+        """
+        for event in response.get("items", []):
+            if event.get("status") == "cancelled" and not event.get("recurringEventId"):
+                events.pop(event["id"], None)
+            else:
+                events[event["id"]] = event
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            state.events = events
+            state.sync_token = response.get("nextSyncToken")
+        return page_token
+
+    @staticmethod
+    def _expired(state: CalendarState, calendar_id: str) -> None:
+        print(f"⚠️ Sync token for {calendar_id} expired, running a full sync")
+        state.sync_token = None
+
+    def _list(self, service, state: CalendarState, calendar_id: str, time_min: datetime, http=None) -> None:
+        params = self._params(state, time_min)
+        events = self._start(state)
+        page_token = None
+        while True:
+            with google_api_call("events.list"):
+                response = service.events().list(
+                    calendarId=calendar_id, pageToken=page_token, **params
+                ).execute(http=http)
+            page_token = self._apply_page(state, events, response)
+            if not page_token:
+                return
+
+    def events(self, service, user_key: str, calendar_id: str,
+               time_min: datetime, time_max: datetime, http=None) -> List[Dict[str, Any]]:
+        """Events of one calendar that overlap [time_min, time_max), fetching only what changed."""
+        state = self._state(user_key, calendar_id)
+        with state.lock:
+            return self._events(service, state, calendar_id, time_min, time_max, http)
+
+    def _events(self, service, state: CalendarState, calendar_id: str,
+                time_min: datetime, time_max: datetime, http) -> List[Dict[str, Any]]:
+        try:
+            self._list(service, state, calendar_id, time_min, http)
+        except HttpError as e:
+            if e.resp.status != 410:
+                raise
+            self._expired(state, calendar_id)
+            self._list(service, state, calendar_id, time_min, http)
+        return self._in_window(state, time_min, time_max)
+
+    async def events_async(self, list_page: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]], user_key: str,
+                           calendar_id: str, time_min: datetime, time_max: datetime) -> List[Dict[str, Any]]:
+        """events() for the async path: ``list_page(params)`` fetches one events.list page.
+
+        It must raise SyncTokenExpired on 410 Gone. Shares the cached state
+        and sync tokens with the threaded path.
+        """
+        state = self._state(user_key, calendar_id)
+        # Polled rather than awaited in a thread, so a cancelled task can't leave it held
+        while not state.lock.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+        try:
+            try:
+                await self._list_async(list_page, state, time_min)
+            except SyncTokenExpired:
+                self._expired(state, calendar_id)
+                await self._list_async(list_page, state, time_min)
+            return self._in_window(state, time_min, time_max)
+        finally:
+            state.lock.release()
+
+    async def _list_async(self, list_page, state: CalendarState, time_min: datetime) -> None:
+        params = self._params(state, time_min)
+        events = self._start(state)
+        page_token = None
+        while True:
+            page_params = dict(params, pageToken=page_token) if page_token else params
+            page_token = self._apply_page(state, events, await list_page(page_params))
+            if not page_token:
+                return
+
+    @staticmethod
+    def _in_window(state: CalendarState, time_min: datetime, time_max: datetime) -> List[Dict[str, Any]]:
+        in_window = []
+        for event_id, event in list(state.events.items()):
+            if event.get("recurrence"):
+                # Dated by its first occurrence, which may be long past
+                in_window.append(event)
+                continue
+            end = _event_end(event)
+            if end is not None and end <= time_min:
+                # Already over; it can't come back into any later window
+                del state.events[event_id]
+                continue
+            start = event.get("start", {}).get("dateTime")
+            if start and datetime.fromisoformat(start) >= time_max:
+                continue
+            in_window.append(event)
+        return in_window
+
+
+calendar_sync = CalendarSync()
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional, Tuple
+
+import requests
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+
+from metrics import google_api_call
+
+# Refresh access tokens this long before Google would reject them
+REFRESH_MARGIN = timedelta(minutes=5)
+# Users whose clients are kept; the least recently used are dropped first
+MAX_CACHED_USERS = 1000
+
+# One pooled HTTPS session for userinfo calls and token refreshes
+http_session = requests.Session()
+
+
+def user_key(creds) -> str:
+    """Stable key for a grant: the refresh token outlives the access tokens it mints."""
+    return creds.refresh_token or creds.token
+
+
+class ClientCache:
+    """Per-user credentials, Calendar service objects and userinfo.
+
+    Credentials are refreshed a little before they expire rather than after
+    a request fails, discovery-built Calendar clients are reused instead of
+    being rebuilt on every request, and the userinfo (name, email) pair is
+    fetched once per grant.
+    """
+
+    def __init__(self, max_users: int = MAX_CACHED_USERS) -> None:
+        self.max_users = max_users
+        self._credentials: "OrderedDict[str, Any]" = OrderedDict()
+        self._services: "OrderedDict[str, Any]" = OrderedDict()
+        self._userinfo: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.RLock()
+        # One per grant, so a token refresh only holds up that user's requests
+        self._refresh_locks: "OrderedDict[str, threading.Lock]" = OrderedDict()
+
+    def _get(self, entries: OrderedDict, key: str) -> Any:
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            return value
+
+    def _put(self, entries: OrderedDict, key: str, value: Any) -> None:
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_users:
+                entries.popitem(last=False)
+
+    def get_credentials(self, key: str):
+        return self._get(self._credentials, key)
+
+    def put_credentials(self, key: str, creds) -> None:
+        self._put(self._credentials, key, creds)
+
+    @staticmethod
+    def _expiring(creds) -> bool:
+        # google-auth keeps expiry as naive UTC
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return not creds.valid or (creds.expiry is not None and creds.expiry - now <= REFRESH_MARGIN)
+
+    def refresh_if_expiring(self, creds) -> bool:
+        """Refresh creds if they expire within REFRESH_MARGIN. Returns True if they were refreshed."""
+        if not creds.refresh_token or not self._expiring(creds):
+            return False
+        key = user_key(creds)
+        with self._lock:
+            refresh_lock = self._get(self._refresh_locks, key)
+            if refresh_lock is None:
+                refresh_lock = threading.Lock()
+                self._put(self._refresh_locks, key, refresh_lock)
+        with refresh_lock:
+            # Another request may have refreshed them while we waited
+            if not self._expiring(creds):
+                return False
+            with google_api_call("token.refresh"):
+                creds.refresh(Request(session=http_session))
+            return True
+
+    def calendar_service(self, creds, api_endpoint: Optional[str] = None):
+        key = user_key(creds)
+        service = self._get(self._services, key)
+        if service is None:
+            client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+            service = build("calendar", "v3", credentials=creds, cache_discovery=False,
+                            client_options=client_options)
+            self._put(self._services, key, service)
+        return service
+
+    def userinfo(self, creds, fetch: Callable[[Any], Tuple[str, str]]) -> Tuple[str, str]:
+        info = self.cached_userinfo(creds)
+        if info is None:
+            info = fetch(creds)
+            self.put_userinfo(creds, info)
+        return info
+
+    def cached_userinfo(self, creds) -> Optional[Tuple[str, str]]:
+        return self._get(self._userinfo, user_key(creds))
+
+    def put_userinfo(self, creds, info: Tuple[str, str]) -> None:
+        self._put(self._userinfo, user_key(creds), info)
+
+    def forget(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._credentials.clear()
+                self._services.clear()
+                self._userinfo.clear()
+                self._refresh_locks.clear()
+                return
+            for entries in (self._credentials, self._services, self._userinfo, self._refresh_locks):
+                entries.pop(key, None)
+
+
+client_cache = ClientCache()
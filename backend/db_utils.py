@@ -4,119 +4,58 @@ from flask_cors import CORS
 from datetime import datetime, timedelta
 from slugify import slugify
 import json
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, FrozenSet, Optional, Set, Tuple, Union
 import os
+import threading
 from collections import defaultdict
+from store import get_store, assignment_id_for, iso_to_epoch, datetime_to_epoch
+from availability import CommonWindow, common_windows, choose_window, interval_overlaps, overlap_matrix, LARGEST_GROUP, OVERLAP_ENGINE
+from free_time_index import epoch_to_datetime
+from suggestion_cache import suggestion_cache
+from assignment_index import assignment_index, FUZZY_MATCHING
+import metrics
+
+COHORT_SIZE = metrics.histogram("suggestion_cohort_size", "Users in each cohort searched for a common window.",
+                                buckets=(2, 3, 5, 10, 20, 50, 100, 200, 500, 1000))
+WINDOW_SEARCH_SECONDS = metrics.histogram("suggestion_window_search_seconds", "Time to find a cohort's common windows, by engine.")
 
 app = Flask(__name__)
 app.secret_key = "dev-key"
 
-# Initialize local JSON storage
-DATA_FILE = "data.json"
+# Local JSON storage, loaded once and kept in memory (see store.py)
 
 def load_data() -> Dict[str, Any]:
-    if not os.path.exists(DATA_FILE):
-        # Create file with initial structure if it doesn't exist
-        new_data: Dict[str, Dict[str, Any]] = {"users": {}, "assignments": {}}
-        with open(DATA_FILE, "w") as f:
-            json.dump(new_data, f, indent=4)
-        return new_data
-    
-    try:
-        with open(DATA_FILE, "r") as f:
-            content = f.read().strip()
-            if not content:  # If file is empty
-                empty_data: Dict[str, Dict[str, Any]] = {"users": {}, "assignments": {}}
-                with open(DATA_FILE, "w") as f:
-                    json.dump(empty_data, f, indent=4)
-                return empty_data
-            return json.loads(content)
-    except json.JSONDecodeError:
-        # If file is corrupted, reset it
-        reset_data: Dict[str, Dict[str, Any]] = {"users": {}, "assignments": {}}
-        with open(DATA_FILE, "w") as f:
-            json.dump(reset_data, f, indent=4)
-        return reset_data
+    metrics.STORE_CALLS.inc(op="load_data")
+    return get_store().data
 
 def save_data(data: Dict[str, Any]) -> None:
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    metrics.STORE_CALLS.inc(op="save_data")
+    get_store().replace(data)
 
 FRONTEND_URL = ["http://localhost:3000", "http://127.0.0.1:3000"]
 CORS(app, supports_credentials=True, origins=FRONTEND_URL)
 
 def create_user(name: str, email: str) -> None:
     print(f"📝 Saving {name} ({email}) to local storage")
-    data = load_data()
-    
-    # Check if user already exists
-    if email in data["users"]:
+    if not get_store().create_user(name, email):
         print(f"⚠️ User {email} already exists in the database")
-        return
-        
-    data["users"][email] = {
-        "name": name,
-        "email": email,
-        "assignments": [],
-        "free_time": []
-    }
-    save_data(data)
 
 def add_assignment_to_user(email: str, title: str, due: datetime) -> None:
     due_str = due.isoformat() if isinstance(due, datetime) else due
-    data = load_data()
-    
-    if email not in data["users"]:
-        return
-        
-    assignment = {
-        "title": title,
-        "due": due_str,
-        "description": None
-    }
-    
-    # Add to user's assignments
-    if assignment not in data["users"][email]["assignments"]:
-        data["users"][email]["assignments"].append(assignment)
-    
-    # Add to assignments collection
-    assignment_id = slugify(f"{title}_{due_str}")
-    if assignment_id not in data["assignments"]:
-        data["assignments"][assignment_id] = {
-            "title": title,
-            "due": due_str,
-            "students": [email]
-        }
-    elif email not in data["assignments"][assignment_id]["students"]:
-        data["assignments"][assignment_id]["students"].append(email)
-        
-    save_data(data)
+    get_store().add_assignment(email, title, due_str)
 
 def add_free_time_to_user(email: str, start: datetime, end: datetime) -> None:
     start_str = start.isoformat() if isinstance(start, datetime) else start
     end_str = end.isoformat() if isinstance(end, datetime) else end
-    
-    data = load_data()
-    if email not in data["users"]:
-        return
-        
-    time_block = {
-        "start": start_str,
-        "end": end_str
-    }
-    
-    if time_block not in data["users"][email]["free_time"]:
-        data["users"][email]["free_time"].append(time_block)
-        save_data(data)
+    get_store().add_free_time(email, start_str, end_str)
 
 def get_users_with_same_assignment(title: str, due: str) -> List[str]:
     if isinstance(due, datetime):
         due = due.isoformat()
-    assignment_id = slugify(f"{title}_{due}")
-    data = load_data()
+    assignment = get_store().get_assignment(assignment_id_for(title, due))
     
-    if assignment_id in data["assignments"]:
-        return data["assignments"][assignment_id]["students"]
+    if assignment:
+        return assignment["students"]
     return []
 
 def get_overlap_minutes(start1: datetime, end1: datetime, start2: datetime, end2: datetime) -> Optional[Dict[str, Any]]:
@@ -131,165 +70,384 @@ def get_overlap_minutes(start1: datetime, end1: datetime, start2: datetime, end2
         }
     return None
 
+def _overlap_block(start: int, end: int) -> Dict[str, Any]:
+    return {
+        "start": epoch_to_datetime(start).isoformat(),
+        "end": epoch_to_datetime(end).isoformat(),
+        "duration_minutes": (end - start) // 60
+    }
+
 def get_overlaps_between_users(email1: str, email2: str) -> List[Dict[str, Any]]:
-    data = load_data()
-    if email1 not in data["users"] or email2 not in data["users"]:
+    store = get_store()
+    if not store.has_user(email1) or not store.has_user(email2):
         return []
         
-    user1_times = data["users"][email1]["free_time"]
-    user2_times = data["users"][email2]["free_time"]
-    
-    overlaps = []
-    
-    for block1 in user1_times:
-        try:
-            start1 = datetime.fromisoformat(block1["start"])
-            end1 = datetime.fromisoformat(block1["end"])
-        except Exception:
-            continue
-            
-        for block2 in user2_times:
-            try:
-                start2 = datetime.fromisoformat(block2["start"])
-                end2 = datetime.fromisoformat(block2["end"])
-            except Exception:
-                continue
-                
-            overlap = get_overlap_minutes(start1, end1, start2, end2)
-            if overlap:
-                overlaps.append(overlap)
-    return overlaps
+    overlaps = interval_overlaps(store.free_time_index(email1).query(), store.free_time_index(email2).query())
+    return [_overlap_block(start, end) for start, end in overlaps]
+
+def cohort_students(assignment: Dict[str, Any]) -> List[str]:
+    """Everyone on a stored assignment, plus its near-duplicate copies when fuzzy matching is on."""
+    store = get_store()
+    # A dict keeps first-seen order without an O(n^2) membership scan over large cohorts
+    students: Dict[str, None] = {}
+    for cohort_id in cohort_assignment_ids(assignment["title"], assignment["due"]):
+        cohort = store.get_assignment(cohort_id)
+        if cohort:
+            students.update(dict.fromkeys(cohort["students"]))
+    return list(students)
+
+def get_cohort_overlap_matrix(assignment_id: str, include_overlaps: bool = False) -> Optional[Dict[str, Any]]:
+    """Shared free minutes between every pair of students on one assignment.
+
+    matrix[i][j] is the overlap of students[i] and students[j] in minutes
+    (the diagonal is each student's own free time). With include_overlaps,
+    "overlaps" lists the shared blocks of every pair that has any. The
+    cohort includes near-duplicate copies of the assignment when fuzzy
+    matching is on, as in get_suggestions and get_study_groups.
+    """
+    store = get_store()
+    assignment = store.get_assignment(assignment_id)
+    if not assignment:
+        return None
 
-def get_overlapping_users_for_assignment(email: str, title: str, due: str) -> List[str]:
+    availability = {
+        email: store.free_time_index(email).query()
+        for email in cohort_students(assignment)
+        if store.has_user(email)
+    }
+    students, matrix, overlaps = overlap_matrix(availability, include_overlaps)
+    result: Dict[str, Any] = {
+        "assignment_id": assignment_id,
+        "students": students,
+        "matrix": [[seconds // 60 for seconds in row] for row in matrix],
+    }
+    if include_overlaps:
+        result["overlaps"] = [
+            {
+                "students": [students[i], students[j]],
+                "blocks": [_overlap_block(start, end) for start, end in blocks]
+            }
+            for (i, j), blocks in sorted(overlaps.items())
+        ]
+    return result
+
+def get_study_groups(assignment_id: str, min_duration_minutes: int = 0, **options: Any) -> Optional[Dict[str, Any]]:
+    """Split an assignment's cohort into disjoint study groups, each with its longest shared window before the due date.
+
+    The cohort includes near-duplicate copies of the assignment when fuzzy
+    matching is on. options (size, min_size, max_size, max_groups) go to
+    study_groups.find_study_groups, which raises ValueError for impossible
+    sizes. None if the assignment is unknown.
+    """
+    from availability_grid import HORIZON
+    from study_groups import find_study_groups
+    store = get_store()
+    assignment = store.get_assignment(assignment_id)
+    if not assignment:
+        return None
+
+    students = cohort_students(assignment)
+    due_ts = iso_to_epoch(assignment["due"])
+    start_ts = due_ts - int(HORIZON.total_seconds())
+    availability = {
+        email: store.free_time_index(email).query(start_ts, due_ts)
+        for email in students
+        if store.has_user(email)
+    }
+    found = find_study_groups(availability, start_ts, due_ts, min_duration=min_duration_minutes * 60, **options)
+    return {
+        "assignment_id": assignment_id,
+        "title": assignment["title"],
+        "due": assignment["due"],
+        "groups": [
+            {
+                "members": sorted(window.members),
+                **window.to_dict(),
+                "duration_minutes": window.duration // 60,
+            }
+            for window in found.groups
+        ],
+        "ungrouped": found.ungrouped + [s for s in students if s not in availability],
+        "complete": found.complete,
+    }
+
+def cohort_assignment_ids(title: str, due: str, fuzzy: bool = FUZZY_MATCHING) -> List[str]:
+    """Ids whose students count as one cohort: the exact id, plus near-duplicate copies when fuzzy."""
     if isinstance(due, datetime):
         due = due.isoformat()
-    assignment_id = slugify(f"{title}_{due}")
-    data = load_data()
-    
-    if assignment_id not in data["assignments"]:
-        return []
-        
-    students = data["assignments"][assignment_id]["students"]
-    return [s for s in students if s != email]
-
-def send_user(user: User) -> None:
-    data = load_data()
-    if user.email not in data["users"]:
-        create_user(user.name, user.email)
-        data = load_data()  # Reload after creating user
-        
+    assignment_id = assignment_id_for(title, due)
+    if not fuzzy:
+        return [assignment_id]
+    return [assignment_id] + [i for i in assignment_index.matches(title, due) if i != assignment_id]
+
+def get_overlapping_users_for_assignment(email: str, title: str, due: str, fuzzy: bool = FUZZY_MATCHING) -> List[str]:
+    store = get_store()
+    students: List[str] = []
+    for assignment_id in cohort_assignment_ids(title, due, fuzzy):
+        assignment = store.get_assignment(assignment_id)
+        if assignment:
+            students.extend(s for s in assignment["students"] if s != email and s not in students)
+    return students
+
+def ingest_user(user: User) -> Dict[str, Any]:
+    """Apply a whole User to the store as one transaction with a single journal write.
+
+    Returns a report of what happened to each item: "added" items are new,
+    "unchanged" ones were already stored, "deduplicated" ones were repeated
+    within the payload itself and "skipped" ones were missing fields.
+
+    A user with a weekly template stores that template instead of its
+    expanded free_time, which is rebuilt from it for any window.
+    """
+    report: Dict[str, Any] = {
+        "user_created": False,
+        "assignments": {"added": 0, "unchanged": 0, "deduplicated": 0, "skipped": 0},
+        "free_time": {"added": 0, "unchanged": 0, "deduplicated": 0, "skipped": 0},
+        "availability_updated": False,
+    }
+    records: List[Dict[str, Any]] = [{"op": "create_user", "name": user.name, "email": user.email}]
+    kinds = ["user"]
+
+    # Timestamps are written in one canonical form: the assignment's own
+    # offset for due dates (they are part of the assignment id), UTC for free time
+    seen_assignments = set()
     for assignment in user.assignments:
-        title = assignment["title"]
-        due = assignment["due"]
-        
-        if not title or not due:
+        if not assignment.title:
+            report["assignments"]["skipped"] += 1
             continue
-            
-        if isinstance(due, str):
-            due = datetime.fromisoformat(due)
-            
-        add_assignment_to_user(user.email, title, due)
-        
-    for time_block in user.free_time:
-        start = time_block["start"]
-        end = time_block["end"]
-        
-        if not start or not end:
+        key = (assignment.title, assignment.due_ts)
+        if key in seen_assignments:
+            report["assignments"]["deduplicated"] += 1
             continue
-            
-        if isinstance(start, str):
-            start = datetime.fromisoformat(start)
-        if isinstance(end, str):
-            end = datetime.fromisoformat(end)
-            
-        add_free_time_to_user(user.email, start, end)
-
-def fetch_user_free_times_before_due(emails: List[str], due: datetime) -> List[TimeBlock]:
-    due_datetime = due if isinstance(due, datetime) else datetime.fromisoformat(str(due))
+        seen_assignments.add(key)
+        records.append({"op": "add_assignment", "email": user.email, "title": assignment.title,
+                        "due": assignment.due.isoformat()})
+        kinds.append("assignments")
+
+    if user.availability is not None:
+        records.append({"op": "set_availability", "email": user.email, "availability": user.availability.to_dict()})
+        kinds.append("availability")
+
+    seen_blocks = set()
+    for time_block in (user.free_time if user.availability is None else []):
+        if time_block.end_ts <= time_block.start_ts:
+            report["free_time"]["skipped"] += 1
+            continue
+        if time_block.interval in seen_blocks:
+            report["free_time"]["deduplicated"] += 1
+            continue
+        seen_blocks.add(time_block.interval)
+        records.append({"op": "add_free_time", "email": user.email, **time_block.to_dict()})
+        kinds.append("free_time")
+
+    results = get_store().commit(records)
+    for kind, changed in zip(kinds, results):
+        if kind == "user":
+            report["user_created"] = changed
+        elif kind == "availability":
+            report["availability_updated"] = changed
+        else:
+            report[kind]["added" if changed else "unchanged"] += 1
+    return report
+
+def send_user(user: User) -> Dict[str, Any]:
+    report = ingest_user(user)
+    print(f"📥 Ingested {user.email}: {report}")
+    if (report["user_created"] or report["assignments"]["added"] or report["free_time"]["added"]
+            or report["availability_updated"]):
+        mark_dirty(user.email)
+    return report
+
+# Users whose suggestions should be recomputed soon; drained by scheduler.py
+_dirty_users: Set[str] = set()
+_dirty_lock = threading.Lock()
+
+def mark_dirty(email: str) -> None:
+    with _dirty_lock:
+        _dirty_users.add(email)
+
+def pop_dirty_users() -> List[str]:
+    global _dirty_users
+    with _dirty_lock:
+        dirty, _dirty_users = _dirty_users, set()
+    return list(dirty)
+
+def fetch_user_free_times_before_due(emails: List[str], due: datetime, after: Optional[datetime] = None) -> List[TimeBlock]:
+    """Each user's merged free blocks in [after, due), clipped to that window."""
+    due_ts = iso_to_epoch(due.isoformat() if isinstance(due, datetime) else str(due))
+    after_ts = None
+    if after is not None:
+        after_ts = iso_to_epoch(after.isoformat() if isinstance(after, datetime) else str(after))
     free_times = []
-    data = load_data()
+    store = get_store()
     
     for email in emails:
-        if email not in data["users"]:
+        if not store.has_user(email):
             continue
-        blocks = data["users"][email]["free_time"]
-        for block in blocks:
-            try:
-                start = datetime.fromisoformat(block["start"])
-                end = datetime.fromisoformat(block["end"])
-            except Exception:
-                continue
-                
-            if end <= due_datetime:
-                free_times.append(TimeBlock(start=start, end=end))
+        free_times.extend(store.free_time_index(email).blocks(after_ts, due_ts))
                 
     return free_times
 
 def find_largest_common_block(free_times: List[TimeBlock], group_size: int) -> Optional[Dict[str, str]]:
+    """Longest window covered by the most blocks, up to group_size of them.
+
+    Blocks are anonymous here, so overlapping blocks of one user count as
+    separate people; get_suggestions uses common_windows with user ids instead.
+    """
     if group_size < 2:
         print("Group size is less than 2, found no common time.")
         return None
 
-    timeline = []
-    for block in free_times:
-        timeline.append((block["start"], "start"))
-        timeline.append((block["end"], "end"))
-
-    timeline.sort()
-    current_overlap = 0
-    best_start = None
-    best_end = None
-    active_start = None
-
-    for time, event in timeline:
-        if event == "start":
-            current_overlap += 1
-            if current_overlap == group_size:
-                active_start = time
-        elif event == "end":
-            if current_overlap == group_size and active_start:
-                if best_start is None or (time - active_start) > (best_end - best_start if best_end is not None else timedelta(0)):
-                    best_start = active_start
-                    best_end = time
-                active_start = None
-            current_overlap -= 1
-
-    if best_start and best_end:
-        return {
-            "start": best_start.isoformat(),
-            "end": best_end.isoformat(),
+    availability = {
+        i: [block.interval]
+        for i, block in enumerate(free_times)
+    }
+    windows = common_windows(availability, top_k=1)
+    sizes = [size for size in windows if size <= group_size]
+    if not sizes:
+        print(f"No time shared by 2 to {group_size} blocks.")
+        return None
+    return windows[max(sizes)][0].to_dict()
+
+def find_common_windows(emails: List[str], due_ts: int, min_duration: int = 0,
+                        engine: str = OVERLAP_ENGINE) -> Dict[int, List[CommonWindow]]:
+    """Longest shared free window before due_ts for every group size of the given users."""
+    store = get_store()
+    if engine == "grid":
+        from availability_grid import AvailabilityGrid, HORIZON, SLOT_MINUTES
+        start_ts = due_ts - int(HORIZON.total_seconds())
+        availability = {
+            email: store.free_time_index(email).query(start_ts, due_ts)
+            for email in emails
+            if store.has_user(email)
         }
+        grid = AvailabilityGrid.from_availability(availability, start_ts, due_ts)
+        return grid.best_windows(min_slots=max(1, -(-min_duration // (SLOT_MINUTES * 60))))
 
-    return find_largest_common_block(free_times, group_size - 1)
-
-def get_suggestions(user: User) -> List[Dict[str, Any]]:
+    availability = {
+        email: store.free_time_index(email).query(None, due_ts)
+        for email in emails
+        if store.has_user(email)
+    }
+    return common_windows(availability, top_k=1, min_duration=min_duration)
+
+# Marks a suggestion-cache miss; None is a cached "no suggestion"
+_MISSING = object()
+
+def _suggest(email: str, title: str, due: datetime, policy: str, min_duration_minutes: int, engine: str,
+             shared_windows: Optional[Dict[Any, Optional[CommonWindow]]] = None) -> Optional[Dict[str, Any]]:
+    """One user's suggestion for one assignment, through the suggestion cache.
+
+    shared_windows lets a batch reuse the best window of a cohort that was
+    already computed for another member.
+    """
+    assignment_id = assignment_id_for(title, due.isoformat())
+    key = (email, assignment_id, policy, min_duration_minutes, engine)
+    # Replays other processes' writes, whose records invalidate the cache here
+    get_store().sync()
+    suggestion = suggestion_cache.get(key, _MISSING)
+    if suggestion is not _MISSING:
+        return suggestion
+
+    assignment_ids = cohort_assignment_ids(title, due.isoformat())
+    overlapping_users = get_overlapping_users_for_assignment(email, title, due.isoformat())
+    print("Overlapping users:", overlapping_users, title)
+    suggestion = None
+    if overlapping_users:
+        cohort = [email] + overlapping_users
+        due_ts = datetime_to_epoch(due)
+        shared_key = (frozenset(cohort), due_ts)
+        if shared_windows is not None and shared_key in shared_windows:
+            best_window = shared_windows[shared_key]
+        else:
+            COHORT_SIZE.observe(len(cohort))
+            with WINDOW_SEARCH_SECONDS.time(engine=engine):
+                windows = find_common_windows(cohort, due_ts, min_duration_minutes * 60, engine)
+            best_window = choose_window(windows, policy)
+            if shared_windows is not None:
+                shared_windows[shared_key] = best_window
+        print("Best block:", best_window)
+        if best_window:
+            suggestion = {
+                "assignment": title,
+                "due": due.isoformat(),
+                **best_window.to_dict(),
+                "group_size": len(best_window.members),
+            }
+    suggestion_cache.put(key, suggestion, [email] + overlapping_users, assignment_ids)
+    return suggestion
+
+def get_suggestions(user: User, policy: str = LARGEST_GROUP, min_duration_minutes: int = 0,
+                    engine: str = OVERLAP_ENGINE) -> List[Dict[str, Any]]:
+    """Suggest one study window per assignment the user shares with someone.
+
+    Near-duplicate copies of one assignment form a single cohort (see
+    cohort_assignment_ids) and get a single suggestion. policy picks between the longest slot for the biggest group (the default)
+    and the longest slot overall; see availability.choose_window. engine is
+    "sweep" (exact, see availability.py) or "grid" (15-minute NumPy slots,
+    see availability_grid.py).
+    """
     suggestions = []
+    seen: Set[FrozenSet[str]] = set()
 
     for assignment in user.assignments:
-        title = assignment["title"]
-        due = assignment["due"]
-        if isinstance(due, str):
-            due = datetime.fromisoformat(due)
-
-        overlapping_users = get_overlapping_users_for_assignment(user.email, title, due.isoformat())
-        print("Overlapping users:", overlapping_users, title)
-        if not overlapping_users:
+        cohort = frozenset(cohort_assignment_ids(assignment.title, assignment.due))
+        if cohort in seen:
             continue
-        all_emails = [user.email] + overlapping_users
+        seen.add(cohort)
+        suggestion = _suggest(user.email, assignment.title, assignment.due, policy, min_duration_minutes, engine)
+        if suggestion:
+            suggestions.append(suggestion)
 
-        all_free_times = fetch_user_free_times_before_due(all_emails, due)
+    return suggestions
 
-        best_block = find_largest_common_block(all_free_times, len(all_emails))
-        print("Best block:", best_block)
-        if best_block:
-            suggestions.append({
-                "assignment": title,
-                "due": due.isoformat(),
-                "start": best_block["start"],
-                "end": best_block["end"],
-            })
+def get_batch_suggestions(emails: Union[List[str], str] = "all", policy: str = LARGEST_GROUP,
+                          min_duration_minutes: int = 0, engine: str = OVERLAP_ENGINE) -> Dict[str, List[Dict[str, Any]]]:
+    """get_suggestions for many stored users, computing each cohort only once.
 
-    return suggestions
+    emails is a list of addresses or "all". Work is grouped by assignment id,
+    so when 40 students share an assignment its common window is found once
+    and handed to all 40. Unknown emails map to an empty list.
+    """
+    store = get_store()
+    if emails == "all":
+        emails = store.get_user_emails()
+
+    by_assignment: Dict[str, List[Tuple[str, str, datetime]]] = defaultdict(list)
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    for email in emails:
+        results[email] = []
+        stored = store.get_user(email)
+        if not stored:
+            continue
+        seen: Set[FrozenSet[str]] = set()
+        for assignment in stored["assignments"]:
+            try:
+                due = datetime.fromisoformat(assignment["due"])
+            except (TypeError, ValueError):
+                continue
+            # One suggestion per merged cohort, as in get_suggestions
+            cohort = frozenset(cohort_assignment_ids(assignment["title"], due))
+            if cohort in seen:
+                continue
+            seen.add(cohort)
+            by_assignment[assignment_id_for(assignment["title"], due.isoformat())].append(
+                (email, assignment["title"], due))
+
+    shared_windows: Dict[Any, Optional[CommonWindow]] = {}
+    for members in by_assignment.values():
+        for email, title, due in members:
+            suggestion = _suggest(email, title, due, policy, min_duration_minutes, engine, shared_windows)
+            if suggestion:
+                results[email].append(suggestion)
+    return results
+
+def get_suggestions_for_email(email: str, **options: Any) -> Optional[List[Dict[str, Any]]]:
+    """get_suggestions for a user as stored, without going to Google. None if the user is unknown."""
+    stored = get_store().get_user(email)
+    if not stored:
+        return None
+    return get_suggestions(User.from_dict(stored), **options)
 
 
 
@@ -0,0 +1,445 @@
+"""A local stand-in for the Google endpoints the backend calls, for offline load tests.
+
+Run from the backend directory, e.g.
+
+    python fake_google.py --users 5000 --latency 40 --jitter 20 --error-rate 0.01
+
+and start the app with GOOGLE_API_BASE=http://127.0.0.1:8090 so oauth.py
+talks to it. It serves the token endpoint, userinfo, calendarList,
+events.list (paging, sync tokens, 410 on stale tokens, recurring events
+expanded or not per singleEvents), events.instances and freeBusy.
+
+Fake user ``i`` signs in with the authorization code ``user-<i>`` and gets
+the access token ``fake-access-<i>``. Their calendars are generated from
+--seed the first time they are asked for: a primary calendar of weekly
+class meetings, a monthly meeting (a rule recurring.py can't expand, so
+the app lists it through events.instances) and one-off busy blocks, plus one shared calendar per
+course they take holding that course's assignment deadlines, shaped like
+the benchmark.py population.
+``--fixtures`` serves recorded calendars instead, and ``--dump`` writes
+the synthetic ones out in that same format.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask, jsonify, request
+
+from benchmark import (ASSIGNMENTS_PER_COURSE, BUSY_BLOCKS_PER_DAY, COURSE_SIZE, COURSES_PER_USER, DAYS, KINDS,
+                       SUBJECTS)
+from recurring import WEEKDAYS, single_events, weekly_rule
+
+DEFAULT_PORT = 8090
+# events.list caps maxResults at 2500 and defaults to 250
+MAX_PAGE_SIZE = 2500
+DEFAULT_PAGE_SIZE = 250
+BUSY_TITLES = ["Lecture", "Section", "Club meeting", "Work shift", "Office hours", "Practice"]
+# Weekly class meetings per user, on top of the one-off busy blocks
+CLASSES_PER_USER = (2, 4)
+MEETING_DAYS = ["MO,WE,FR", "TU,TH", "MO,WE", "WE", "TH"]
+
+app = Flask(__name__)
+
+
+class Settings:
+    """Latency and failures injected into every response."""
+
+    def __init__(self) -> None:
+        self.latency = 0.0
+        self.jitter = 0.0
+        self.error_rate = 0.0
+        self.error_statuses: List[int] = [500, 503]
+        # Chance that a valid sync token is answered with 410 Gone anyway
+        self.expire_rate = 0.0
+
+
+settings = Settings()
+# Sync tokens name the server run that issued them; a restart invalidates them all
+GENERATION = f"{int(time.time())}"
+stats: Counter = Counter()
+stats_lock = threading.Lock()
+
+
+def _iso(value: datetime) -> str:
+    return value.isoformat()
+
+
+def _event(event_id: str, summary: str, start: datetime, end: datetime) -> Dict[str, Any]:
+    return {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": summary,
+        "start": {"dateTime": _iso(start)},
+        "end": {"dateTime": _iso(end)},
+    }
+
+
+class SyntheticFixtures:
+    """Seeded users and course calendars, built on demand so large populations start instantly."""
+
+    def __init__(self, n_users: int, seed: int = 0) -> None:
+        self.n_users = n_users
+        self.seed = seed
+        # Relative to today, so everything falls inside the window the app fetches
+        self.start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.n_courses = max(1, n_users // COURSE_SIZE * max(COURSES_PER_USER) // 2)
+        self.user = lru_cache(maxsize=4096)(self._user)
+        self.course = lru_cache(maxsize=4096)(self._course)
+
+    def __len__(self) -> int:
+        return self.n_users
+
+    def _course(self, c: int) -> Tuple[str, List[Dict[str, Any]]]:
+        rng = random.Random(f"{self.seed}:course:{c}")
+        name = f"{rng.choice(SUBJECTS)}{100 + c}"
+        events = []
+        for a in range(ASSIGNMENTS_PER_COURSE):
+            due = self.start + timedelta(days=rng.randrange(1, DAYS), hours=rng.choice([9, 12, 17, 23]))
+            events.append(_event(f"c{c}a{a}", f"{name} {rng.choice(KINDS)} {a + 1}", due - timedelta(hours=1), due))
+        return f"course-{c}@group.calendar.google.com", events
+
+    def _user(self, i: int) -> Optional[Dict[str, Any]]:
+        if not 0 <= i < self.n_users:
+            return None
+        rng = random.Random(f"{self.seed}:user:{i}")
+        busy = []
+        for n in range(rng.randint(*CLASSES_PER_USER)):
+            days = rng.choice(MEETING_DAYS)
+            start = self.start + timedelta(hours=8, minutes=15 * rng.randrange(0, 40))
+            # The first meeting falls on one of the rule's days, as Google requires
+            while WEEKDAYS[start.weekday()] not in days.split(","):
+                start += timedelta(days=1)
+            meeting = _event(f"u{i}r{n}", rng.choice(BUSY_TITLES[:2]), start,
+                             start + timedelta(minutes=rng.choice([50, 75, 90])))
+            meeting["start"]["timeZone"] = meeting["end"]["timeZone"] = "UTC"
+            meeting["recurrence"] = [f"RRULE:FREQ=WEEKLY;BYDAY={days}"]
+            busy.append(meeting)
+        # Day 0 to 27, so every month has it
+        start = self.start + timedelta(days=rng.randrange(0, 28), hours=18)
+        monthly = _event(f"u{i}m0", "Club meeting", start, start + timedelta(hours=1))
+        monthly["recurrence"] = ["RRULE:FREQ=MONTHLY"]
+        busy.append(monthly)
+        for day in range(DAYS):
+            day_start = self.start + timedelta(days=day, hours=8)
+            for n in range(rng.randint(*BUSY_BLOCKS_PER_DAY)):
+                start = day_start + timedelta(minutes=15 * rng.randrange(0, 60))
+                end = start + timedelta(minutes=rng.choice([50, 75, 90, 120]))
+                busy.append(_event(f"u{i}d{day}e{n}", rng.choice(BUSY_TITLES), start, end))
+
+        email = f"user{i}@example.com"
+        calendars = {email: busy}
+        for c in rng.sample(range(self.n_courses), min(self.n_courses, rng.randint(*COURSES_PER_USER))):
+            calendar_id, events = self.course(c)
+            calendars[calendar_id] = events
+        return {"name": f"User {i}", "email": email, "calendars": calendars}
+
+    def dump(self) -> Dict[str, Any]:
+        return {"users": [self.user(i) for i in range(self.n_users)]}
+
+
+class RecordedFixtures:
+    """Calendars loaded from JSON: {"users": [{"name", "email", "calendars": {id: [event, ...]}}]}.
+
+    Events are stored the way events.list returns them. The first calendar
+    of each user is their primary one.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path) as f:
+            self.users = json.load(f)["users"]
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def user(self, i: int) -> Optional[Dict[str, Any]]:
+        return self.users[i] if 0 <= i < len(self.users) else None
+
+
+fixtures: Any = SyntheticFixtures(1000)
+
+
+def _error(status: int, message: str, reason: str = "backendError"):
+    body = {"error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}}
+    return jsonify(body), status
+
+
+def _current_user() -> Optional[Dict[str, Any]]:
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer fake-access-"):
+        return None
+    try:
+        return fixtures.user(int(auth.rsplit("-", 1)[1]))
+    except ValueError:
+        return None
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def _in_window(events: List[Dict[str, Any]], time_min: Optional[datetime],
+               time_max: Optional[datetime]) -> List[Dict[str, Any]]:
+    """Events overlapping the window, recurring ones listed once (singleEvents=false)."""
+    return [
+        e for e in events
+        if "recurrence" in e or (
+            (time_min is None or _parse(e["end"]["dateTime"]) > time_min)
+            and (time_max is None or _parse(e["start"]["dateTime"]) < time_max)
+        )
+    ]
+
+
+def _bounds(time_min: Optional[datetime], time_max: Optional[datetime]) -> Tuple[datetime, datetime]:
+    start = time_min or getattr(fixtures, "start", datetime.now(timezone.utc))
+    return start, time_max or start + timedelta(days=DAYS)
+
+
+def _monthly(event: Dict[str, Any], time_min: datetime, time_max: datetime) -> List[Dict[str, Any]]:
+    """Occurrences of a FREQ=MONTHLY event overlapping the window; other rules recurring.py can't expand give none."""
+    rule = dict(part.split("=", 1) for part in event["recurrence"][0].partition(":")[2].split(";") if "=" in part)
+    if rule.get("FREQ") != "MONTHLY":
+        return []
+    interval = int(rule.get("INTERVAL", 1))
+    count = int(rule["COUNT"]) if "COUNT" in rule else None
+    first = _parse(event["start"]["dateTime"])
+    duration = _parse(event["end"]["dateTime"]) - first
+    zone = event["start"].get("timeZone")
+    occurrences = []
+    n = 0
+    while count is None or n < count:
+        month = first.month - 1 + n * interval
+        n += 1
+        try:
+            start = first.replace(year=first.year + month // 12, month=month % 12 + 1)
+        except ValueError:
+            # Months without that day are skipped, as in RFC 5545
+            continue
+        if start >= time_max:
+            break
+        if start + duration > time_min:
+            instance = {k: v for k, v in event.items() if k != "recurrence"}
+            instance.update({
+                "id": f"{event['id']}_{start.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}",
+                "recurringEventId": event["id"],
+                "originalStartTime": {"dateTime": _iso(start), "timeZone": zone},
+                "start": {"dateTime": _iso(start), "timeZone": zone},
+                "end": {"dateTime": _iso(start + duration), "timeZone": zone},
+            })
+            occurrences.append(instance)
+    return occurrences
+
+
+def _single(events: List[Dict[str, Any]], time_min: Optional[datetime],
+            time_max: Optional[datetime]) -> List[Dict[str, Any]]:
+    """Events overlapping the window with recurring ones expanded (singleEvents=true)."""
+    start, end = _bounds(time_min, time_max)
+    expanded = single_events(events, int(start.timestamp()), int(end.timestamp()))
+    for event in events:
+        if event.get("recurrence") and weekly_rule(event) is None:
+            expanded += _monthly(event, start, end)
+    return expanded
+
+
+def _page(events: List[Dict[str, Any]], kind: str, sync: bool = True):
+    args = request.args
+    page_size = min(int(args.get("maxResults", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    offset = int(args.get("pageToken", 0))
+    response: Dict[str, Any] = {"kind": kind, "items": events[offset:offset + page_size]}
+    if offset + page_size < len(events):
+        response["nextPageToken"] = str(offset + page_size)
+    elif sync:
+        response["nextSyncToken"] = GENERATION
+    return jsonify(response)
+
+
+@app.before_request
+def _inject():
+    with stats_lock:
+        stats[request.endpoint or "unknown"] += 1
+    if request.endpoint == "stats":
+        return None
+    delay = settings.latency + random.uniform(0, settings.jitter)
+    if delay:
+        time.sleep(delay)
+    if settings.error_rate and random.random() < settings.error_rate:
+        with stats_lock:
+            stats["injected_errors"] += 1
+        return _error(random.choice(settings.error_statuses), "Injected failure")
+    return None
+
+
+@app.route("/token", methods=["POST"])
+def token():
+    grant = request.form.get("grant_type")
+    if grant == "authorization_code":
+        code = request.form.get("code", "")
+        user_id = code[len("user-"):] if code.startswith("user-") else ""
+        if not user_id.isdigit() or fixtures.user(int(user_id)) is None:
+            return jsonify({"error": "invalid_grant"}), 400
+    elif grant == "refresh_token":
+        refresh = request.form.get("refresh_token", "")
+        if not refresh.startswith("fake-refresh-"):
+            return jsonify({"error": "invalid_grant"}), 400
+        user_id = refresh.rsplit("-", 1)[1]
+    else:
+        return jsonify({"error": "unsupported_grant_type"}), 400
+    return jsonify({
+        "access_token": f"fake-access-{user_id}",
+        "refresh_token": f"fake-refresh-{user_id}",
+        "expires_in": 3600,
+        "token_type": "Bearer",
+    })
+
+
+@app.route("/v1/userinfo")
+def userinfo():
+    user = _current_user()
+    if user is None:
+        return _error(401, "Invalid credentials", "authError")
+    return jsonify({"sub": user["email"], "name": user["name"], "email": user["email"], "email_verified": True})
+
+
+@app.route("/calendar/v3/users/me/calendarList")
+def calendar_list():
+    user = _current_user()
+    if user is None:
+        return _error(401, "Invalid credentials", "authError")
+    items = [
+        {"kind": "calendar#calendarListEntry", "id": calendar_id, "summary": calendar_id, "primary": True}
+        if n == 0 else
+        {"kind": "calendar#calendarListEntry", "id": calendar_id, "summary": calendar_id}
+        for n, calendar_id in enumerate(user["calendars"])
+    ]
+    return jsonify({"kind": "calendar#calendarList", "items": items})
+
+
+def _calendar(user: Dict[str, Any], calendar_id: str) -> Optional[List[Dict[str, Any]]]:
+    if calendar_id == "primary":
+        calendar_id = next(iter(user["calendars"]))
+    return user["calendars"].get(calendar_id)
+
+
+@app.route("/calendar/v3/calendars/<path:calendar_id>/events")
+def events_list(calendar_id: str):
+    user = _current_user()
+    if user is None:
+        return _error(401, "Invalid credentials", "authError")
+    calendar = _calendar(user, calendar_id)
+    if calendar is None:
+        return _error(404, "Not Found", "notFound")
+
+    args = request.args
+    sync_token = args.get("syncToken")
+    if sync_token:
+        if any(k in args for k in ("timeMin", "timeMax", "orderBy", "updatedMin")):
+            return _error(400, "Sync token can't be combined with timeMin, timeMax, orderBy or updatedMin",
+                          "invalid")
+        if sync_token != GENERATION or random.random() < settings.expire_rate:
+            return _error(410, "Sync token is no longer valid, a full sync is required.", "fullSyncRequired")
+        # Fixtures never change, so nothing has happened since the last sync
+        events: List[Dict[str, Any]] = []
+    else:
+        single = args.get("singleEvents") == "true"
+        if args.get("orderBy") == "startTime" and not single:
+            return _error(400, "The requested ordering is not available for the particular query.", "invalid")
+        window = _single if single else _in_window
+        events = window(calendar, _parse(args.get("timeMin")), _parse(args.get("timeMax")))
+        if args.get("orderBy") == "startTime":
+            events = sorted(events, key=lambda e: _parse(e["start"]["dateTime"]))
+    return _page(events, "calendar#events")
+
+
+@app.route("/calendar/v3/calendars/<path:calendar_id>/events/<event_id>/instances")
+def events_instances(calendar_id: str, event_id: str):
+    user = _current_user()
+    if user is None:
+        return _error(401, "Invalid credentials", "authError")
+    calendar = _calendar(user, calendar_id)
+    event = next((e for e in calendar or [] if e["id"] == event_id), None)
+    if event is None:
+        return _error(404, "Not Found", "notFound")
+    if not event.get("recurrence"):
+        return _page([event], "calendar#events", sync=False)
+
+    start, end = _bounds(_parse(request.args.get("timeMin")), _parse(request.args.get("timeMax")))
+    instances = _single([event], start, end)
+    return _page(sorted(instances, key=lambda e: _parse(e["start"]["dateTime"])), "calendar#events", sync=False)
+
+
+@app.route("/calendar/v3/freeBusy", methods=["POST"])
+def free_busy():
+    user = _current_user()
+    if user is None:
+        return _error(401, "Invalid credentials", "authError")
+    body = request.get_json(silent=True) or {}
+    time_min, time_max = _parse(body.get("timeMin")), _parse(body.get("timeMax"))
+    if time_min is None or time_max is None:
+        return _error(400, "timeMin and timeMax are required", "required")
+
+    calendars = {}
+    for item in body.get("items", []):
+        calendar_id = item.get("id")
+        events = _calendar(user, calendar_id)
+        if events is None:
+            calendars[calendar_id] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+            continue
+        intervals = sorted((max(_parse(e["start"]["dateTime"]), time_min), min(_parse(e["end"]["dateTime"]), time_max))
+                           for e in _single(events, time_min, time_max))
+        busy: List[List[datetime]] = []
+        for start, end in intervals:
+            if busy and start <= busy[-1][1]:
+                busy[-1][1] = max(busy[-1][1], end)
+            else:
+                busy.append([start, end])
+        calendars[calendar_id] = {"busy": [{"start": _iso(s), "end": _iso(e)} for s, e in busy]}
+    return jsonify({"kind": "calendar#freeBusy", "timeMin": _iso(time_min), "timeMax": _iso(time_max),
+                    "calendars": calendars})
+
+
+@app.route("/_stats", endpoint="stats")
+def stats_endpoint():
+    """Requests served per endpoint, plus the number of injected errors."""
+    with stats_lock:
+        return jsonify(dict(stats))
+
+
+def main() -> None:
+    global fixtures
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="synthetic users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures", help="serve recorded calendars from this JSON file")
+    parser.add_argument("--dump", help="write the synthetic fixtures to this file and exit")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra random milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, nargs="+", default=[500, 503], help="statuses injected errors use")
+    parser.add_argument("--expire-rate", type=float, default=0.0, help="fraction of sync tokens rejected with 410")
+    args = parser.parse_args()
+
+    fixtures = RecordedFixtures(args.fixtures) if args.fixtures else SyntheticFixtures(args.users, args.seed)
+    if args.dump:
+        with open(args.dump, "w") as f:
+            json.dump(fixtures.dump() if isinstance(fixtures, SyntheticFixtures) else {"users": fixtures.users}, f)
+        print(f"✅ Wrote {len(fixtures)} users to {args.dump}")
+        return
+
+    settings.latency = args.latency / 1000
+    settings.jitter = args.jitter / 1000
+    settings.error_rate = args.error_rate
+    settings.error_statuses = args.error_status
+    settings.expire_rate = args.expire_rate
+    print(f"🧪 Fake Google serving {len(fixtures)} users on http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
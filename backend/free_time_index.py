@@ -0,0 +1,119 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from models import TimeBlock
+from recurring import RecurringAvailability
+from store import iso_to_epoch
+
+# Windows of a weekly template kept expanded per user; suggestions ask for the same due dates repeatedly
+EXPANDED_WINDOWS = 8
+
+
+def epoch_to_datetime(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+class FreeTimeIndex:
+    """Sorted, merged free intervals of one user, keyed by epoch seconds.
+
+    Overlapping or touching blocks are merged on insert, so ``starts`` and
+    ``ends`` are both strictly increasing and a window query is two binary
+    searches plus the blocks it actually returns. Inserts build new lists
+    and swap both in as one pair, so a concurrent query never sees them
+    out of step.
+
+    A user with a weekly template (see recurring.py) also gets that
+    template's free time, expanded for the queried window and merged with
+    the stored blocks.
+    """
+
+    def __init__(self, recurring: Optional[RecurringAvailability] = None) -> None:
+        self._intervals: Tuple[List[int], List[int]] = ([], [])
+        self.recurring = recurring
+        self._expanded: Dict[Tuple[Optional[int], Optional[int]], List[Tuple[int, int]]] = {}
+
+    @classmethod
+    def from_blocks(cls, blocks: List[Dict[str, str]],
+                    recurring: Optional[RecurringAvailability] = None) -> "FreeTimeIndex":
+        intervals = []
+        for block in blocks:
+            try:
+                intervals.append((iso_to_epoch(block["start"]), iso_to_epoch(block["end"])))
+            except (KeyError, ValueError):
+                continue
+        starts: List[int] = []
+        ends: List[int] = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        index = cls(recurring)
+        index._intervals = (starts, ends)
+        return index
+
+    @property
+    def starts(self) -> List[int]:
+        return self._intervals[0]
+
+    @property
+    def ends(self) -> List[int]:
+        return self._intervals[1]
+
+    def __len__(self) -> int:
+        return len(self._intervals[0])
+
+    def add(self, start: int, end: int) -> None:
+        if end <= start:
+            return
+        starts, ends = self._intervals
+        # Every interval from lo to hi - 1 overlaps or touches [start, end]
+        lo = bisect_left(ends, start)
+        hi = bisect_right(starts, end)
+        if lo < hi:
+            start = min(start, starts[lo])
+            end = max(end, ends[hi - 1])
+        self._intervals = (starts[:lo] + [start] + starts[hi:], ends[:lo] + [end] + ends[hi:])
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Free intervals intersecting [start, end), clipped to the window."""
+        if start is not None and end is not None and end <= start:
+            return []
+        starts, ends = self._intervals
+        lo = 0 if start is None else bisect_right(ends, start)
+        hi = len(starts) if end is None else bisect_left(starts, end)
+        result = []
+        for i in range(lo, hi):
+            s = starts[i] if start is None else max(starts[i], start)
+            e = ends[i] if end is None else min(ends[i], end)
+            result.append((s, e))
+        if self.recurring is None:
+            return result
+        expanded = self._expand(start, end)
+        if not result:
+            return list(expanded)
+        merged: List[Tuple[int, int]] = []
+        for s, e in sorted(result + expanded):
+            if merged and s <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+        return merged
+
+    def _expand(self, start: Optional[int], end: Optional[int]) -> List[Tuple[int, int]]:
+        key = (start, end)
+        expanded = self._expanded.get(key)
+        if expanded is None:
+            expanded = self.recurring.expand(start, end)
+            # Replaced rather than trimmed, so concurrent readers never see it change size
+            cache = {} if len(self._expanded) >= EXPANDED_WINDOWS else dict(self._expanded)
+            cache[key] = expanded
+            self._expanded = cache
+        return expanded
+
+    def blocks(self, start: Optional[int] = None, end: Optional[int] = None) -> List[TimeBlock]:
+        return [TimeBlock(s, e) for s, e in self.query(start, end)]
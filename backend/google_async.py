@@ -0,0 +1,176 @@
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from calendar_fetch import CALENDAR_FETCH_DEADLINE, RECURRING_FIELDS, FetchResult
+from calendar_sync import PAGE_SIZE, SyncTokenExpired, calendar_sync
+from client_cache import client_cache
+from metrics import google_api_call
+from models import User
+from oauth import (CALENDAR_API, DAY_END, DAY_START, HORIZON, RECURRING_HORIZON, USER_DATA_SECONDS, USERINFO_URL,
+                   build_user)
+from recurring import needs_instances
+
+# Connection pool shared by every request on the event loop
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+REQUEST_TIMEOUT = 10.0
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def client() -> httpx.AsyncClient:
+    """The pooled AsyncClient, created on first use inside the running loop."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+            timeout=REQUEST_TIMEOUT,
+        )
+    return _client
+
+
+async def aclose() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _get(creds, endpoint: str, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    with google_api_call(endpoint):
+        response = await client().get(url, params=params, headers={"Authorization": f"Bearer {creds.token}"})
+        if response.status_code == 410:
+            raise SyncTokenExpired(url)
+        response.raise_for_status()
+    return response.json()
+
+
+async def _paged(creds, endpoint: str, url: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    page_token = None
+    while True:
+        page_params = dict(params, pageToken=page_token) if page_token else params
+        response = await _get(creds, endpoint, url, page_params)
+        items += response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return items
+
+
+async def list_calendars(creds) -> List[Dict[str, Any]]:
+    return await _paged(creds, "calendarList.list", f"{CALENDAR_API}/users/me/calendarList", {})
+
+
+def _events_url(calendar_id: str) -> str:
+    return f"{CALENDAR_API}/calendars/{quote(calendar_id, safe='')}/events"
+
+
+async def list_events(creds, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Dict[str, Any]]:
+    """All events of one calendar in [time_min, time_max), following every page."""
+    return await _paged(creds, "events.list", _events_url(calendar_id), {
+        "timeMin": time_min.isoformat(),
+        "timeMax": time_max.isoformat(),
+        "maxResults": PAGE_SIZE,
+        "singleEvents": False,
+    })
+
+
+async def list_instances(creds, calendar_id: str, event_id: str, time_min: datetime,
+                         time_max: datetime) -> List[Dict[str, Any]]:
+    """Occurrences of one recurring event in [time_min, time_max), for rules recurring.py can't expand."""
+    url = f"{_events_url(calendar_id)}/{quote(event_id, safe='')}/instances"
+    return await _paged(creds, "events.instances", url, {
+        "timeMin": time_min.isoformat(),
+        "timeMax": time_max.isoformat(),
+        "maxResults": PAGE_SIZE,
+    })
+
+
+async def list_recurring(creds, calendar_id: str, time_min: datetime, time_max: datetime) -> List[Dict[str, Any]]:
+    """Recurring events of one calendar in [time_min, time_max), without the one-off events."""
+    events = await _paged(creds, "events.list", _events_url(calendar_id), {
+        "timeMin": time_min.isoformat(),
+        "timeMax": time_max.isoformat(),
+        "maxResults": PAGE_SIZE,
+        "singleEvents": False,
+        "fields": RECURRING_FIELDS,
+    })
+    return [e for e in events if e.get("recurrence")]
+
+
+async def fetch_events(creds, calendar_ids: List[str], user_key: str, time_min: datetime,
+                       time_max: datetime, incremental: bool = True,
+                       deadline: float = CALENDAR_FETCH_DEADLINE,
+                       recurring_until: Optional[datetime] = None) -> FetchResult:
+    """calendar_fetch.fetch_events on the event loop: every calendar is awaited at once."""
+    until = max(time_max, recurring_until or time_max)
+
+    async def fetch(calendar_id: str) -> List[Dict[str, Any]]:
+        if incremental:
+            url = _events_url(calendar_id)
+            # The synced copy already holds every recurring event
+            events = await calendar_sync.events_async(
+                lambda params: _get(creds, "events.list", url, params),
+                user_key, calendar_id, time_min, time_max,
+            )
+        else:
+            events = await list_events(creds, calendar_id, time_min, time_max)
+            if until > time_max:
+                seen = {e["id"] for e in events}
+                events += [e for e in await list_recurring(creds, calendar_id, time_max, until)
+                           if e["id"] not in seen]
+        instances = await asyncio.gather(*(list_instances(creds, calendar_id, e["id"], time_min, until)
+                                           for e in events if needs_instances(e)))
+        return events + [event for found in instances for event in found]
+
+    tasks = {asyncio.ensure_future(fetch(calendar_id)): calendar_id for calendar_id in calendar_ids}
+    result = FetchResult()
+    if not tasks:
+        return result
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    for task in done:
+        try:
+            result.events += task.result()
+        except Exception as e:
+            result.failed[tasks[task]] = str(e)
+    for task in pending:
+        task.cancel()
+        result.timed_out.append(tasks[task])
+
+    if not result.complete:
+        print(f"⚠️ Partial calendar fetch for {user_key}: {result.report()}")
+    return result
+
+
+async def get_user_info(creds) -> Tuple[str, str]:
+    info = client_cache.cached_userinfo(creds)
+    if info is None:
+        response = await _get(creds, "userinfo", USERINFO_URL)
+        info = (response["name"], response["email"])
+        client_cache.put_userinfo(creds, info)
+    return info
+
+
+async def get_user_data_async(creds, incremental: bool = True, horizon: timedelta = HORIZON,
+                              day_start: time = DAY_START, day_end: time = DAY_END) -> Tuple[User, FetchResult]:
+    """oauth.get_user_data_with_report without blocking the event loop on Google."""
+    # google-auth only refreshes synchronously; keep it off the loop
+    await asyncio.to_thread(client_cache.refresh_if_expiring, creds)
+    with USER_DATA_SECONDS.time(incremental=incremental):
+        now = datetime.now(timezone.utc)
+        time_min = now
+        time_max = now + horizon
+        template_until = now + max(horizon, RECURRING_HORIZON)
+
+        calendars, info = await asyncio.gather(list_calendars(creds), get_user_info(creds))
+        # Sync state is kept per user, under the account email
+        fetched = await fetch_events(creds, [cal["id"] for cal in calendars], info[1], time_min, time_max,
+                                     incremental, recurring_until=template_until)
+        user = build_user(info[0], info[1], fetched.events, time_min, time_max, template_until, day_start, day_end)
+        return user, fetched
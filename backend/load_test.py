@@ -0,0 +1,104 @@
+"""Drive simulated logins through a running backend and measure throughput.
+
+Start fake_google.py, then the app pointed at it, then run from the backend
+directory, e.g.
+
+    python load_test.py --users 2000 --concurrency 32 --output load.json
+
+Each simulated user gets their own cookie jar, signs in through
+/oauth2callback with the authorization code fake_google.py accepts for
+them, then asks /api/suggestions (and, with --current, /api/user/current).
+Results are written as JSON: requests per second overall plus latency
+percentiles and status counts per step.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+from benchmark import summarize
+
+DEFAULT_TARGET = "http://127.0.0.1:5000"
+
+Step = Tuple[str, float, int]
+
+
+def simulate(target: str, user: int, current: bool) -> List[Step]:
+    """One user's session: (step, seconds, status) for each request, status 0 if it never answered."""
+    steps = [("GET /oauth2callback", "get", f"/oauth2callback?code=user-{user}")]
+    if current:
+        steps.append(("GET /api/user/current", "get", "/api/user/current"))
+    steps.append(("POST /api/suggestions", "post", "/api/suggestions"))
+
+    results = []
+    with requests.Session() as session:
+        for name, method, path in steps:
+            started = time.perf_counter()
+            try:
+                status = session.request(method, target + path, allow_redirects=False, timeout=60).status_code
+            except requests.RequestException:
+                status = 0
+            results.append((name, time.perf_counter() - started, status))
+            if name == "GET /oauth2callback" and status != 302:
+                break
+    return results
+
+
+def run(target: str, users: int, first: int, concurrency: int, current: bool) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        sessions = list(pool.map(lambda u: simulate(target, u, current), range(first, first + users)))
+    elapsed = time.perf_counter() - started
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    for steps in sessions:
+        for name, seconds, status in steps:
+            samples[name].append(seconds)
+            statuses[name][str(status)] += 1
+    requests_made = sum(len(steps) for steps in sessions)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(users / elapsed, 2),
+        "requests_per_s": round(requests_made / elapsed, 2),
+        "steps": [{"step": name, **summarize(samples[name]), "statuses": dict(statuses[name])} for name in samples],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="base URL of the backend")
+    parser.add_argument("--users", type=int, default=500, help="simulated logins")
+    parser.add_argument("--first", type=int, default=0, help="fake_google.py user number to start from")
+    parser.add_argument("--concurrency", type=int, default=16, help="sessions in flight at once")
+    parser.add_argument("--current", action="store_true", help="also request /api/user/current after login")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    print(f"⏱️ {args.users} logins against {args.target}, {args.concurrency} at a time", file=sys.stderr)
+    report = {
+        "config": {
+            "target": args.target,
+            "users": args.users,
+            "first": args.first,
+            "concurrency": args.concurrency,
+            "current": args.current,
+        },
+        "results": run(args.target, args.users, args.first, args.concurrency, args.current),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote results to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,104 @@
-from datetime import datetime
-from typing import List, Optional, Dict, Any, TypedDict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Tuple, Union
 from dataclasses import dataclass, field
 
-class TimeBlock(TypedDict):
-    start: datetime
-    end: datetime
+from recurring import RecurringAvailability
 
-class Assignment(TypedDict):
-    title: str
-    due: datetime
-    description: Optional[str]
+# Anything a timestamp may arrive as: a datetime, an ISO string or epoch seconds
+Timestamp = Union[datetime, str, int]
+
+def to_epoch(value: Timestamp) -> int:
+    """UTC epoch seconds; naive datetimes and strings are read as UTC."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def _utc_offset(value: Timestamp) -> Optional[int]:
+    """Offset of the original timestamp in seconds, so it can be shown the way the calendar wrote it.
+
+    None for a naive timestamp, which stays naive; epoch seconds count as UTC.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        offset = value.utcoffset()
+        return None if offset is None else int(offset.total_seconds())
+    return 0
+
+class TimeBlock:
+    """A half-open interval [start, end) held as two UTC epoch-second ints."""
+    __slots__ = ("start_ts", "end_ts")
+
+    def __init__(self, start: Timestamp, end: Timestamp) -> None:
+        self.start_ts = to_epoch(start)
+        self.end_ts = to_epoch(end)
+
+    @property
+    def start(self) -> datetime:
+        return datetime.fromtimestamp(self.start_ts, timezone.utc)
+
+    @property
+    def end(self) -> datetime:
+        return datetime.fromtimestamp(self.end_ts, timezone.utc)
+
+    @property
+    def interval(self) -> Tuple[int, int]:
+        return self.start_ts, self.end_ts
+
+    def __iter__(self):
+        # Lets callers write start, end = block
+        return iter((self.start, self.end))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TimeBlock) and self.interval == other.interval
+
+    def __hash__(self) -> int:
+        return hash(self.interval)
+
+    def __repr__(self) -> str:
+        return f"TimeBlock({self.start.isoformat()}, {self.end.isoformat()})"
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"start": self.start.isoformat(), "end": self.end.isoformat()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TimeBlock':
+        return cls(data["start"], data["end"])
+
+class Assignment:
+    """An assignment with its due time as UTC epoch seconds plus the calendar's UTC offset (None if naive)."""
+    __slots__ = ("title", "due_ts", "utc_offset", "description")
+
+    def __init__(self, title: str, due: Timestamp, description: Optional[str] = None) -> None:
+        self.title = title
+        self.due_ts = to_epoch(due)
+        self.utc_offset = _utc_offset(due)
+        self.description = description
+
+    @property
+    def due(self) -> datetime:
+        # Keeping the offset, or its absence, keeps due.isoformat(), and so assignment ids, stable
+        if self.utc_offset is None:
+            return datetime.fromtimestamp(self.due_ts, timezone.utc).replace(tzinfo=None)
+        return datetime.fromtimestamp(self.due_ts, timezone(timedelta(seconds=self.utc_offset)))
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, Assignment) and
+                (self.title, self.due_ts, self.description) == (other.title, other.due_ts, other.description))
+
+    def __repr__(self) -> str:
+        return f"Assignment({self.title!r}, {self.due.isoformat()})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"title": self.title, "due": self.due.isoformat(), "description": self.description}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Assignment':
+        return cls(data["title"], data["due"], data.get("description"))
 
 @dataclass
 class User:
@@ -17,81 +106,49 @@ class User:
     email: str
     assignments: List[Assignment] = field(default_factory=list)
     free_time: List[TimeBlock] = field(default_factory=list)
+    # Weekly template the free time was expanded from, when it came from a calendar fetch
+    availability: Optional[RecurringAvailability] = None
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert the User object to a dictionary for serialization."""
-        return {
+        data = {
             "name": self.name,
             "email": self.email,
-            "assignments": [
-                {
-                    "title": a["title"],
-                    "due": a["due"].isoformat(),
-                    "description": a.get("description")
-                }
-                for a in self.assignments
-            ],
-            "free_time": [
-                {
-                    "start": block["start"].isoformat(),
-                    "end": block["end"].isoformat()
-                }
-                for block in self.free_time
-            ]
+            "assignments": [a.to_dict() for a in self.assignments],
+            "free_time": [block.to_dict() for block in self.free_time]
         }
+        if self.availability is not None:
+            data["availability"] = self.availability.to_dict()
+        return data
 
     def to_json(self) -> str:
         """Convert the User object to a JSON string."""
         import json
         return json.dumps(self.to_dict())
 
-    def add_assignment(self, title: str, due: datetime, description: Optional[str] = None) -> None:
+    def add_assignment(self, title: str, due: Timestamp, description: Optional[str] = None) -> None:
         """Add a new assignment to the user's list of assignments."""
-        assignment: Assignment = {
-            "title": title,
-            "due": due,
-            "description": description
-        }
-        self.assignments.append(assignment)
+        self.assignments.append(Assignment(title, due, description))
 
-    def add_free_time(self, start: datetime, end: datetime) -> None:
+    def add_free_time(self, start: Timestamp, end: Timestamp) -> None:
         """Add a new free time block to the user's list of free times."""
-        time_block: TimeBlock = {
-            "start": start,
-            "end": end
-        }
-        self.free_time.append(time_block)
+        self.free_time.append(TimeBlock(start, end))
 
-    def set_free_time_from_blocks(self, blocks: List[tuple[datetime, datetime]]) -> None:
+    def set_free_time_from_blocks(self, blocks: List[Tuple[Timestamp, Timestamp]]) -> None:
         """Convert list of (start, end) tuples into free_time blocks."""
-        self.free_time = [
-            TimeBlock(start=start, end=end)
-            for start, end in blocks
-        ]
+        self.free_time = [TimeBlock(start, end) for start, end in blocks]
+
+    def free_time_intervals(self) -> List[Tuple[int, int]]:
+        """Free time as (start, end) epoch seconds, the form the overlap code works on."""
+        return [block.interval for block in self.free_time]
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'User':
         """Create a User object from a dictionary."""
-        assignments: List[Assignment] = [
-            Assignment(
-                title=a["title"],
-                due=datetime.fromisoformat(a["due"]),
-                description=a.get("description")
-            )
-            for a in data.get("assignments", [])
-        ]
-        
-        free_time: List[TimeBlock] = [
-            TimeBlock(
-                start=datetime.fromisoformat(block["start"]),
-                end=datetime.fromisoformat(block["end"])
-            )
-            for block in data.get("free_time", [])
-        ]
-        
         return cls(
             name=data["name"],
             email=data["email"],
-            assignments=assignments,
-            free_time=free_time
+            assignments=[Assignment.from_dict(a) for a in data.get("assignments", [])],
+            free_time=[TimeBlock.from_dict(block) for block in data.get("free_time", [])],
+            availability=RecurringAvailability.from_dict(data["availability"]) if data.get("availability") else None
         )
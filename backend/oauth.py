@@ -1,13 +1,17 @@
 import os
 from datetime import datetime, timedelta, time, timezone
-from flask import session
+from flask import session, has_request_context
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 import pickle
-from models import User, Assignment, TimeBlock
-from typing import List
+from models import User, Assignment, TimeBlock, to_epoch
+from recurring import RecurringAvailability, single_events
+from calendar_fetch import FetchResult, authorized_http, fetch_events
+from client_cache import client_cache, http_session
+import metrics
+from metrics import google_api_call
+from typing import Iterable, List, Tuple
 
 CLIENT_SECRETS_FILE = "secrets.json"
 SCOPES = [
@@ -19,138 +23,209 @@ SCOPES = [
     "openid"
 ]
 REDIRECT_URI = "http://127.0.0.1:5000/oauth2callback"
+# Send every Google call to another server instead, e.g. fake_google.py for offline load tests
+GOOGLE_API_BASE = os.environ.get("GOOGLE_API_BASE", "").rstrip("/")
+if GOOGLE_API_BASE:
+    USERINFO_URL = f"{GOOGLE_API_BASE}/v1/userinfo"
+    CALENDAR_API = f"{GOOGLE_API_BASE}/calendar/v3"
+else:
+    USERINFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
+    CALENDAR_API = "https://www.googleapis.com/calendar/v3"
+TOKEN_FILE = "token.pickle"
+
+# How far ahead get_user_data looks, and the part of each day counted as free
+HORIZON = timedelta(weeks=2)
+DAY_START = time(8, 0)
+DAY_END = time(23, 59)
+# How far ahead the weekly availability template is valid; one-off events are fetched this far
+RECURRING_HORIZON = timedelta(weeks=int(os.environ.get("RECURRING_HORIZON_WEEKS", 16)))
+
+USER_DATA_SECONDS = metrics.histogram("google_user_data_seconds", "Wall time of get_user_data, all Google calls included.")
 
 KEYWORDS = ["homework", "assignment", "due", "project", "exam", "test", "quiz", "presentation", "report", "paper", "lab", "study", "reading", "workshop"]
 
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
 def get_flow():
+    if GOOGLE_API_BASE:
+        # The stand-in server issues tokens itself and accepts any client
+        client_config = {"web": {
+            "client_id": "fake-client",
+            "client_secret": "fake-secret",
+            "auth_uri": f"{GOOGLE_API_BASE}/auth",
+            "token_uri": f"{GOOGLE_API_BASE}/token",
+        }}
+        return Flow.from_client_config(client_config, scopes=SCOPES, redirect_uri=REDIRECT_URI)
     return Flow.from_client_secrets_file(CLIENT_SECRETS_FILE, scopes=SCOPES, redirect_uri=REDIRECT_URI)
 
 
-def get_credentials():
+def _load_credentials():
     creds = None
     # Try to load from token.pickle (your cached creds)
-    if os.path.exists("token.pickle"):
-        with open("token.pickle", "rb") as token:
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE, "rb") as token:
             creds = pickle.load(token)
 
     # If no valid creds, use session
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+            with google_api_call("token.refresh"):
+                creds.refresh(Request(session=http_session))
         elif "credentials" in session:
             creds = Credentials(**session["credentials"])
         else:
             raise Exception("No valid credentials found")
 
-        # Save back to token.pickle
-        with open("token.pickle", "wb") as token:
-            pickle.dump(creds, token)
+        _save_credentials(creds)
 
     return creds
 
-def get_user_data(creds):
-    service = build("calendar", "v3", credentials=creds)
-    now = datetime.now(timezone.utc)
+def _save_credentials(creds) -> None:
+    # Save back to token.pickle
+    with open(TOKEN_FILE, "wb") as token:
+        pickle.dump(creds, token)
 
-    # Define time range
-    time_min = now
-    time_max = now + timedelta(weeks=2)
-
-    # Convert to ISO 8601 format with a 'Z' suffix
-    time_min_str = time_min.isoformat()
-    time_max_str = time_max.isoformat()
-
-    events = []
-    for cal in service.calendarList().list().execute().get("items", []):
-        events += service.events().list(
-            calendarId=cal["id"],
-            timeMin=time_min_str,
-            timeMax=time_max_str,
-            maxResults=250,
-            singleEvents=True,
-            orderBy="startTime"
-        ).execute().get("items", [])
-
-    busy_times = []
-    assignments = []
-    for e in events:
-        if any(e["summary"] == assignment["title"] and datetime.fromisoformat(e["end"]["dateTime"]) == assignment["due"] for assignment in assignments):
-            continue
-        if "start" not in e or "dateTime" not in e["start"]:
-            continue
-        start = datetime.fromisoformat(e["start"]["dateTime"])
-        end = datetime.fromisoformat(e["end"]["dateTime"])
-        busy_times.append(TimeBlock(start=start, end=end))
-        
-        if any(k.lower() in e["summary"].lower() for k in KEYWORDS):
-            assignment: Assignment = {
-                "title": e["summary"],
-                "due": end,
-                "description": e.get("description")
-            }
-            assignments.append(assignment)
-
-    busy_times = merge_intervals(sorted(busy_times, key=lambda x: x["start"]))
-    free_blocks = get_free_blocks(busy_times, time_min, time_max)
-    userInfo = get_user_info(creds)
-    user = User(userInfo[0], userInfo[1], assignments, free_blocks)
-    return user
+def get_credentials():
+    # Signed-in users are cached under their email; otherwise under the token file
+    key = session.get("user_email", TOKEN_FILE) if has_request_context() else TOKEN_FILE
+    creds = client_cache.get_credentials(key)
+    if creds is None:
+        creds = _load_credentials()
+        client_cache.put_credentials(key, creds)
+    if client_cache.refresh_if_expiring(creds):
+        _save_credentials(creds)
+    return creds
 
-def get_user_info(creds):
-    import requests
-    import json 
-    # Define the UserInfo endpoint URL
-    userinfo_url = 'https://openidconnect.googleapis.com/v1/userinfo'
+def get_user_data(creds, incremental: bool = True):
+    return get_user_data_with_report(creds, incremental)[0]
 
-    # Prepare the headers with the access token
-    headers = {
-    'Authorization': f'Bearer {creds.token}'
-    }
+def get_user_data_with_report(creds, incremental: bool = True, horizon: timedelta = HORIZON,
+                              day_start: time = DAY_START, day_end: time = DAY_END) -> Tuple[User, FetchResult]:
+    with USER_DATA_SECONDS.time(incremental=incremental):
+        return _get_user_data(creds, incremental, horizon, day_start, day_end)
 
-    # Make the GET request to the UserInfo endpoint
-    response = requests.get(userinfo_url, headers=headers).content
+def _get_user_data(creds, incremental: bool, horizon: timedelta,
+                   day_start: time, day_end: time) -> Tuple[User, FetchResult]:
+    service = client_cache.calendar_service(creds, f"{CALENDAR_API}/" if GOOGLE_API_BASE else None)
+    now = datetime.now(timezone.utc)
 
-    print(response)
-    # print(response.json())
-    decoded_response = response.decode('utf-8')
+    # Define time range
+    time_min = now
+    time_max = now + horizon
+    template_until = now + max(horizon, RECURRING_HORIZON)
+
+    with google_api_call("calendarList.list"):
+        calendars = service.calendarList().list().execute(http=authorized_http(creds)).get("items", [])
+    userInfo = client_cache.userinfo(creds, get_user_info)
+
+    # Sync state is kept per user, under the account email
+    fetched = fetch_events(service, creds, [cal["id"] for cal in calendars], userInfo[1],
+                           time_min, time_max, incremental=incremental, recurring_until=template_until)
+    user = build_user(userInfo[0], userInfo[1], fetched.events, time_min, time_max, template_until,
+                      day_start, day_end)
+    return user, fetched
+
+def build_user(name: str, email: str, events: List[dict], time_min: datetime, time_max: datetime,
+               template_until: datetime, day_start: time = DAY_START, day_end: time = DAY_END) -> User:
+    """A User from events listed with singleEvents=False.
+
+    Assignments and free_time cover [time_min, time_max) as before; the
+    weekly template they come from stays valid until ``template_until``.
+    One-off events are only fetched up to time_max, so past it the template
+    holds recurring events alone.
+    """
+    # Whole hours, so logging in again within the hour doesn't rewrite an unchanged template
+    since = time_min.replace(minute=0, second=0, microsecond=0)
+    until = template_until.replace(minute=0, second=0, microsecond=0)
+    availability = RecurringAvailability.from_events(events, since, until, day_start, day_end)
+    window = sorted(single_events(events, to_epoch(time_min), to_epoch(time_max)), key=_event_start)
+    _, assignments = scan_events(window)
+    free_blocks = [TimeBlock(s, e) for s, e in availability.expand(to_epoch(time_min), to_epoch(time_max))]
+    return User(name, email, assignments, free_blocks, availability)
+
+def _event_start(event) -> datetime:
+    start = event.get("start", {})
+    if "dateTime" in start:
+        return datetime.fromisoformat(start["dateTime"])
+    # All-day events only carry a date; they are skipped later anyway
+    return datetime.fromisoformat(start.get("date", "1970-01-01")).replace(tzinfo=timezone.utc)
 
-    # Step 2: Parse the JSON string into a dictionary
-    parsed_response = json.loads(decoded_response)
+def get_user_info(creds):
+    # Make the GET request to the UserInfo endpoint over the pooled session
+    with google_api_call("userinfo"):
+        response = http_session.get(USERINFO_URL, headers={"Authorization": f"Bearer {creds.token}"})
+        response.raise_for_status()
+    parsed_response = response.json()
 
-    # Step 3: Access members
     name = parsed_response['name']
     email = parsed_response['email']
 
     return name, email
 
+def scan_events(events: Iterable[dict]) -> Tuple[List[TimeBlock], List[Assignment]]:
+    """Merged busy intervals and detected assignments from events sorted by start, in one pass."""
+    busy_times: List[TimeBlock] = []
+    assignments: List[Assignment] = []
+    seen_assignments = set()
+    for e in events:
+        if "start" not in e or "dateTime" not in e["start"]:
+            continue
+        summary = e.get("summary", "")
+        end = datetime.fromisoformat(e["end"]["dateTime"])
+        end_ts = to_epoch(end)
+        if (summary, end_ts) in seen_assignments:
+            continue
+        start_ts = to_epoch(e["start"]["dateTime"])
+
+        if busy_times and start_ts <= busy_times[-1].end_ts:
+            busy_times[-1].end_ts = max(busy_times[-1].end_ts, end_ts)
+        else:
+            busy_times.append(TimeBlock(start_ts, end_ts))
+
+        if any(k in summary.lower() for k in KEYWORDS):
+            seen_assignments.add((summary, end_ts))
+            assignments.append(Assignment(summary, end, e.get("description")))
+    return busy_times, assignments
+
 def merge_intervals(intervals: List[TimeBlock]) -> List[TimeBlock]:
     merged: List[TimeBlock] = []
     for interval in intervals:
-        if not merged or interval["start"] > merged[-1]["end"]:
-            merged.append(interval)
+        if not merged or interval.start_ts > merged[-1].end_ts:
+            merged.append(TimeBlock(interval.start_ts, interval.end_ts))
         else:
-            merged[-1] = TimeBlock(start=merged[-1]["start"], end=max(merged[-1]["end"], interval["end"]))
+            merged[-1].end_ts = max(merged[-1].end_ts, interval.end_ts)
     return merged
 
-def get_free_blocks(busy_times: List[TimeBlock], start_time: datetime, end_time: datetime) -> List[TimeBlock]:
+def get_free_blocks(busy_times: List[TimeBlock], start_time: datetime, end_time: datetime,
+                    day_start_time: time = DAY_START, day_end_time: time = DAY_END) -> List[TimeBlock]:
+    """Free blocks between day_start_time and day_end_time on every day of the window.
+
+    busy_times must be sorted and merged (as merge_intervals or scan_events
+    return them). Days and busy blocks are walked together, so the cost is
+    O(days + blocks) rather than O(days x blocks).
+    """
     free_blocks = []
     current = start_time
+    first = 0
     while current < end_time:
-        day_start = datetime.combine(current.date(), time(8, 0), tzinfo=current.tzinfo)
-        day_end = datetime.combine(current.date(), time(23, 59), tzinfo=current.tzinfo)
+        day_start = to_epoch(datetime.combine(current.date(), day_start_time, tzinfo=current.tzinfo))
+        day_end = to_epoch(datetime.combine(current.date(), day_end_time, tzinfo=current.tzinfo))
         cursor = day_start
 
-        for block in busy_times:
-            if block["end"] <= day_start or block["start"] >= day_end:
-                continue
-            if block["start"] > cursor:
-                free_blocks.append(TimeBlock(start=cursor, end=min(block["start"], day_end)))
-            cursor = max(cursor, block["end"])
+        # Blocks that ended before today can't matter for any later day either
+        while first < len(busy_times) and busy_times[first].end_ts <= day_start:
+            first += 1
+
+        i = first
+        while i < len(busy_times) and busy_times[i].start_ts < day_end:
+            block = busy_times[i]
+            if block.start_ts > cursor:
+                free_blocks.append(TimeBlock(cursor, min(block.start_ts, day_end)))
+            cursor = max(cursor, block.end_ts)
+            i += 1
 
         if cursor < day_end:
-            free_blocks.append(TimeBlock(start=cursor, end=day_end))
+            free_blocks.append(TimeBlock(cursor, day_end))
 
         current += timedelta(days=1)
     return free_blocks
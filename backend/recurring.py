@@ -0,0 +1,355 @@
+"""Weekly availability templates: recurring busy time kept as rules and expanded only for the window asked about.
+
+With singleEvents=False, events.list returns a recurring event once, with
+its RRULE, plus the occurrences that were moved or cancelled. A user's free
+time is then rebuilt on demand as
+- every day's [day_start, day_end) between ``since`` and ``until`` (UTC
+  days, as oauth.get_free_blocks counts them),
+- minus the occurrences of each weekly rule, except the ones it skips,
+- minus one-off busy blocks: single events and moved occurrences.
+A term of class meetings is a handful of rules instead of a free block for
+every gap between them, and any window up to ``until`` can be expanded.
+
+Daily and weekly rules (INTERVAL, BYDAY, UNTIL, COUNT, EXDATE) are
+understood here. Other recurrences (monthly, BYSETPOS, RDATE, ...) return
+None from weekly_rule; needs_instances tells the fetchers to ask Google for
+their occurrences, which then arrive as one-off busy blocks.
+"""
+import itertools
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from store import iso_to_epoch
+
+Interval = Tuple[int, int]
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+WEEK = timedelta(weeks=1)
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _zone(name: Optional[str], fallback: tzinfo) -> tzinfo:
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return fallback
+
+
+def _ical_time(value: str, tz: tzinfo) -> Tuple[datetime, bool]:
+    """An iCalendar DATE-TIME or DATE, and whether it had a time. Floating times are read in ``tz``."""
+    if value.endswith("Z"):
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc), True
+    if "T" in value:
+        return datetime.strptime(value, "%Y%m%dT%H%M%S").replace(tzinfo=tz), True
+    return datetime.strptime(value, "%Y%m%d").replace(tzinfo=tz), False
+
+
+def _merge(intervals: Iterable[Interval]) -> List[Interval]:
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class WeeklyRule:
+    """One recurring event as a weekly pattern: its first occurrence, length, weekdays and week interval.
+
+    ``first`` carries the event's own time zone, so occurrences keep their
+    wall-clock time across DST changes. ``until`` is the last allowed start
+    and ``skip`` holds the starts of occurrences that were cancelled or moved.
+    """
+    __slots__ = ("first", "duration", "weekdays", "interval", "until", "skip")
+
+    def __init__(self, first: datetime, duration: int, weekdays: Iterable[int], interval: int = 1,
+                 until: Optional[int] = None, skip: Optional[Set[int]] = None) -> None:
+        self.first = first
+        self.duration = duration
+        self.weekdays = sorted(set(weekdays))
+        self.interval = interval
+        self.until = until
+        self.skip = skip or set()
+
+    def occurrences(self, start: int, end: int) -> Iterator[int]:
+        """Starts of the occurrences overlapping [start, end), in order."""
+        tz = self.first.tzinfo
+        first_ts = int(self.first.timestamp())
+        if self.until is not None:
+            end = min(end, self.until + 1)
+        # A day either side covers occurrences that cross midnight or a zone change
+        day = datetime.fromtimestamp(max(start - self.duration, first_ts), tz).date() - timedelta(days=1)
+        last = datetime.fromtimestamp(end, tz).date() + timedelta(days=1)
+        first_monday = self.first.date() - timedelta(days=self.first.weekday())
+        week = day - timedelta(days=day.weekday())
+        while week <= last:
+            if ((week - first_monday).days // 7) % self.interval == 0:
+                for weekday in self.weekdays:
+                    ts = int(datetime.combine(week + timedelta(days=weekday), self.first.time(), tz).timestamp())
+                    if ts >= end:
+                        return
+                    if ts >= first_ts and ts + self.duration > start and ts not in self.skip:
+                        yield ts
+            week += WEEK
+
+    def to_dict(self) -> Dict[str, Any]:
+        zone = getattr(self.first.tzinfo, "key", None)
+        return {
+            "first": self.first.isoformat(),
+            "timeZone": zone,
+            "duration": self.duration,
+            "weekdays": self.weekdays,
+            "interval": self.interval,
+            "until": None if self.until is None else _iso(self.until),
+            "skip": [_iso(ts) for ts in sorted(self.skip)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WeeklyRule":
+        first = datetime.fromisoformat(data["first"])
+        first = first.astimezone(_zone(data.get("timeZone"), first.tzinfo))
+        until = data.get("until")
+        return cls(first, data["duration"], data["weekdays"], data.get("interval", 1),
+                   None if until is None else iso_to_epoch(until), {iso_to_epoch(s) for s in data.get("skip", [])})
+
+
+def weekly_rule(event: Dict[str, Any]) -> Optional[WeeklyRule]:
+    """The WeeklyRule of a recurring timed event, or None if its recurrence isn't daily or weekly."""
+    start, end = event.get("start", {}), event.get("end", {})
+    if not event.get("recurrence") or "dateTime" not in start or "dateTime" not in end:
+        return None
+    try:
+        first = datetime.fromisoformat(start["dateTime"])
+        tz = _zone(start.get("timeZone"), first.tzinfo)
+        first = first.astimezone(tz)
+        duration = iso_to_epoch(end["dateTime"]) - int(first.timestamp())
+
+        parts: Optional[Dict[str, str]] = None
+        skip: Set[int] = set()
+        for line in event["recurrence"]:
+            name, _, value = line.partition(":")
+            key, *params = name.split(";")
+            if key == "RRULE" and parts is None:
+                parts = dict(part.split("=", 1) for part in value.split(";") if "=" in part)
+            elif key == "EXDATE":
+                zone = next((_zone(p[5:], tz) for p in params if p.startswith("TZID=")), tz)
+                for item in value.split(","):
+                    when, timed = _ical_time(item, zone)
+                    if not timed:
+                        when = datetime.combine(when.date(), first.time(), tz)
+                    skip.add(int(when.timestamp()))
+            else:
+                # RDATE, a second RRULE, ...: not something a weekly pattern can hold
+                return None
+        if parts is None:
+            return None
+
+        freq = parts.pop("FREQ", None)
+        interval = int(parts.pop("INTERVAL", 1))
+        until_value, count = parts.pop("UNTIL", None), parts.pop("COUNT", None)
+        byday, wkst = parts.pop("BYDAY", None), parts.pop("WKST", "MO")
+        if parts or interval < 1:
+            # BYMONTH, BYSETPOS, BYHOUR, ...
+            return None
+        if freq == "DAILY" and interval == 1 and byday is None:
+            weekdays = list(range(7))
+        elif freq == "WEEKLY" and (interval == 1 or wkst == "MO"):
+            days = byday.split(",") if byday else [WEEKDAYS[first.weekday()]]
+            if any(d not in WEEKDAYS for d in days):
+                # Ordinals such as 1MO only occur in monthly and yearly rules
+                return None
+            weekdays = [WEEKDAYS.index(d) for d in days]
+        else:
+            return None
+
+        until = None
+        if until_value:
+            when, timed = _ical_time(until_value, tz)
+            # A date UNTIL includes that whole day
+            until = int((when if timed else when + timedelta(days=1, seconds=-1)).timestamp())
+        rule = WeeklyRule(first, duration, weekdays, interval, until)
+        if count:
+            # COUNT includes the occurrences EXDATE removes later
+            horizon = int(first.timestamp()) + (int(count) + 1) * interval * int(WEEK.total_seconds())
+            starts = list(itertools.islice(rule.occurrences(int(first.timestamp()), horizon), int(count)))
+            if not starts:
+                return None
+            rule.until = starts[-1] if until is None else min(until, starts[-1])
+        rule.skip = skip
+        return rule
+    except (KeyError, ValueError):
+        return None
+
+
+def needs_instances(event: Dict[str, Any]) -> bool:
+    """Recurring timed events weekly_rule can't hold; their occurrences have to come from Google."""
+    return (bool(event.get("recurrence")) and event.get("status") != "cancelled"
+            and "dateTime" in event.get("start", {}) and weekly_rule(event) is None)
+
+
+def _replaced(events: List[Dict[str, Any]]) -> Dict[str, Set[int]]:
+    """Original starts of moved or cancelled occurrences, by recurring event id."""
+    replaced: Dict[str, Set[int]] = {}
+    for event in events:
+        original = event.get("originalStartTime", {}).get("dateTime")
+        if event.get("recurringEventId") and original:
+            replaced.setdefault(event["recurringEventId"], set()).add(iso_to_epoch(original))
+    return replaced
+
+
+def single_events(events: List[Dict[str, Any]], start: int, end: int) -> List[Dict[str, Any]]:
+    """The timed events in [start, end) as singleEvents=True would list them, recurring ones expanded."""
+    replaced = _replaced(events)
+    result = []
+    for event in events:
+        if event.get("status") == "cancelled" or "dateTime" not in event.get("start", {}):
+            continue
+        if not event.get("recurrence"):
+            if iso_to_epoch(event["start"]["dateTime"]) < end and iso_to_epoch(event["end"]["dateTime"]) > start:
+                result.append(event)
+            continue
+        rule = weekly_rule(event)
+        if rule is None:
+            # Listed separately, from events.instances
+            continue
+        tz = rule.first.tzinfo
+        zone = event["start"].get("timeZone")
+        for ts in rule.occurrences(start, end):
+            if ts in replaced.get(event["id"], ()):
+                continue
+            occurrence_start = datetime.fromtimestamp(ts, tz)
+            instance = {k: v for k, v in event.items() if k != "recurrence"}
+            instance.update({
+                "id": f"{event['id']}_{occurrence_start.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}",
+                "recurringEventId": event["id"],
+                "originalStartTime": {"dateTime": occurrence_start.isoformat(), "timeZone": zone},
+                "start": {"dateTime": occurrence_start.isoformat(), "timeZone": zone},
+                "end": {"dateTime": datetime.fromtimestamp(ts + rule.duration, tz).isoformat(), "timeZone": zone},
+            })
+            result.append(instance)
+    return result
+
+
+class RecurringAvailability:
+    """A user's free time in [since, until): each day's window minus weekly rules and one-off busy blocks."""
+
+    def __init__(self, since: int, until: int, day_start: time, day_end: time,
+                 rules: Optional[List[WeeklyRule]] = None, busy: Optional[List[Interval]] = None) -> None:
+        self.since = since
+        self.until = until
+        self.day_start = day_start
+        self.day_end = day_end
+        self.rules = rules or []
+        # Merged, so starts and ends both increase and a window is two binary searches
+        self.busy = _merge(b for b in (busy or []) if b[1] > b[0])
+        self._busy_starts = [s for s, _ in self.busy]
+        self._busy_ends = [e for _, e in self.busy]
+
+    @classmethod
+    def from_events(cls, events: List[Dict[str, Any]], since: datetime, until: datetime,
+                    day_start: time, day_end: time) -> "RecurringAvailability":
+        """The template for events listed with singleEvents=False (plus any events.instances results)."""
+        since_ts, until_ts = int(since.timestamp()), int(until.timestamp())
+        replaced = _replaced(events)
+        rules, busy = [], []
+        for event in events:
+            if event.get("status") == "cancelled" or "dateTime" not in event.get("start", {}):
+                continue
+            if event.get("recurrence"):
+                rule = weekly_rule(event)
+                if rule is not None and (rule.until is None or rule.until >= since_ts):
+                    rule.skip |= replaced.get(event["id"], set())
+                    rules.append(rule)
+                continue
+            start, end = iso_to_epoch(event["start"]["dateTime"]), iso_to_epoch(event["end"]["dateTime"])
+            if end > since_ts and start < until_ts:
+                busy.append((start, end))
+        return cls(since_ts, until_ts, day_start, day_end, rules, busy)
+
+    def busy_in(self, start: int, end: int) -> List[Interval]:
+        """Merged busy intervals overlapping [start, end), rules and one-off blocks together."""
+        lo = bisect_right(self._busy_ends, start)
+        hi = bisect_left(self._busy_starts, end)
+        intervals = self.busy[lo:hi]
+        for rule in self.rules:
+            intervals.extend((ts, ts + rule.duration) for ts in rule.occurrences(start, end))
+        return _merge(intervals)
+
+    def expand(self, start: Optional[int] = None, end: Optional[int] = None) -> List[Interval]:
+        """Free intervals in [start, end), clipped to [since, until)."""
+        lo = self.since if start is None else max(start, self.since)
+        hi = self.until if end is None else min(end, self.until)
+        if lo >= hi:
+            return []
+        busy = self.busy_in(lo, hi)
+        free: List[Interval] = []
+        first = 0
+        day = datetime.fromtimestamp(lo, timezone.utc).date()
+        while True:
+            window_start = int(datetime.combine(day, self.day_start, timezone.utc).timestamp())
+            if window_start >= hi:
+                return free
+            cursor = max(window_start, lo)
+            stop = min(int(datetime.combine(day, self.day_end, timezone.utc).timestamp()), hi)
+            while first < len(busy) and busy[first][1] <= cursor:
+                first += 1
+            i = first
+            while cursor < stop:
+                if i < len(busy) and busy[i][0] < stop:
+                    if busy[i][0] > cursor:
+                        free.append((cursor, busy[i][0]))
+                    cursor = max(cursor, busy[i][1])
+                    i += 1
+                else:
+                    free.append((cursor, stop))
+                    break
+            day += timedelta(days=1)
+
+    def compact(self, ended_before: int) -> "RecurringAvailability":
+        """This template without the days, rules, skips and busy blocks that ended by ``ended_before``."""
+        rules = []
+        for rule in self.rules:
+            if rule.until is not None and rule.until + rule.duration <= ended_before:
+                continue
+            rules.append(WeeklyRule(rule.first, rule.duration, rule.weekdays, rule.interval, rule.until,
+                                    {ts for ts in rule.skip if ts + rule.duration > ended_before}))
+        busy = [b for b in self.busy if b[1] > ended_before]
+        return RecurringAvailability(max(self.since, min(ended_before, self.until)), self.until,
+                                     self.day_start, self.day_end, rules, busy)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "since": _iso(self.since),
+            "until": _iso(self.until),
+            "day_start": self.day_start.isoformat(timespec="minutes"),
+            "day_end": self.day_end.isoformat(timespec="minutes"),
+            "weekly": [rule.to_dict() for rule in self.rules],
+            "busy": [{"start": _iso(s), "end": _iso(e)} for s, e in self.busy],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RecurringAvailability":
+        return cls(
+            iso_to_epoch(data["since"]),
+            iso_to_epoch(data["until"]),
+            time.fromisoformat(data["day_start"]),
+            time.fromisoformat(data["day_end"]),
+            [WeeklyRule.from_dict(rule) for rule in data.get("weekly", [])],
+            [(iso_to_epoch(b["start"]), iso_to_epoch(b["end"])) for b in data.get("busy", [])],
+        )
+
+
+def compact_availability(data: Optional[Dict[str, Any]], ended_before: Optional[int]) -> Optional[Dict[str, Any]]:
+    """A stored template with everything that ended by ``ended_before`` dropped (see RecurringAvailability.compact)."""
+    if data is None or ended_before is None:
+        return data
+    return RecurringAvailability.from_dict(data).compact(ended_before).to_dict()
@@ -0,0 +1,175 @@
+"""Retention policy: forget free time that has ended and assignments that are long past due.
+
+Run from the backend directory, e.g.
+
+    python retention.py --grace-hours 48 --archive retention.jsonl --dry-run
+
+or POST /api/admin/retention, or set RETENTION_INTERVAL_HOURS to run it in
+the background. Each pass
+- drops free blocks that have already ended and merges overlapping or
+  touching ones, per user, and trims weekly templates (recurring.py) to
+  what has not ended yet;
+- unenrolls everyone from assignments due more than the grace period ago,
+  which removes the emptied cohorts from the assignments map;
+- optionally appends what it removed to an archive file as JSON lines;
+- folds the journal into a fresh snapshot so data.json shrinks.
+
+The removals are ordinary store records (compact_free_time and
+remove_assignment), so other processes replay them and the suggestion
+cache, free-time indexes and assignment index are invalidated as usual.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from db_utils import mark_dirty
+from recurring import compact_availability
+from store import coalesce_free_time, get_store, iso_to_epoch
+
+# Assignments stay this long after their due date
+RETENTION_GRACE_HOURS = float(os.environ.get("RETENTION_GRACE_HOURS", 24))
+# Removed data is appended here as JSON lines; unset means it is dropped
+RETENTION_ARCHIVE = os.environ.get("RETENTION_ARCHIVE") or None
+# Hours between background passes; 0 leaves retention to the CLI and admin route
+RETENTION_INTERVAL_HOURS = float(os.environ.get("RETENTION_INTERVAL_HOURS", 0))
+
+
+def _ended(block: Dict[str, str], now_ts: int) -> bool:
+    try:
+        return iso_to_epoch(block["end"]) <= now_ts
+    except (KeyError, ValueError):
+        return False
+
+
+def _expired(due: str, cutoff_ts: int) -> bool:
+    try:
+        return iso_to_epoch(due) <= cutoff_ts
+    except ValueError:
+        # Unreadable due dates are left for a person to look at
+        return False
+
+
+def plan_retention(data: Dict[str, Any], now: datetime,
+                   grace: timedelta) -> Tuple[List[Dict[str, Any]], Dict[str, int], List[Dict[str, Any]]]:
+    """Store records for one pass, a report of what they remove, and archive entries per user."""
+    now_ts = int(now.timestamp())
+    cutoff_ts = int((now - grace).timestamp())
+    report = {
+        "users": 0,
+        "users_changed": 0,
+        "free_time_before": 0,
+        "free_time_after": 0,
+        "free_time_ended": 0,
+        "templates_trimmed": 0,
+        "assignments_removed": 0,
+        "cohorts_removed": 0,
+    }
+    records: List[Dict[str, Any]] = []
+    archive: List[Dict[str, Any]] = []
+
+    for email, user in list(data["users"].items()):
+        report["users"] += 1
+        expired = [a for a in list(user.get("assignments", [])) if _expired(a["due"], cutoff_ts)]
+        blocks = list(user.get("free_time", []))
+        compacted = coalesce_free_time(blocks, now_ts)
+        ended = [b for b in blocks if _ended(b, now_ts)]
+        template = user.get("availability")
+        template_trimmed = compact_availability(template, now_ts) != template
+
+        report["free_time_before"] += len(blocks)
+        report["free_time_after"] += len(compacted)
+        report["free_time_ended"] += len(ended)
+        report["assignments_removed"] += len(expired)
+        report["templates_trimmed"] += template_trimmed
+        if not expired and compacted == blocks and not template_trimmed:
+            continue
+
+        report["users_changed"] += 1
+        records.extend({"op": "remove_assignment", "email": email, "title": a["title"], "due": a["due"]}
+                       for a in expired)
+        if compacted != blocks or template_trimmed:
+            records.append({"op": "compact_free_time", "email": email, "ended_before": now.isoformat()})
+        if expired or ended:
+            archive.append({"email": email, "assignments": expired, "free_time": ended})
+
+    report["cohorts_removed"] = sum(
+        1 for cohort in list(data["assignments"].values()) if _expired(cohort["due"], cutoff_ts)
+    )
+    return records, report, archive
+
+
+def run_retention(now: Optional[datetime] = None, grace_hours: float = RETENTION_GRACE_HOURS,
+                  archive_file: Optional[str] = RETENTION_ARCHIVE, dry_run: bool = False) -> Dict[str, Any]:
+    """One retention pass over the whole store. Returns the report; with dry_run nothing is changed."""
+    now = now or datetime.now(timezone.utc)
+    store = get_store()
+    records, report, archive = plan_retention(store.data, now, timedelta(hours=grace_hours))
+    report.update({"now": now.isoformat(), "grace_hours": grace_hours, "dry_run": dry_run})
+    if dry_run or not records:
+        return report
+
+    if archive_file:
+        with open(archive_file, "a") as f:
+            for entry in archive:
+                f.write(json.dumps({"archived_at": now.isoformat(), **entry}) + "\n")
+    changed = store.commit(records)
+    store.compact()
+    for email in {r["email"] for r, c in zip(records, changed) if c}:
+        mark_dirty(email)
+    print(f"🧹 Retention pass: {report}")
+    return report
+
+
+class RetentionJob:
+    """Runs run_retention every ``interval_hours`` on a daemon thread."""
+
+    def __init__(self, interval_hours: float = RETENTION_INTERVAL_HOURS) -> None:
+        self.interval_hours = interval_hours
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_hours * 3600):
+            try:
+                run_retention()
+            except Exception as e:
+                print(f"⚠️ Retention pass failed: {e}")
+
+    def start(self) -> None:
+        if self.running or self.interval_hours <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+        print(f"🧹 Retention job started (every {self.interval_hours:g}h)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+retention_job = RetentionJob()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grace-hours", type=float, default=RETENTION_GRACE_HOURS,
+                        help="keep assignments this long after they were due")
+    parser.add_argument("--archive", default=RETENTION_ARCHIVE, help="append removed data here as JSON lines")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed without removing it")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    result = run_retention(grace_hours=args.grace_hours, archive_file=args.archive, dry_run=args.dry_run)
+    print(json.dumps(result, indent=2))
+    print(f"✅ Retention {'planned' if args.dry_run else 'done'} in {time.monotonic() - started:.2f}s")
@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from db_utils import get_suggestions_for_email, mark_dirty, pop_dirty_users
+from store import get_store, iso_to_epoch
+from suggestion_cache import suggestion_cache
+
+# Seconds between refreshes of every stored user
+SCHEDULER_INTERVAL = float(os.environ.get("SCHEDULER_INTERVAL", 300))
+# Users whose suggestions are computed at the same time
+SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", 4))
+# Queued users beyond this are left for the next refresh
+SCHEDULER_BACKLOG = 10000
+# How often send_user's dirty flags are checked
+DIRTY_POLL_SECONDS = 1.0
+
+NO_DEADLINE = float("inf")
+
+
+def user_priority(user: Dict[str, Any], now: float) -> float:
+    """Epoch seconds of the user's nearest upcoming due date; lower runs first."""
+    nearest = NO_DEADLINE
+    for assignment in user.get("assignments", []):
+        try:
+            due = iso_to_epoch(assignment["due"])
+        except (KeyError, ValueError):
+            continue
+        if now <= due < nearest:
+            nearest = due
+    return nearest
+
+
+class SuggestionScheduler:
+    """Precomputes suggestions in the background so requests find them cached.
+
+    Every ``interval`` seconds all stored users are queued, and users marked
+    dirty by send_user, or whose cached suggestions were invalidated by
+    someone else's write, are queued as soon as the flag is seen. The queue is
+    ordered by each user's nearest upcoming due date and drained by at most
+    ``workers`` concurrent jobs. Results land in the suggestion cache that
+    get_suggestions reads, and the latest list per user is kept here too.
+
+    The cache lives in this process, so every server process runs its own
+    scheduler; app.start_background_jobs starts it.
+    """
+
+    def __init__(self, interval: float = SCHEDULER_INTERVAL, workers: int = SCHEDULER_WORKERS,
+                 max_backlog: int = SCHEDULER_BACKLOG) -> None:
+        self.interval = interval
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self._queue: List[Tuple[float, int, str]] = []
+        self._queued: set = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._results: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads) and not self._stop.is_set()
+
+    def backlog(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, email: str, priority: Optional[float] = None) -> bool:
+        if priority is None:
+            user = get_store().get_user(email)
+            if not user:
+                return False
+            priority = user_priority(user, time.time())
+        with self._cond:
+            if email in self._queued:
+                return False
+            if len(self._queue) >= self.max_backlog:
+                self.dropped += 1
+                return False
+            heapq.heappush(self._queue, (priority, next(self._seq), email))
+            self._queued.add(email)
+            self._cond.notify()
+        return True
+
+    def enqueue_all(self) -> None:
+        now = time.time()
+        for email, user in list(get_store().data["users"].items()):
+            self.enqueue(email, user_priority(user, now))
+
+    def precompute(self, email: str) -> Optional[List[Dict[str, Any]]]:
+        suggestions = get_suggestions_for_email(email)
+        if suggestions is not None:
+            self._results[email] = (time.time(), suggestions)
+        return suggestions
+
+    def run_once(self) -> int:
+        """Synchronously compute every stored user, most urgent first. Returns how many ran."""
+        self.enqueue_all()
+        count = 0
+        while True:
+            with self._cond:
+                if not self._queue:
+                    return count
+                _, _, email = heapq.heappop(self._queue)
+                self._queued.discard(email)
+            self.precompute(email)
+            count += 1
+
+    def latest(self, email: str) -> Optional[Tuple[float, List[Dict[str, Any]]]]:
+        """(computed at, suggestions) from the last background run for this user."""
+        return self._results.get(email)
+
+    def _run(self, email: str) -> None:
+        try:
+            self.precompute(email)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ Precomputing suggestions for {email} failed: {e}")
+        finally:
+            self._slots.release()
+
+    def _dispatch(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._queue and not self._stop.is_set():
+                    self._cond.wait(timeout=DIRTY_POLL_SECONDS)
+                if self._stop.is_set():
+                    return
+                _, _, email = heapq.heappop(self._queue)
+                self._queued.discard(email)
+            self._slots.acquire()
+            self._executor.submit(self._run, email)
+
+    def _refresh(self) -> None:
+        next_full = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() >= next_full:
+                self.enqueue_all()
+                next_full = time.monotonic() + self.interval
+            for email in pop_dirty_users():
+                self.enqueue(email)
+            self._stop.wait(DIRTY_POLL_SECONDS)
+
+    @staticmethod
+    def _requeue(users) -> None:
+        for email in users:
+            mark_dirty(email)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        # Cohort members of a changed user lose their cached suggestions too
+        suggestion_cache.add_invalidation_listener(self._requeue)
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="suggestions")
+        self._threads = [
+            threading.Thread(target=self._refresh, name="suggestions-refresh", daemon=True),
+            threading.Thread(target=self._dispatch, name="suggestions-dispatch", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"⏱️ Suggestion scheduler started ({self.workers} workers, every {self.interval:.0f}s)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+suggestion_scheduler = SuggestionScheduler()
+
@@ -0,0 +1,309 @@
+import json
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from recurring import compact_availability
+from store import OPERATIONS, StorageBackend, assignment_id_for, coalesce_free_time, iso_to_epoch, empty_data
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    due TEXT NOT NULL,
+    due_ts INTEGER
+);
+
+-- One row per (user, title, due); several rows may share an assignment id
+CREATE TABLE IF NOT EXISTS enrollments (
+    email TEXT NOT NULL REFERENCES users(email),
+    assignment_id TEXT NOT NULL REFERENCES assignments(id),
+    title TEXT NOT NULL,
+    due TEXT NOT NULL,
+    PRIMARY KEY (email, title, due)
+);
+CREATE INDEX IF NOT EXISTS enrollments_by_assignment ON enrollments (assignment_id, email);
+
+CREATE TABLE IF NOT EXISTS free_time (
+    email TEXT NOT NULL REFERENCES users(email),
+    start TEXT NOT NULL,
+    "end" TEXT NOT NULL,
+    start_ts INTEGER,
+    end_ts INTEGER,
+    PRIMARY KEY (email, start, "end")
+);
+CREATE INDEX IF NOT EXISTS free_time_by_end ON free_time (email, end_ts);
+
+-- Weekly template per user (recurring.RecurringAvailability.to_dict() as JSON)
+CREATE TABLE IF NOT EXISTS availability (
+    email TEXT PRIMARY KEY REFERENCES users(email),
+    template TEXT NOT NULL
+);
+"""
+# Seconds a writer waits for another process's write lock before giving up
+BUSY_TIMEOUT = 5.0
+
+
+def _epoch_or_none(value: str) -> Optional[int]:
+    try:
+        return iso_to_epoch(value)
+    except ValueError:
+        return None
+
+
+class SqliteStore(StorageBackend):
+    """Storage backend on an indexed SQLite database.
+
+    Users, assignments (keyed by the slugify(title_due) id), enrollments,
+    free time and weekly templates live in their own tables, so membership checks are primary-key
+    lookups and "free time before the due date" is a range scan over
+    ``free_time_by_end``. Timestamps keep their original ISO strings and
+    also carry epoch seconds for ordering.
+
+    The database runs in WAL mode with a busy timeout, so several processes
+    can share it. When another process commits, the in-memory free-time
+    indexes are dropped on the next read and rebuilt from the tables.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        # WAL lets readers in other processes carry on while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+        self._conn.executescript(SCHEMA)
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # Mutations
+
+    def _availability(self, cur: sqlite3.Cursor, email: str) -> Optional[Dict[str, Any]]:
+        row = cur.execute("SELECT template FROM availability WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _apply(self, cur: sqlite3.Cursor, record: Dict[str, Any]) -> bool:
+        op = record["op"]
+        email = record["email"]
+
+        if op == "create_user":
+            cur.execute("INSERT OR IGNORE INTO users (email, name) VALUES (?, ?)", (email, record["name"]))
+            return cur.rowcount > 0
+
+        if not self.has_user(email):
+            return False
+
+        if op == "add_assignment":
+            title, due = record["title"], record["due"]
+            assignment_id = assignment_id_for(title, due)
+            cur.execute(
+                "INSERT OR IGNORE INTO assignments (id, title, due, due_ts) VALUES (?, ?, ?, ?)",
+                (assignment_id, title, due, _epoch_or_none(due)),
+            )
+            changed = cur.rowcount > 0
+            cur.execute(
+                "INSERT OR IGNORE INTO enrollments (email, assignment_id, title, due) VALUES (?, ?, ?, ?)",
+                (email, assignment_id, title, due),
+            )
+            return changed or cur.rowcount > 0
+
+        if op == "add_free_time":
+            start, end = record["start"], record["end"]
+            cur.execute(
+                'INSERT OR IGNORE INTO free_time (email, start, "end", start_ts, end_ts) VALUES (?, ?, ?, ?, ?)',
+                (email, start, end, _epoch_or_none(start), _epoch_or_none(end)),
+            )
+            return cur.rowcount > 0
+
+        if op == "remove_assignment":
+            title, due = record["title"], record["due"]
+            cur.execute("DELETE FROM enrollments WHERE email = ? AND title = ? AND due = ?", (email, title, due))
+            if cur.rowcount == 0:
+                return False
+            assignment_id = assignment_id_for(title, due)
+            cur.execute(
+                "DELETE FROM assignments WHERE id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM enrollments WHERE assignment_id = ?)",
+                (assignment_id, assignment_id),
+            )
+            return True
+
+        if op == "compact_free_time":
+            ended_before = record.get("ended_before")
+            ended_before_ts = iso_to_epoch(ended_before) if ended_before else None
+            rows = cur.execute('SELECT start, "end" FROM free_time WHERE email = ? ORDER BY rowid', (email,)).fetchall()
+            blocks = [{"start": start, "end": end} for start, end in rows]
+            compacted = coalesce_free_time(blocks, ended_before_ts)
+            availability = self._availability(cur, email)
+            compacted_availability = compact_availability(availability, ended_before_ts)
+            if compacted == blocks and compacted_availability == availability:
+                return False
+            if compacted != blocks:
+                cur.execute("DELETE FROM free_time WHERE email = ?", (email,))
+                cur.executemany(
+                    'INSERT OR IGNORE INTO free_time (email, start, "end", start_ts, end_ts) VALUES (?, ?, ?, ?, ?)',
+                    [(email, b["start"], b["end"], _epoch_or_none(b["start"]), _epoch_or_none(b["end"]))
+                     for b in compacted],
+                )
+            if compacted_availability != availability:
+                cur.execute("UPDATE availability SET template = ? WHERE email = ?",
+                            (json.dumps(compacted_availability), email))
+            return True
+
+        if op == "set_availability":
+            if self._availability(cur, email) == record["availability"]:
+                return False
+            cur.execute("INSERT OR REPLACE INTO availability (email, template) VALUES (?, ?)",
+                        (email, json.dumps(record["availability"])))
+            return True
+
+        raise ValueError(f"Unknown journal operation: {op}")
+
+    def sync(self) -> None:
+        # data_version only moves when another connection commits
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._data_version = version
+                self._reset_indexes()
+
+    def commit(self, records: List[Dict[str, Any]]) -> List[bool]:
+        for record in records:
+            if record.get("op") not in OPERATIONS:
+                raise ValueError(f"Unknown journal operation: {record.get('op')}")
+        with self._lock:
+            self.sync()
+            with self._conn:
+                cur = self._conn.cursor()
+                results = [self._apply(cur, record) for record in records]
+            for record, changed in zip(records, results):
+                if changed:
+                    self._record_applied(record)
+            return results
+
+    def replace(self, data: Dict[str, Any]) -> None:
+        records: List[Dict[str, Any]] = []
+        for email, user in data.get("users", {}).items():
+            records.append({"op": "create_user", "name": user["name"], "email": email})
+            for a in user.get("assignments", []):
+                records.append({"op": "add_assignment", "email": email, "title": a["title"], "due": a["due"]})
+            for b in user.get("free_time", []):
+                records.append({"op": "add_free_time", "email": email, "start": b["start"], "end": b["end"]})
+            if user.get("availability"):
+                records.append({"op": "set_availability", "email": email, "availability": user["availability"]})
+        # One transaction, so nobody (including a crash) sees the tables emptied
+        with self._lock:
+            self.sync()
+            with self._conn:
+                cur = self._conn.cursor()
+                for table in ("availability", "free_time", "enrollments", "assignments", "users"):
+                    cur.execute(f"DELETE FROM {table}")
+                for record in records:
+                    self._apply(cur, record)
+            self._reset_indexes()
+
+    def compact(self) -> None:
+        # Deleted rows only free pages; VACUUM hands them back to the filesystem
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    # Reads
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            self.sync()
+            return self._conn.execute(sql, params).fetchall()
+
+    def has_user(self, email: str) -> bool:
+        return bool(self._query("SELECT 1 FROM users WHERE email = ?", (email,)))
+
+    def get_user_emails(self) -> List[str]:
+        return [email for (email,) in self._query("SELECT email FROM users ORDER BY rowid")]
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT name FROM users WHERE email = ?", (email,))
+        if not rows:
+            return None
+        assignments = self._query("SELECT title, due FROM enrollments WHERE email = ? ORDER BY rowid", (email,))
+        user = {
+            "name": rows[0][0],
+            "email": email,
+            "assignments": [{"title": t, "due": d, "description": None} for t, d in assignments],
+            "free_time": self.get_free_time(email)
+        }
+        availability = self.get_availability(email)
+        if availability is not None:
+            user["availability"] = availability
+        return user
+
+    def get_free_time(self, email: str, end_before: Optional[str] = None) -> List[Dict[str, str]]:
+        if end_before is None:
+            rows = self._query('SELECT start, "end" FROM free_time WHERE email = ? ORDER BY rowid', (email,))
+        else:
+            rows = self._query(
+                'SELECT start, "end" FROM free_time WHERE email = ? AND end_ts <= ? ORDER BY start_ts',
+                (email, iso_to_epoch(end_before)),
+            )
+        return [{"start": start, "end": end} for start, end in rows]
+
+    def get_availability(self, email: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT template FROM availability WHERE email = ?", (email,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def _students(self, assignment_id: str) -> List[str]:
+        rows = self._query(
+            "SELECT email FROM enrollments WHERE assignment_id = ? GROUP BY email ORDER BY MIN(rowid)",
+            (assignment_id,),
+        )
+        return [email for (email,) in rows]
+
+    def get_assignment(self, assignment_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT title, due FROM assignments WHERE id = ?", (assignment_id,))
+        if not rows:
+            return None
+        return {"title": rows[0][0], "due": rows[0][1], "students": self._students(assignment_id)}
+
+    def get_assignments(self) -> Dict[str, Any]:
+        assignments = {
+            assignment_id: {"title": title, "due": due, "students": []}
+            for assignment_id, title, due in self._query("SELECT id, title, due FROM assignments ORDER BY rowid")
+        }
+        rows = self._query(
+            "SELECT assignment_id, email FROM enrollments GROUP BY assignment_id, email ORDER BY MIN(rowid)"
+        )
+        for assignment_id, email in rows:
+            assignments[assignment_id]["students"].append(email)
+        return assignments
+
+    def get_assignment_page(self, offset: int = 0, limit: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = self._query(
+            "SELECT id, title, due FROM assignments ORDER BY rowid LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        )
+        return [
+            (assignment_id, {"title": title, "due": due, "students": self._students(assignment_id)})
+            for assignment_id, title, due in rows
+        ]
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        data = empty_data()
+        for email in self.get_user_emails():
+            data["users"][email] = self.get_user(email)
+        data["assignments"] = self.get_assignments()
+        return data
+
+
+if __name__ == "__main__":
+    # Import data.json (or the file given on the command line) into data.db
+    from store import DATA_FILE, SQLITE_FILE, JsonStore
+
+    source = JsonStore(sys.argv[1] if len(sys.argv) > 1 else DATA_FILE)
+    SqliteStore(SQLITE_FILE).replace(source.data)
+    print(f"✅ Imported {len(source.data['users'])} users into {SQLITE_FILE}")
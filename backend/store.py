@@ -0,0 +1,622 @@
+import itertools
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; the store is then safe within one process only
+    fcntl = None
+
+from slugify import slugify
+
+from metrics import STORE_BYTES
+
+if TYPE_CHECKING:
+    from free_time_index import FreeTimeIndex
+
+DATA_FILE = "data.json"
+SQLITE_FILE = "data.db"
+# "json" (data.json + journal) or "sqlite"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+OPERATIONS = ("create_user", "add_assignment", "add_free_time", "remove_assignment", "compact_free_time",
+              "set_availability")
+# Fold the journal back into the snapshot once it is this fraction of the
+# snapshot's size, so each rewrite is paid for by as many bytes of appends
+COMPACT_RATIO = float(os.environ.get("COMPACT_RATIO", 0.5))
+# ... and never below this many bytes, so a small store isn't rewritten constantly
+COMPACT_MIN_BYTES = 1 << 20
+
+
+# Called with every record that changed the store, plus {"op": "replace"}
+# whenever the whole dataset is swapped out
+_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    _listeners.append(listener)
+
+
+def _notify(record: Dict[str, Any]) -> None:
+    for listener in _listeners:
+        listener(record)
+
+
+@contextmanager
+def _file_lock(path: str, exclusive: bool) -> Iterator[None]:
+    """Advisory lock shared by every process using the same data file."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _file_id(path: str) -> Optional[Tuple[int, int, int]]:
+    """Changes whenever the file is replaced or rewritten."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def empty_data() -> Dict[str, Any]:
+    return {"users": {}, "assignments": {}}
+
+
+def assignment_id_for(title: str, due: str) -> str:
+    return slugify(f"{title}_{due}")
+
+
+def datetime_to_epoch(value: datetime) -> int:
+    """Seconds since the epoch; naive datetimes are read as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def iso_to_epoch(value: str) -> int:
+    return datetime_to_epoch(datetime.fromisoformat(value))
+
+
+def coalesce_free_time(blocks: List[Dict[str, str]], ended_before: Optional[int] = None) -> List[Dict[str, str]]:
+    """Blocks sorted by start with overlapping or touching ones merged.
+
+    Blocks that end at or before ``ended_before`` are dropped, as are
+    unreadable ones. Merged blocks keep the original start and end strings
+    of the blocks they came from, so timestamps stay in the form they were
+    stored in.
+    """
+    parsed = []
+    for block in blocks:
+        try:
+            start_ts, end_ts = iso_to_epoch(block["start"]), iso_to_epoch(block["end"])
+        except (KeyError, ValueError):
+            continue
+        if end_ts > start_ts and (ended_before is None or end_ts > ended_before):
+            parsed.append((start_ts, end_ts, block["start"], block["end"]))
+
+    merged: List[List[Any]] = []
+    for start_ts, end_ts, start, end in sorted(parsed):
+        if merged and start_ts <= merged[-1][1]:
+            if end_ts > merged[-1][1]:
+                merged[-1][1], merged[-1][3] = end_ts, end
+        else:
+            merged.append([start_ts, end_ts, start, end])
+    return [{"start": start, "end": end} for _, _, start, end in merged]
+
+
+class StorageBackend:
+    """Interface shared by the storage backends used by db_utils and app.py.
+
+    Mutations are expressed as journal-style records ({"op": ..., ...}) and
+    applied in batches through ``commit``; reads return plain dicts in the
+    same shape data.json has always used.
+    """
+
+    def __init__(self) -> None:
+        self._free_time_indexes: Dict[str, "FreeTimeIndex"] = {}
+        # Bumped on every change. Together with ``instance``, which differs
+        # between processes and restarts, it identifies a state of the data
+        self.instance = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._base_version = 0
+        self._user_versions: Dict[str, int] = {}
+
+    def commit(self, records: List[Dict[str, Any]]) -> List[bool]:
+        raise NotImplementedError
+
+    def create_user(self, name: str, email: str) -> bool:
+        return self.commit([{"op": "create_user", "name": name, "email": email}])[0]
+
+    def add_assignment(self, email: str, title: str, due: str) -> bool:
+        return self.commit([{"op": "add_assignment", "email": email, "title": title, "due": due}])[0]
+
+    def add_free_time(self, email: str, start: str, end: str) -> bool:
+        return self.commit([{"op": "add_free_time", "email": email, "start": start, "end": end}])[0]
+
+    def remove_assignment(self, email: str, title: str, due: str) -> bool:
+        """Unenroll a user; the assignment itself goes once its last student is removed."""
+        return self.commit([{"op": "remove_assignment", "email": email, "title": title, "due": due}])[0]
+
+    def compact_free_time(self, email: str, ended_before: Optional[str] = None) -> bool:
+        """Drop a user's free time that ended by ``ended_before`` and merge the rest (see coalesce_free_time).
+
+        The user's weekly template loses its ended rules and busy blocks too.
+        """
+        return self.commit([{"op": "compact_free_time", "email": email, "ended_before": ended_before}])[0]
+
+    def set_availability(self, email: str, availability: Dict[str, Any]) -> bool:
+        """Replace a user's weekly template (a RecurringAvailability.to_dict())."""
+        return self.commit([{"op": "set_availability", "email": email, "availability": availability}])[0]
+
+    def _record_applied(self, record: Dict[str, Any]) -> None:
+        """Called by backends for every record that changed the data."""
+        self.version += 1
+        self._user_versions[record["email"]] = self.version
+        if record["op"] in ("compact_free_time", "set_availability"):
+            # Rebuilt from the stored blocks and template on next use
+            self._free_time_indexes.pop(record["email"], None)
+        elif record["op"] == "add_free_time":
+            index = self._free_time_indexes.get(record["email"])
+            if index is not None:
+                try:
+                    index.add(iso_to_epoch(record["start"]), iso_to_epoch(record["end"]))
+                except ValueError:
+                    pass
+        _notify(record)
+
+    def _reset_indexes(self) -> None:
+        self._free_time_indexes = {}
+        self.version += 1
+        self._base_version = self.version
+        self._user_versions = {}
+        _notify({"op": "replace"})
+
+    def free_time_index(self, email: str) -> "FreeTimeIndex":
+        """The user's FreeTimeIndex, built on first use and updated on every add_free_time."""
+        index = self._free_time_indexes.get(email)
+        if index is None:
+            from free_time_index import FreeTimeIndex
+            from recurring import RecurringAvailability
+            availability = self.get_availability(email)
+            recurring = RecurringAvailability.from_dict(availability) if availability else None
+            index = self._free_time_indexes[email] = FreeTimeIndex.from_blocks(self.get_free_time(email), recurring)
+        return index
+
+    def sync(self) -> None:
+        """Pick up changes made by other processes. Backends without shared files have none."""
+
+    def compact(self) -> None:
+        """Reclaim the space of removed data, where the backend needs a separate step for it."""
+
+    def user_version(self, email: str) -> int:
+        """Version of the last change to this user's record."""
+        return self._user_versions.get(email, self._base_version)
+
+    def has_user(self, email: str) -> bool:
+        raise NotImplementedError
+
+    def get_user_emails(self) -> List[str]:
+        """Every stored user's email, in insertion order."""
+        raise NotImplementedError
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_free_time(self, email: str, end_before: Optional[str] = None) -> List[Dict[str, str]]:
+        """Free blocks of a user, optionally only those ending at or before ``end_before``."""
+        raise NotImplementedError
+
+    def get_availability(self, email: str) -> Optional[Dict[str, Any]]:
+        """The user's weekly template as stored, or None."""
+        raise NotImplementedError
+
+    def get_assignment(self, assignment_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_assignments(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def get_assignment_page(self, offset: int = 0, limit: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """(id, assignment) pairs in insertion order, ``limit`` of them starting at ``offset``."""
+        stop = None if limit is None else offset + limit
+        return list(itertools.islice(self.get_assignments().items(), offset, stop))
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The whole database as a data.json-shaped dict."""
+        raise NotImplementedError
+
+    def replace(self, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class JsonStore(StorageBackend):
+    """In-memory copy of data.json that persists mutations as journal records.
+
+    The snapshot (data.json) is read once at startup and the journal is
+    replayed on top of it. Every mutation is applied in memory and appended
+    to the journal as a single JSON line; once the journal reaches
+    ``compact_ratio`` of the snapshot's size it is folded back into a fresh
+    snapshot, so rewrites stay proportional to what was appended.
+
+    Several processes (e.g. gunicorn workers) may share the files. Writers
+    hold an exclusive lock on ``data.lock`` and readers a shared one. Each
+    process remembers how far into the journal it has read; that position
+    acts as an optimistic version. A commit that finds it has moved first
+    replays the other processes' records, so its dedup checks see the latest
+    data and concurrent send_user calls both land. Snapshots are written to
+    a temporary file and renamed into place, so data.json is never seen
+    half-written.
+    """
+
+    def __init__(self, data_file: str = DATA_FILE, journal_file: Optional[str] = None,
+                 compact_ratio: float = COMPACT_RATIO) -> None:
+        super().__init__()
+        self.data_file = data_file
+        base = os.path.splitext(data_file)[0]
+        self.journal_file = journal_file or base + ".journal"
+        self.lock_file = base + ".lock"
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        with self._lock, _file_lock(self.lock_file, exclusive=not os.path.exists(data_file)):
+            self._load()
+
+    # Loading
+
+    def _load(self) -> None:
+        self._data = self._load_snapshot()
+        self._snapshot_id = _file_id(self.data_file)
+        # Per-user membership sets so dedup checks don't scan the stored lists
+        self._keys: Dict[str, Dict[str, set]] = {}
+        self._journal_offset = 0
+        self._replay_journal()
+
+    def _load_snapshot(self) -> Dict[str, Any]:
+        if not os.path.exists(self.data_file):
+            data = empty_data()
+            self._write_snapshot(data)
+            return data
+
+        with open(self.data_file, "r") as f:
+            content = f.read().strip()
+        STORE_BYTES.inc(len(content), file="snapshot", direction="read")
+        self._snapshot_bytes = len(content)
+        if not content:
+            return empty_data()
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            # Starting empty would overwrite it at the next compaction
+            raise ValueError(f"{self.data_file} is not valid JSON ({e}); it was left untouched") from e
+        data.setdefault("users", {})
+        data.setdefault("assignments", {})
+        return data
+
+    def _replay_journal(self, notify: bool = False) -> None:
+        """Apply journal records past our offset; with notify, report them like local commits."""
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, "rb") as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Still being written, or torn by a crash; the next writer truncates it
+                    break
+                self._journal_offset += len(line)
+                try:
+                    record = json.loads(line) if line.strip() else None
+                except json.JSONDecodeError:
+                    # Complete lines are never rewritten, so skip it and keep the records after it
+                    print(f"⚠️ Skipping unreadable record in {self.journal_file}")
+                    continue
+                if record is None:
+                    continue
+                STORE_BYTES.inc(len(line), file="journal", direction="read")
+                if self.apply(record) and notify:
+                    self._record_applied(record)
+
+    def _catch_up(self) -> None:
+        """Bring memory up to date with the files. Callers hold the file lock."""
+        if _file_id(self.data_file) != self._snapshot_id:
+            # Another process compacted or replaced the data
+            self._load()
+            self._reset_indexes()
+        else:
+            self._replay_journal(notify=True)
+
+    def _journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_file)
+        except OSError:
+            return 0
+
+    def sync(self) -> None:
+        """Pick up changes other processes have written since we last looked."""
+        if _file_id(self.data_file) == self._snapshot_id and self._journal_size() == self._journal_offset:
+            return
+        with self._lock, _file_lock(self.lock_file, exclusive=False):
+            self._catch_up()
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        self.sync()
+        return self._data
+
+    # Persistence
+
+    def _write_snapshot(self, data: Dict[str, Any]) -> None:
+        tmp_file = f"{self.data_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+            self._snapshot_bytes = f.tell()
+            STORE_BYTES.inc(self._snapshot_bytes, file="snapshot", direction="written")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        self._snapshot_id = _file_id(self.data_file)
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        lines = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode()
+        with open(self.journal_file, "a+b") as f:
+            f.seek(self._journal_offset)
+            tail = f.read()
+            if tail and not tail.endswith(b"\n"):
+                # Drop a torn last line so the new records start on a fresh one;
+                # complete lines, readable or not, are never cut
+                f.truncate(self._journal_offset + tail.rfind(b"\n") + 1)
+            f.write(lines)
+        STORE_BYTES.inc(len(lines), file="journal", direction="written")
+        self._journal_offset += len(lines)
+        if self._journal_offset >= max(COMPACT_MIN_BYTES, self.compact_ratio * self._snapshot_bytes):
+            self._compact()
+
+    def _compact(self) -> None:
+        self._write_snapshot(self._data)
+        open(self.journal_file, "w").close()
+        self._journal_offset = 0
+
+    def compact(self) -> None:
+        with self._lock, _file_lock(self.lock_file, exclusive=True):
+            self._catch_up()
+            self._compact()
+
+    def replace(self, data: Dict[str, Any]) -> None:
+        with self._lock, _file_lock(self.lock_file, exclusive=True):
+            self._data = data
+            self._keys = {}
+            self._compact()
+            self._reset_indexes()
+
+    # Mutations
+
+    def _user_keys(self, email: str) -> Dict[str, set]:
+        keys = self._keys.get(email)
+        if keys is None:
+            user = self._data["users"][email]
+            keys = self._keys[email] = {
+                "assignments": {(a["title"], a["due"]) for a in user["assignments"]},
+                "free_time": {(b["start"], b["end"]) for b in user["free_time"]},
+            }
+        return keys
+
+    def apply(self, record: Dict[str, Any]) -> bool:
+        """Apply a journal record to the in-memory data. Returns True if anything changed."""
+        op = record["op"]
+        users = self._data["users"]
+
+        if op == "create_user":
+            if record["email"] in users:
+                return False
+            users[record["email"]] = {
+                "name": record["name"],
+                "email": record["email"],
+                "assignments": [],
+                "free_time": []
+            }
+            return True
+
+        if op == "add_assignment":
+            email, title, due = record["email"], record["title"], record["due"]
+            if email not in users:
+                return False
+            changed = False
+            keys = self._user_keys(email)["assignments"]
+            if (title, due) not in keys:
+                keys.add((title, due))
+                users[email]["assignments"].append({
+                    "title": title,
+                    "due": due,
+                    "description": None
+                })
+                changed = True
+
+            assignment_id = assignment_id_for(title, due)
+            assignments = self._data["assignments"]
+            if assignment_id not in assignments:
+                assignments[assignment_id] = {
+                    "title": title,
+                    "due": due,
+                    "students": [email]
+                }
+                changed = True
+            elif email not in assignments[assignment_id]["students"]:
+                assignments[assignment_id]["students"].append(email)
+                changed = True
+            return changed
+
+        if op == "add_free_time":
+            email = record["email"]
+            if email not in users:
+                return False
+            keys = self._user_keys(email)["free_time"]
+            key = (record["start"], record["end"])
+            if key in keys:
+                return False
+            keys.add(key)
+            users[email]["free_time"].append({
+                "start": record["start"],
+                "end": record["end"]
+            })
+            return True
+
+        if op == "remove_assignment":
+            email, title, due = record["email"], record["title"], record["due"]
+            if email not in users:
+                return False
+            keys = self._user_keys(email)["assignments"]
+            if (title, due) not in keys:
+                return False
+            keys.discard((title, due))
+            user = users[email]
+            user["assignments"] = [a for a in user["assignments"] if (a["title"], a["due"]) != (title, due)]
+
+            assignment_id = assignment_id_for(title, due)
+            cohort = self._data["assignments"].get(assignment_id)
+            # Another (title, due) of the user's may share the slugified id
+            if cohort is not None and not any(assignment_id_for(t, d) == assignment_id for t, d in keys):
+                cohort["students"] = [s for s in cohort["students"] if s != email]
+                if not cohort["students"]:
+                    del self._data["assignments"][assignment_id]
+            return True
+
+        if op == "compact_free_time":
+            from recurring import compact_availability
+            email = record["email"]
+            if email not in users:
+                return False
+            ended_before = record.get("ended_before")
+            ended_before_ts = iso_to_epoch(ended_before) if ended_before else None
+            blocks = users[email]["free_time"]
+            compacted = coalesce_free_time(blocks, ended_before_ts)
+            availability = users[email].get("availability")
+            compacted_availability = compact_availability(availability, ended_before_ts)
+            if compacted == blocks and compacted_availability == availability:
+                return False
+            users[email]["free_time"] = compacted
+            self._user_keys(email)["free_time"] = {(b["start"], b["end"]) for b in compacted}
+            if availability is not None:
+                users[email]["availability"] = compacted_availability
+            return True
+
+        if op == "set_availability":
+            email = record["email"]
+            if email not in users or users[email].get("availability") == record["availability"]:
+                return False
+            users[email]["availability"] = record["availability"]
+            return True
+
+        raise ValueError(f"Unknown journal operation: {op}")
+
+    def commit(self, records: List[Dict[str, Any]]) -> List[bool]:
+        """Apply a batch of records as one transaction.
+
+        The batch is validated up front, applied under the store lock on top
+        of everything other processes have journaled, and the records that
+        changed something are journaled with a single write.
+        Returns one flag per record telling whether it changed the data.
+        """
+        for record in records:
+            if record.get("op") not in OPERATIONS:
+                raise ValueError(f"Unknown journal operation: {record.get('op')}")
+        with self._lock, _file_lock(self.lock_file, exclusive=True):
+            self._catch_up()
+            results = [self.apply(record) for record in records]
+            for record, changed in zip(records, results):
+                if changed:
+                    self._record_applied(record)
+            self._append([r for r, changed in zip(records, results) if changed])
+            return results
+
+    # Reads
+
+    def has_user(self, email: str) -> bool:
+        self.sync()
+        return email in self._data["users"]
+
+    def get_user_emails(self) -> List[str]:
+        self.sync()
+        return list(self._data["users"])
+
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        self.sync()
+        return self._data["users"].get(email)
+
+    def get_free_time(self, email: str, end_before: Optional[str] = None) -> List[Dict[str, str]]:
+        self.sync()
+        user = self._data["users"].get(email)
+        if not user:
+            return []
+        if end_before is None:
+            return list(user["free_time"])
+        limit = iso_to_epoch(end_before)
+        blocks = []
+        for block in user["free_time"]:
+            try:
+                if iso_to_epoch(block["end"]) <= limit:
+                    blocks.append(block)
+            except ValueError:
+                continue
+        return blocks
+
+    def get_availability(self, email: str) -> Optional[Dict[str, Any]]:
+        self.sync()
+        user = self._data["users"].get(email)
+        return user.get("availability") if user else None
+
+    def get_assignment(self, assignment_id: str) -> Optional[Dict[str, Any]]:
+        self.sync()
+        return self._data["assignments"].get(assignment_id)
+
+    def get_assignments(self) -> Dict[str, Any]:
+        self.sync()
+        return self._data["assignments"]
+
+    def get_assignment_page(self, offset: int = 0, limit: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        # Copied under the lock so a concurrent commit can't resize the dict mid-iteration
+        self.sync()
+        with self._lock:
+            stop = None if limit is None else offset + limit
+            return [(i, dict(a, students=list(a["students"])))
+                    for i, a in itertools.islice(self._data["assignments"].items(), offset, stop)]
+
+
+def create_store(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    if backend == "json":
+        return JsonStore()
+    if backend == "sqlite":
+        from sqlite_store import SqliteStore
+        return SqliteStore(SQLITE_FILE)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+_store: Optional[StorageBackend] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> StorageBackend:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+def set_store(store: Optional[StorageBackend]) -> None:
+    global _store
+    _store = store
+    _notify({"op": "replace"})
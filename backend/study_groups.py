@@ -0,0 +1,228 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from availability import CommonWindow, Interval
+from availability_grid import SLOT_MINUTES, AvailabilityGrid
+
+# Group sizes proposed by default: groups grow to GROUP_SIZE, may shrink to
+# MIN_GROUP_SIZE when that buys a window and grow to MAX_GROUP_SIZE when it costs nothing
+GROUP_SIZE = 4
+MIN_GROUP_SIZE = 3
+MAX_GROUP_SIZE = 6
+# Seconds a search may take; the groups found by then are returned
+TIME_BUDGET = 2.0
+# Seeds tried per group, taken from the ungrouped users with the most free time
+SEEDS_PER_GROUP = 4
+# Candidates measured per step: those sharing the most free time with the group
+SHORTLIST = 64
+# Longest free runs of a group measured first to bound the rest
+FIRST_RUNS = 4
+
+
+@dataclass
+class StudyGroups:
+    groups: List[CommonWindow] = field(default_factory=list)
+    # Users left over: too few remained, or none of them shared a long enough window
+    ungrouped: List[Hashable] = field(default_factory=list)
+    # False if the time budget ran out before every user was considered
+    complete: bool = True
+
+
+def _free_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start column and length of every run of True in a 1-D mask."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def _columns(starts: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The columns of the given runs, and where each run begins."""
+    cols = np.concatenate([np.arange(s, s + n) for s, n in zip(starts, lengths)])
+    resets = np.zeros(len(cols), dtype=bool)
+    resets[np.cumsum(lengths) - lengths] = True
+    return cols, resets
+
+
+def _longest_runs(rows: np.ndarray, resets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Length and end column of the longest run of True in each row.
+
+    ``resets`` marks columns that don't directly follow the previous one, so
+    runs restart there even when both columns are True.
+    """
+    if rows.shape[1] == 0:
+        zeros = np.zeros(rows.shape[0], dtype=np.int64)
+        return zeros, zeros
+    idx = np.arange(rows.shape[1])
+    # The last column before each run: a busy one, or the one before a reset
+    breaks = np.where(rows, np.where(resets, idx - 1, -1), idx)
+    runs = idx - np.maximum.accumulate(breaks, axis=1)
+    ends = runs.argmax(axis=1)
+    return runs[np.arange(rows.shape[0]), ends], ends
+
+
+class SubgroupSearch:
+    """Disjoint study groups with long shared windows, from one cohort's availability grid.
+
+    Groups are built one at a time, best first. Each group starts from a few
+    seed users and is grown greedily with the user who keeps the longest
+    window (ties go to more shared free time), then improved by swapping
+    members for outsiders until no swap lengthens the window. A seed's grown
+    group is reused for later groups until one of its members is taken.
+
+    Adding someone can only shorten the group's free runs, so a candidate's
+    window lies inside one of them. The candidates are measured over the
+    group's few longest runs first; the best length found there rules out
+    every shorter run, and only the remaining ones are measured again. Cohorts
+    of a thousand users fit in a second or two.
+    """
+
+    def __init__(self, grid: AvailabilityGrid, size: int = GROUP_SIZE, min_size: int = MIN_GROUP_SIZE,
+                 max_size: int = MAX_GROUP_SIZE, min_slots: int = 1, time_budget: float = TIME_BUDGET) -> None:
+        if not 2 <= min_size <= size <= max_size:
+            raise ValueError("group sizes must satisfy 2 <= min_size <= size <= max_size")
+        self.grid = grid
+        self.matrix = grid.matrix
+        # Slot-major copy: shared free time sums the rows of a group's free slots
+        self._by_slot = np.ascontiguousarray(self.matrix.T, dtype=np.float32)
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_slots = max(1, min_slots)
+        self.deadline = time.perf_counter() + time_budget
+        # Groups grown from each seed, kept while none of their members are taken
+        self._grown: Dict[int, Optional[List[int]]] = {}
+
+    def _out_of_time(self) -> bool:
+        return time.perf_counter() >= self.deadline
+
+    def _best(self, mask: np.ndarray, candidates: np.ndarray) -> Tuple[int, int, int]:
+        """(user, window slots, shared slots) of the candidate who keeps the longest window with ``mask``."""
+        totals = self._by_slot[mask].sum(axis=0)[candidates]
+        if len(candidates) > SHORTLIST:
+            top = np.argpartition(-totals, SHORTLIST)[:SHORTLIST]
+            candidates, totals = candidates[top], totals[top]
+        starts, run_lengths = _free_runs(mask)
+        if not len(starts):
+            return int(candidates[0]), 0, 0
+        longest = np.argsort(-run_lengths, kind="stable")
+        cols, resets = _columns(starts[longest[:FIRST_RUNS]], run_lengths[longest[:FIRST_RUNS]])
+        lengths, _ = _longest_runs(self.matrix[np.ix_(candidates, cols)], resets)
+        # Runs shorter than the best window so far can't hold a better one
+        reach = run_lengths >= lengths.max()
+        if reach.sum() > min(FIRST_RUNS, len(starts)):
+            cols, resets = _columns(starts[reach], run_lengths[reach])
+            lengths, _ = _longest_runs(self.matrix[np.ix_(candidates, cols)], resets)
+
+        # Windows rank first, shared free time breaks ties
+        scale = self.matrix.shape[1] + 1
+        keys = lengths * scale + totals.astype(np.int64)
+        best = int(np.argmax(keys))
+        return int(candidates[best]), int(lengths[best]), int(totals[best])
+
+    def _score(self, members: List[int]) -> Tuple[int, int]:
+        mask = self.matrix[members].all(axis=0)
+        length, _ = _longest_runs(mask[None, :], np.zeros(len(mask), dtype=bool))
+        return int(length[0]), int(mask.sum())
+
+    def _grow(self, seed: int, pool: np.ndarray) -> Optional[List[int]]:
+        members = [seed]
+        mask = self.matrix[seed].copy()
+        length = self._score(members)[0]
+        while len(members) < self.max_size:
+            candidates = pool[~np.isin(pool, members)]
+            if not len(candidates):
+                break
+            best, best_length, _ = self._best(mask, candidates)
+            if best_length < self.min_slots:
+                break
+            # Past the target size, only take people who don't shorten the window
+            if len(members) >= self.size and best_length < length:
+                break
+            members.append(best)
+            mask &= self.matrix[best]
+            length = best_length
+        return members if len(members) >= self.min_size else None
+
+    def _improve(self, members: List[int], pool: np.ndarray) -> List[int]:
+        current = self._score(members)
+        improved = True
+        while improved and not self._out_of_time():
+            improved = False
+            outside = pool[~np.isin(pool, members)]
+            if not len(outside):
+                break
+            for position in range(len(members)):
+                others = members[:position] + members[position + 1:]
+                best, length, total = self._best(self.matrix[others].all(axis=0), outside)
+                if (length, total) > current:
+                    members = others[:position] + [best] + others[position:]
+                    current = (length, total)
+                    improved = True
+                    break
+        return members
+
+    def _window(self, members: List[int]) -> CommonWindow:
+        mask = self.matrix[members].all(axis=0)
+        lengths, ends = _longest_runs(mask[None, :], np.zeros(len(mask), dtype=bool))
+        length, end = int(lengths[0]), int(ends[0]) + 1
+        return CommonWindow(
+            self.grid.start + (end - length) * self.grid.slot,
+            self.grid.start + end * self.grid.slot,
+            frozenset(self.grid.users[m] for m in members),
+        )
+
+    def run(self, max_groups: Optional[int] = None) -> StudyGroups:
+        result = StudyGroups()
+        free_slots = self.matrix.sum(axis=1)
+        # Users who are never free can't join any group
+        pool = np.flatnonzero(free_slots >= self.min_slots)
+        stranded = set(np.flatnonzero(free_slots < self.min_slots).tolist())
+
+        while len(pool) >= self.min_size and (max_groups is None or len(result.groups) < max_groups):
+            if self._out_of_time():
+                result.complete = False
+                break
+            seeds = pool[np.argsort(-free_slots[pool], kind="stable")[:SEEDS_PER_GROUP]]
+            best: Optional[Tuple[Tuple[int, int], List[int]]] = None
+            for seed in seeds:
+                seed = int(seed)
+                if seed not in self._grown:
+                    self._grown[seed] = self._grow(seed, pool)
+                members = self._grown[seed]
+                if members is not None:
+                    score = (self._score(members)[0], len(members))
+                    if best is None or score > best[0]:
+                        best = (score, members)
+                if self._out_of_time():
+                    break
+            if best is None:
+                # Nobody left can be grouped with a long enough window
+                break
+            members = self._improve(best[1], pool)
+            result.groups.append(self._window(members))
+            pool = pool[~np.isin(pool, members)]
+            taken = set(members)
+            self._grown = {seed: grown for seed, grown in self._grown.items()
+                           if seed not in taken and not taken.intersection(grown or ())}
+
+        result.ungrouped = [self.grid.users[i] for i in sorted(stranded | set(pool.tolist()))]
+        result.groups.sort(key=lambda w: (-w.duration, w.start))
+        return result
+
+
+def find_study_groups(availability: Dict[Hashable, List[Interval]], start: int, end: int,
+                      size: int = GROUP_SIZE, min_size: int = MIN_GROUP_SIZE, max_size: int = MAX_GROUP_SIZE,
+                      max_groups: Optional[int] = None, min_duration: int = 0,
+                      time_budget: float = TIME_BUDGET, slot_minutes: int = SLOT_MINUTES) -> StudyGroups:
+    """Split a cohort into disjoint groups of min_size to max_size users with the longest shared windows in [start, end).
+
+    ``availability`` maps a user to their free intervals in epoch seconds.
+    Windows are whole ``slot_minutes`` slots of at least ``min_duration``
+    seconds. Groups come back longest window first.
+    """
+    grid = AvailabilityGrid.from_availability(availability, start, end, slot_minutes)
+    min_slots = -(-min_duration // grid.slot)
+    return SubgroupSearch(grid, size, min_size, max_size, min_slots, time_budget).run(max_groups)
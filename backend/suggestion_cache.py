@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Set, Tuple
+
+import metrics
+from assignment_index import assignment_index
+from store import add_listener, assignment_id_for
+
+# Entries kept before the least recently used one is evicted
+SUGGESTION_CACHE_SIZE = 10000
+
+_MISSING = object()
+
+
+class SuggestionCache:
+    """LRU cache of per-assignment suggestions with dependency tracking.
+
+    Each entry remembers whose free time and which assignment enrollments it
+    was computed from. The cache listens to the store, so an add_free_time
+    for a user drops only the entries that read that user's free time, and
+    an add_assignment drops only the entries for that assignment's cohort
+    (including near-duplicate copies, see assignment_index.py). Retention's
+    removals (see retention.py) invalidate the same way.
+
+    Invalidation listeners are called with the users of every dropped
+    entry, i.e. the cohorts whose suggestions went stale, so the scheduler
+    can recompute them.
+    """
+
+    def __init__(self, max_entries: int = SUGGESTION_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Set[str], Set[str]]]" = OrderedDict()
+        self._by_user: Dict[str, Set[Hashable]] = {}
+        self._by_assignment: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._invalidation_listeners: List[Callable[[Set[str]], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def put(self, key: Hashable, value: Any, users: Iterable[str], assignment_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._discard(key)
+            users, assignment_ids = set(users), set(assignment_ids)
+            self._entries[key] = (value, users, assignment_ids)
+            for email in users:
+                self._by_user.setdefault(email, set()).add(key)
+            for assignment_id in assignment_ids:
+                self._by_assignment.setdefault(assignment_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def add_invalidation_listener(self, listener: Callable[[Set[str]], None]) -> None:
+        if listener not in self._invalidation_listeners:
+            self._invalidation_listeners.append(listener)
+
+    def _invalidated(self, users: Set[str]) -> None:
+        # Called outside the lock; listeners may read the cache
+        if users:
+            for listener in self._invalidation_listeners:
+                listener(users)
+
+    def _discard(self, key: Hashable) -> Set[str]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return set()
+        _, users, assignment_ids = entry
+        for email in users:
+            keys = self._by_user.get(email)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[email]
+        for assignment_id in assignment_ids:
+            keys = self._by_assignment.get(assignment_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_assignment[assignment_id]
+        return users
+
+    def invalidate_user(self, email: str) -> None:
+        stale: Set[str] = set()
+        with self._lock:
+            for key in list(self._by_user.get(email, ())):
+                stale |= self._discard(key)
+        self._invalidated(stale)
+
+    def invalidate_assignment(self, assignment_id: str) -> None:
+        stale: Set[str] = set()
+        with self._lock:
+            for key in list(self._by_assignment.get(assignment_id, ())):
+                stale |= self._discard(key)
+        self._invalidated(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            stale = set(self._by_user)
+            self._entries.clear()
+            self._by_user.clear()
+            self._by_assignment.clear()
+        self._invalidated(stale)
+
+    def on_record(self, record: Dict[str, Any]) -> None:
+        op = record["op"]
+        if op in ("add_free_time", "compact_free_time", "set_availability"):
+            self.invalidate_user(record["email"])
+        elif op == "remove_assignment":
+            self.invalidate_assignment(assignment_id_for(record["title"], record["due"]))
+        elif op == "add_assignment":
+            self.invalidate_assignment(assignment_id_for(record["title"], record["due"]))
+            # Fuzzy entries are only computed through a built index, and only a
+            # replace (which also clears this cache) unbuilds it
+            if assignment_index.built:
+                # A new copy of an assignment joins the cohorts of its near-duplicates
+                for assignment_id in assignment_index.matches(record["title"], record["due"]):
+                    self.invalidate_assignment(assignment_id)
+        elif op == "replace":
+            self.clear()
+
+
+suggestion_cache = SuggestionCache()
+add_listener(suggestion_cache.on_record)
+
+metrics.gauge("suggestion_cache_hits", "Suggestion cache hits since startup.", lambda: suggestion_cache.hits)
+metrics.gauge("suggestion_cache_misses", "Suggestion cache misses since startup.", lambda: suggestion_cache.misses)
+metrics.gauge("suggestion_cache_hit_ratio", "Share of suggestion cache lookups that hit.",
+              lambda: suggestion_cache.hits / max(1, suggestion_cache.hits + suggestion_cache.misses))
+metrics.gauge("suggestion_cache_entries", "Suggestions currently cached.", lambda: len(suggestion_cache))
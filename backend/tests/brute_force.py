@@ -0,0 +1,44 @@
+"""Slow reference answers on small integer timelines, for checking the engines."""
+from itertools import combinations
+from typing import Dict, Hashable, List, Set, Tuple
+
+Interval = Tuple[int, int]
+
+
+def free_points(intervals: List[Interval]) -> Set[int]:
+    """Every t with [t, t + 1) inside one of the intervals."""
+    return {t for start, end in intervals for t in range(start, end)}
+
+
+def longest_run(points: Set[int]) -> int:
+    best = 0
+    for t in points:
+        if t - 1 not in points:
+            length = 1
+            while t + length in points:
+                length += 1
+            best = max(best, length)
+    return best
+
+
+def best_duration_by_size(availability: Dict[Hashable, List[Interval]]) -> Dict[int, int]:
+    """{group size: longest window some group of exactly that size shares}, sizes with none left out."""
+    free = {user: free_points(intervals) for user, intervals in availability.items()}
+    best: Dict[int, int] = {}
+    for size in range(2, len(free) + 1):
+        length = max(longest_run(set.intersection(*(free[u] for u in group)))
+                     for group in combinations(free, size))
+        if length:
+            best[size] = length
+    return best
+
+
+def random_availability(rng, users: int, horizon: int, blocks: int = 4, step: int = 1) -> Dict[str, List[Interval]]:
+    availability = {}
+    for u in range(users):
+        intervals = []
+        for _ in range(rng.randint(0, blocks)):
+            start = rng.randrange(0, horizon) * step
+            intervals.append((start, start + rng.randint(1, horizon // 3) * step))
+        availability[f"user{u}"] = intervals
+    return availability
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules are imported flat, as when running from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import JsonStore, set_store  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A JsonStore in a temporary directory, installed as the store every module uses."""
+    monkeypatch.chdir(tmp_path)
+    json_store = JsonStore(str(tmp_path / "data.json"))
+    # Clears the suggestion cache and assignment index through their store listeners
+    set_store(json_store)
+    yield json_store
+    set_store(None)
+
+
+@pytest.fixture
+def exact_matching(monkeypatch):
+    """Match assignments by exact id only, as with FUZZY_MATCHING=0."""
+    import db_utils
+    monkeypatch.setattr(db_utils.cohort_assignment_ids, "__defaults__", (False,))
+    monkeypatch.setattr(db_utils.get_overlapping_users_for_assignment, "__defaults__", (False,))
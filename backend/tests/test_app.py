@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from app import app
+
+DUE = "2025-04-07T23:59:00+00:00"
+
+
+@pytest.fixture
+def client(store):
+    for i in range(5):
+        email = f"user{i}@x.com"
+        store.create_user(email, email)
+        store.add_assignment(email, f"Homework {i}", DUE)
+    return app.test_client()
+
+
+def test_assignments_revalidate_until_the_store_changes(client, store):
+    first = client.get("/api/assignments")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert len(first.get_json()) == 5
+
+    again = client.get("/api/assignments", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+
+    store.add_assignment("user0@x.com", "Homework 9", DUE)
+    changed = client.get("/api/assignments", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_user_etag_only_changes_with_that_user(client, store):
+    etag = client.get("/api/user/user0@x.com").headers["ETag"]
+    store.add_free_time("user1@x.com", "2025-04-06T09:00:00+00:00", "2025-04-06T10:00:00+00:00")
+    assert client.get("/api/user/user0@x.com", headers={"If-None-Match": etag}).status_code == 304
+
+    store.add_free_time("user0@x.com", "2025-04-06T09:00:00+00:00", "2025-04-06T10:00:00+00:00")
+    assert client.get("/api/user/user0@x.com", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/api/user/nobody@x.com").status_code == 404
+
+
+def test_ndjson_pages_cover_every_assignment_once(client, store):
+    ids, offset = [], 0
+    while offset is not None:
+        response = client.get(f"/api/assignments?format=ndjson&limit=2&offset={offset}")
+        assert response.mimetype == "application/x-ndjson"
+        ids.extend(json.loads(line)["id"] for line in response.data.decode().splitlines())
+        next_offset = response.headers.get("X-Next-Offset")
+        offset = int(next_offset) if next_offset else None
+    assert ids == list(store.get_assignments())
+
+
+def test_ndjson_by_accept_header_and_bad_paging(client):
+    response = client.get("/api/assignments", headers={"Accept": "application/x-ndjson"})
+    assert len(response.data.decode().splitlines()) == 5
+    assert "X-Next-Offset" not in response.headers
+    assert client.get("/api/assignments?format=ndjson&limit=ten").status_code == 400
@@ -0,0 +1,46 @@
+from assignment_index import AssignmentIndex, normalize_title
+from store import assignment_id_for
+
+DUE = "2025-04-07T23:59:00+00:00"
+NEXT_DAY = "2025-04-08T20:00:00+00:00"
+
+
+def test_normalize_title_drops_course_suffixes():
+    assert normalize_title("Homework 7 [HM CSCI 151.1 SP25] (CS 158)") == ["homework", "7"]
+
+
+def test_matches_copies_but_not_other_numbers(store):
+    store.create_user("A", "a@x.com")
+    store.add_assignment("a@x.com", "Homework 7 [CS 70 SP25]", DUE)
+    store.add_assignment("a@x.com", "Homework 8 [CS 70 SP25]", DUE)
+    index = AssignmentIndex()
+    assert index.matches("Homework 7 (CS 70)", NEXT_DAY) == [assignment_id_for("Homework 7 [CS 70 SP25]", DUE)]
+    assert index.matches("Homework 7", "2025-04-12T23:59:00+00:00") == []
+
+
+def test_removal_drops_an_entry_only_once_its_cohort_is_gone(store):
+    index = AssignmentIndex()
+    for email in ("a@x.com", "b@x.com"):
+        store.create_user(email, email)
+        store.add_assignment(email, "Homework 7", DUE)
+        index.add("Homework 7", DUE)
+    store.add_assignment("a@x.com", "Essay 2", DUE)
+    index.add("Essay 2", DUE)
+    assert index.matches("Homework 7", DUE)
+    homework = assignment_id_for("Homework 7", DUE)
+
+    store.remove_assignment("a@x.com", "Homework 7", DUE)
+    index.remove(homework)
+    assert index.matches("Homework 7", DUE) == [homework]
+    assert index.built and len(index) == 2
+
+    store.remove_assignment("b@x.com", "Homework 7", DUE)
+    index.remove(homework)
+    assert index.matches("Homework 7", DUE) == []
+    assert index.built and len(index) == 1
+
+    # Added back after the removal was noted: kept
+    store.add_assignment("b@x.com", "Homework 7", DUE)
+    index.remove(homework)
+    index.add("Homework 7", DUE)
+    assert index.matches("Homework 7", DUE) == [homework]
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from availability import (LARGEST_GROUP, LONGEST, CommonWindow, choose_window, common_windows, interval_overlaps,
+                          overlap_matrix)
+from brute_force import best_duration_by_size, free_points, random_availability
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_common_windows_matches_brute_force(seed):
+    rng = random.Random(seed)
+    availability = random_availability(rng, users=rng.randint(2, 5), horizon=40)
+    windows = common_windows(availability, top_k=2)
+
+    assert {size: found[0].duration for size, found in windows.items()} == best_duration_by_size(availability)
+    for size, found in windows.items():
+        assert [w.duration for w in found] == sorted((w.duration for w in found), reverse=True)
+        for window in found:
+            assert len(window.members) == size
+            for user in window.members:
+                assert set(range(window.start, window.end)) <= free_points(availability[user])
+
+
+def test_common_windows_counts_overlapping_blocks_of_one_user_once():
+    windows = common_windows({"a": [(0, 10), (5, 15)], "b": [(0, 20)]})
+    assert windows == {2: [CommonWindow(0, 15, frozenset({"a", "b"}))]}
+
+
+def test_common_windows_touching_blocks_do_not_overlap():
+    assert common_windows({"a": [(0, 10)], "b": [(10, 20)]}) == {}
+
+
+def test_common_windows_min_duration():
+    availability = {"a": [(0, 10), (20, 50)], "b": [(0, 10), (20, 30)], "c": [(0, 60)]}
+    windows = common_windows(availability, min_duration=15)
+    assert {size: [(w.start, w.end) for w in found] for size, found in windows.items()} == {2: [(20, 50)]}
+
+
+def test_choose_window_policies():
+    small = CommonWindow(0, 100, frozenset({"a", "b"}))
+    big = CommonWindow(0, 10, frozenset({"a", "b", "c"}))
+    windows = {2: [small], 3: [big]}
+    assert choose_window(windows, LARGEST_GROUP) == big
+    assert choose_window(windows, LONGEST) == small
+    assert choose_window({}) is None
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_interval_overlaps_matches_brute_force(seed):
+    rng = random.Random(seed)
+    a, b = (sorted(free_intervals) for free_intervals in random_availability(rng, users=2, horizon=60).values())
+    a, b = _merged(a), _merged(b)
+    overlaps = interval_overlaps(a, b)
+    assert free_points(overlaps) == free_points(a) & free_points(b)
+    assert all(start < end for start, end in overlaps)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_overlap_matrix_matches_brute_force(seed):
+    rng = random.Random(seed)
+    availability = random_availability(rng, users=rng.randint(1, 6), horizon=50)
+    users, matrix, overlaps = overlap_matrix(availability, include_overlaps=True)
+
+    assert users == list(availability)
+    free = [free_points(availability[u]) for u in users]
+    for i in range(len(users)):
+        for j in range(len(users)):
+            assert matrix[i][j] == len(free[i] & free[j])
+    for (i, j), blocks in overlaps.items():
+        assert i < j
+        assert free_points(blocks) == free[i] & free[j]
+
+
+def _merged(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,35 @@
+import random
+
+import numpy as np
+import pytest
+
+from availability_grid import AvailabilityGrid
+from brute_force import best_duration_by_size, random_availability
+
+MINUTE = 60
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_best_windows_matches_brute_force(seed):
+    # One-minute slots on minute boundaries make the grid exact
+    rng = random.Random(seed)
+    availability = random_availability(rng, users=rng.randint(2, 5), horizon=40, step=MINUTE)
+    grid = AvailabilityGrid.from_availability(availability, 0, 60 * MINUTE, slot_minutes=1)
+    windows = grid.best_windows()
+
+    in_minutes = {u: [(s // MINUTE, e // MINUTE) for s, e in intervals] for u, intervals in availability.items()}
+    assert {size: found[0].duration // MINUTE for size, found in windows.items()} == best_duration_by_size(in_minutes)
+    for size, (window,) in windows.items():
+        assert len(window.members) == size
+        first, last = window.start // MINUTE, window.end // MINUTE
+        assert grid.all_free(list(window.members))[first:last].all()
+
+
+def test_partial_slots_are_busy():
+    grid = AvailabilityGrid.from_availability({"a": [(10 * MINUTE, 50 * MINUTE)]}, 0, 60 * MINUTE, slot_minutes=15)
+    assert grid.matrix.tolist() == [[False, True, True, False]]
+
+
+def test_longest_run():
+    assert AvailabilityGrid.longest_run(np.array([True, False, True, True, False])) == (2, 4)
+    assert AvailabilityGrid.longest_run(np.zeros(3, dtype=bool)) is None
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from google.oauth2.credentials import Credentials
+from werkzeug.serving import make_server
+
+import calendar_fetch
+import fake_google
+import google_async
+from client_cache import ClientCache
+
+PRIMARY = "user1@example.com"
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """fake_google.py on a free local port, with five synthetic users."""
+    monkeypatch.setattr(fake_google, "fixtures", fake_google.SyntheticFixtures(5))
+    server = make_server("127.0.0.1", 0, fake_google.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(google_async, "CALENDAR_API", f"{base}/calendar/v3")
+    yield base
+    server.shutdown()
+    thread.join()
+
+
+def creds():
+    return Credentials(token="fake-access-1", refresh_token="fake-refresh-1", client_id="x", client_secret="y")
+
+
+def window():
+    now = datetime.now(timezone.utc)
+    return now, now + timedelta(weeks=2), now + timedelta(weeks=16)
+
+
+def monthly(events):
+    return [e for e in events if e.get("recurringEventId") == "u1m0"]
+
+
+def test_instances_route_pages_and_404s():
+    client = fake_google.app.test_client()
+    headers = {"Authorization": "Bearer fake-access-1"}
+    start = fake_google.fixtures.start
+    url = "/calendar/v3/calendars/primary/events/u1m0/instances"
+    params = {"timeMin": start.isoformat(), "timeMax": (start + timedelta(days=365)).isoformat(), "maxResults": 5}
+
+    ids, page_token = [], None
+    while True:
+        body = client.get(url, query_string=dict(params, **({"pageToken": page_token} if page_token else {})),
+                          headers=headers).get_json()
+        ids += [e["id"] for e in body["items"]]
+        page_token = body.get("nextPageToken")
+        if not page_token:
+            break
+    assert len(ids) == len(set(ids)) in (12, 13)
+    assert client.get("/calendar/v3/calendars/primary/events/nope/instances", headers=headers).status_code == 404
+    assert client.get(url).status_code == 401
+
+
+def test_threaded_fetch_lists_instances(fake_server):
+    time_min, time_max, until = window()
+    service = ClientCache().calendar_service(creds(), f"{fake_server}/calendar/v3/")
+    http = calendar_fetch.authorized_http(creds())
+
+    instances = calendar_fetch.list_instances(service, http, PRIMARY, "u1m0", time_min, until)
+    assert len(instances) in (3, 4)
+    fetched = calendar_fetch.fetch_events(service, creds(), [PRIMARY], "test", time_min, time_max,
+                                          incremental=False, recurring_until=until)
+    assert fetched.complete
+    assert [e["id"] for e in monthly(fetched.events)] == [e["id"] for e in instances]
+    # One-off events stop at time_max
+    assert all(datetime.fromisoformat(e["start"]["dateTime"]) < time_max
+               for e in fetched.events if not e.get("recurrence") and not e.get("recurringEventId"))
+
+
+def test_async_fetch_lists_instances(fake_server):
+    time_min, time_max, until = window()
+
+    async def run():
+        try:
+            instances = await google_async.list_instances(creds(), PRIMARY, "u1m0", time_min, until)
+            fetched = await google_async.fetch_events(creds(), [PRIMARY], "test", time_min, time_max,
+                                                      incremental=False, recurring_until=until)
+            return instances, fetched
+        finally:
+            await google_async.aclose()
+
+    instances, fetched = asyncio.run(run())
+    assert len(instances) in (3, 4)
+    assert fetched.complete
+    assert [e["id"] for e in monthly(fetched.events)] == [e["id"] for e in instances]
@@ -0,0 +1,52 @@
+import random
+from datetime import time
+
+import pytest
+
+from brute_force import free_points
+from free_time_index import FreeTimeIndex
+from recurring import RecurringAvailability
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_add_and_query_match_brute_force(seed):
+    rng = random.Random(seed)
+    index = FreeTimeIndex()
+    blocks = []
+    for _ in range(rng.randint(0, 15)):
+        start = rng.randint(0, 100)
+        end = start + rng.randint(0, 15)
+        index.add(start, end)
+        blocks.append((start, end))
+
+    assert index.starts == sorted(index.starts) and all(e < s for e, s in zip(index.ends, index.starts[1:]))
+    for _ in range(10):
+        start, end = rng.randint(-5, 110), rng.randint(-5, 120)
+        found = index.query(start, end)
+        assert all(s < e for s, e in found)
+        assert free_points(found) == {t for t in free_points(blocks) if start <= t < end}
+
+
+def test_from_blocks_merges_touching_and_skips_bad_blocks():
+    index = FreeTimeIndex.from_blocks([
+        {"start": "2025-04-07T10:00:00+00:00", "end": "2025-04-07T11:00:00+00:00"},
+        {"start": "2025-04-07T09:00:00+00:00", "end": "2025-04-07T10:00:00+00:00"},
+        {"start": "not a date", "end": "2025-04-07T10:00:00+00:00"},
+        {"start": "2025-04-07T12:00:00+00:00"},
+    ])
+    assert index.query() == [(1744016400, 1744023600)]
+
+
+def test_empty_window():
+    index = FreeTimeIndex()
+    index.add(0, 100)
+    assert index.query(50, 50) == []
+    assert index.query(60, 40) == []
+
+
+def test_recurring_template_is_merged_with_stored_blocks():
+    template = RecurringAvailability(since=0, until=7 * 86400, day_start=time(9), day_end=time(17))
+    index = FreeTimeIndex(template)
+    index.add(17 * 3600, 18 * 3600)
+    # Thursday 1 January 1970, 09:00-18:00 UTC
+    assert index.query(0, 86400) == [(9 * 3600, 18 * 3600)]
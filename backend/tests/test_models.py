@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+import db_utils
+from models import Assignment
+from store import assignment_id_for
+
+
+def test_naive_due_round_trips():
+    assignment = Assignment("homework 7", "2025-04-07T23:59:00")
+    assert assignment.due == datetime(2025, 4, 7, 23, 59)
+    assert assignment.to_dict()["due"] == "2025-04-07T23:59:00"
+
+
+def test_aware_due_keeps_its_offset():
+    due = datetime(2025, 4, 7, 23, 59, tzinfo=timezone(timedelta(hours=-7)))
+    assert Assignment("homework 7", due).due.isoformat() == "2025-04-07T23:59:00-07:00"
+
+
+def test_naive_and_aware_due_are_the_same_instant():
+    assert Assignment("a", "2025-04-07T23:59:00").due_ts == Assignment("a", "2025-04-07T23:59:00+00:00").due_ts
+
+
+def test_suggestions_for_a_due_time_stored_without_timezone(store, exact_matching):
+    due = datetime(2025, 4, 7, 23, 59)
+    for email in ("a@example.com", "b@example.com"):
+        db_utils.create_user("Student", email)
+        db_utils.add_assignment_to_user(email, "homework 7", due)
+        db_utils.add_free_time_to_user(email, "2025-04-06T09:00:00+00:00", "2025-04-06T11:00:00+00:00")
+
+    suggestions = db_utils.get_suggestions_for_email("a@example.com")
+    assert [s["group_size"] for s in suggestions] == [2]
+    assert suggestions == db_utils.get_batch_suggestions(["a@example.com"])["a@example.com"]
+    assert store.get_assignment(assignment_id_for("homework 7", suggestions[0]["due"]))
@@ -0,0 +1,55 @@
+import json
+from datetime import datetime, timezone
+
+from retention import run_retention
+
+NOW = datetime(2025, 4, 10, 12, tzinfo=timezone.utc)
+OLD_DUE = "2025-04-07T23:59:00+00:00"
+NEW_DUE = "2025-04-20T23:59:00+00:00"
+
+
+def seed(store):
+    for email in ("a@x.com", "b@x.com"):
+        store.create_user(email, email)
+        store.add_assignment(email, "Homework 7", OLD_DUE)
+        store.add_assignment(email, "Homework 8", NEW_DUE)
+        store.add_free_time(email, "2025-04-06T09:00:00+00:00", "2025-04-06T10:00:00+00:00")
+        store.add_free_time(email, "2025-04-11T09:00:00+00:00", "2025-04-11T10:00:00+00:00")
+        store.add_free_time(email, "2025-04-11T10:00:00+00:00", "2025-04-11T12:00:00+00:00")
+
+
+def test_dry_run_reports_without_changing_anything(store):
+    seed(store)
+    before = json.dumps(store.data, sort_keys=True)
+    report = run_retention(NOW, grace_hours=24, archive_file=None, dry_run=True)
+    assert report["assignments_removed"] == 2
+    assert report["cohorts_removed"] == 1
+    assert report["free_time_before"] == 6 and report["free_time_after"] == 2
+    assert json.dumps(store.data, sort_keys=True) == before
+
+
+def test_pass_drops_expired_cohorts_and_ended_blocks(store, tmp_path):
+    seed(store)
+    archive = tmp_path / "archive.ndjson"
+    run_retention(NOW, grace_hours=24, archive_file=str(archive))
+
+    assert list(store.get_assignments().values()) == [
+        {"title": "Homework 8", "due": NEW_DUE, "students": ["a@x.com", "b@x.com"]}]
+    assert store.get_free_time("a@x.com") == [
+        {"start": "2025-04-11T09:00:00+00:00", "end": "2025-04-11T12:00:00+00:00"}]
+    entries = [json.loads(line) for line in archive.read_text().splitlines()]
+    assert [e["email"] for e in entries] == ["a@x.com", "b@x.com"]
+    assert [a["title"] for a in entries[0]["assignments"]] == ["Homework 7"]
+
+
+def test_grace_period_keeps_recently_due_assignments(store):
+    seed(store)
+    run_retention(NOW, grace_hours=24 * 7, archive_file=None)
+    assert len(store.get_assignments()) == 2
+
+
+def test_second_pass_has_nothing_to_do(store):
+    seed(store)
+    run_retention(NOW, grace_hours=24, archive_file=None)
+    report = run_retention(NOW, grace_hours=24, archive_file=None)
+    assert report["users_changed"] == 0
@@ -0,0 +1,144 @@
+import json
+import os
+
+import pytest
+
+import store as store_module
+from sqlite_store import SqliteStore
+from store import JsonStore, assignment_id_for
+
+DUE = "2025-04-07T23:59:00+00:00"
+
+
+def records(email, hour=9):
+    return [
+        {"op": "create_user", "name": "Student", "email": email},
+        {"op": "add_assignment", "email": email, "title": "homework 7", "due": DUE},
+        {"op": "add_free_time", "email": email,
+         "start": f"2025-04-06T{hour:02d}:00:00+00:00", "end": f"2025-04-06T{hour + 1:02d}:00:00+00:00"},
+    ]
+
+
+def journal_lines(json_store):
+    with open(json_store.journal_file, "rb") as f:
+        return f.read().splitlines()
+
+
+def test_commit_reports_what_changed(tmp_path):
+    json_store = JsonStore(str(tmp_path / "data.json"))
+    assert json_store.commit(records("a@x.com")) == [True, True, True]
+    assert json_store.commit(records("a@x.com")) == [False, False, False]
+    assert len(journal_lines(json_store)) == 3
+
+
+def test_unknown_operation_is_rejected_before_anything_applies(tmp_path):
+    json_store = JsonStore(str(tmp_path / "data.json"))
+    with pytest.raises(ValueError):
+        json_store.commit(records("a@x.com") + [{"op": "drop_everything"}])
+    assert not json_store.has_user("a@x.com")
+
+
+def test_journal_is_replayed_on_load(tmp_path):
+    path = str(tmp_path / "data.json")
+    JsonStore(path).commit(records("a@x.com") + records("b@x.com"))
+    reloaded = JsonStore(path)
+    assert reloaded.get_user_emails() == ["a@x.com", "b@x.com"]
+    assert reloaded.get_assignment(assignment_id_for("homework 7", DUE))["students"] == ["a@x.com", "b@x.com"]
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "COMPACT_MIN_BYTES", 0)
+    path = str(tmp_path / "data.json")
+    json_store = JsonStore(path, compact_ratio=1.0)
+    for i in range(20):
+        json_store.commit(records(f"user{i}@x.com"))
+
+    # Every compaction rewrites the snapshot; in between the journal stays under its size
+    assert os.path.getsize(json_store.journal_file) < os.path.getsize(path)
+    with open(path) as f:
+        snapshot = json.load(f)
+    assert len(snapshot["users"]) + len(journal_lines(json_store)) // 3 >= 20
+    assert JsonStore(path).data == json_store.data
+
+
+def test_explicit_compact_empties_the_journal(tmp_path):
+    path = str(tmp_path / "data.json")
+    json_store = JsonStore(path)
+    json_store.commit(records("a@x.com"))
+    json_store.compact()
+    assert journal_lines(json_store) == []
+    assert JsonStore(path).get_user("a@x.com") == json_store.get_user("a@x.com")
+
+
+def test_torn_tail_is_dropped_by_the_next_writer(tmp_path):
+    path = str(tmp_path / "data.json")
+    JsonStore(path).commit(records("a@x.com"))
+    with open(str(tmp_path / "data.journal"), "ab") as f:
+        f.write(b'{"op":"create_us')
+
+    json_store = JsonStore(path)
+    json_store.commit(records("b@x.com"))
+    assert all(json.loads(line) for line in journal_lines(json_store))
+    assert JsonStore(path).get_user_emails() == ["a@x.com", "b@x.com"]
+
+
+def test_unreadable_line_is_skipped_and_later_records_survive(tmp_path):
+    path = str(tmp_path / "data.json")
+    JsonStore(path).commit(records("a@x.com"))
+    with open(str(tmp_path / "data.journal"), "ab") as f:
+        f.write(b'{"op":"create_us\n')
+        f.write(json.dumps(records("b@x.com")[0]).encode() + b"\n")
+
+    json_store = JsonStore(path)
+    json_store.commit(records("c@x.com"))
+    assert JsonStore(path).get_user_emails() == ["a@x.com", "b@x.com", "c@x.com"]
+
+
+def test_two_instances_see_each_others_writes(tmp_path):
+    # Stands in for two worker processes sharing the files
+    path = str(tmp_path / "data.json")
+    first, second = JsonStore(path), JsonStore(path)
+    first.commit(records("a@x.com"))
+    assert second.has_user("a@x.com")
+
+    # second dedups against first's data before appending its own
+    assert second.commit(records("a@x.com") + records("b@x.com", hour=13)) == [False] * 3 + [True] * 3
+    first.compact()
+    assert second.get_user_emails() == ["a@x.com", "b@x.com"]
+
+
+def test_compact_free_time_drops_ended_blocks_and_merges(tmp_path):
+    json_store = JsonStore(str(tmp_path / "data.json"))
+    json_store.commit(records("a@x.com", hour=9) + records("a@x.com", hour=10)[2:] + records("a@x.com", hour=20)[2:])
+    json_store.compact_free_time("a@x.com", "2025-04-06T12:00:00+00:00")
+    assert json_store.get_free_time("a@x.com") == [
+        {"start": "2025-04-06T20:00:00+00:00", "end": "2025-04-06T21:00:00+00:00"}]
+
+
+def test_sqlite_store_matches_json_store(tmp_path):
+    json_store = JsonStore(str(tmp_path / "data.json"))
+    sqlite_store = SqliteStore(str(tmp_path / "data.db"))
+    batch = records("a@x.com") + records("b@x.com", hour=13) + [
+        {"op": "remove_assignment", "email": "a@x.com", "title": "homework 7", "due": DUE}]
+    assert json_store.commit(batch) == sqlite_store.commit(batch)
+    assert sqlite_store.get_user_emails() == json_store.get_user_emails()
+    for email in json_store.get_user_emails():
+        assert sqlite_store.get_user(email) == json_store.get_user(email)
+    assert sqlite_store.get_assignments() == json_store.get_assignments()
+
+
+def test_sqlite_replace_is_one_transaction(tmp_path, monkeypatch):
+    sqlite_store = SqliteStore(str(tmp_path / "data.db"))
+    sqlite_store.commit(records("a@x.com"))
+    apply = sqlite_store._apply
+
+    def fail_on_assignments(cur, record):
+        if record["op"] == "add_assignment":
+            raise RuntimeError("disk full")
+        return apply(cur, record)
+
+    monkeypatch.setattr(sqlite_store, "_apply", fail_on_assignments)
+    with pytest.raises(RuntimeError):
+        sqlite_store.replace(JsonStore(str(tmp_path / "other.json")).data | {
+            "users": {"b@x.com": {"name": "B", "assignments": [{"title": "t", "due": DUE}], "free_time": []}}})
+    assert SqliteStore(str(tmp_path / "data.db")).get_user_emails() == ["a@x.com"]
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from brute_force import free_points, longest_run, random_availability
+from study_groups import find_study_groups
+
+MINUTE = 60
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_groups_are_disjoint_and_their_windows_are_shared(seed):
+    rng = random.Random(seed)
+    availability = random_availability(rng, users=rng.randint(3, 14), horizon=60, blocks=5, step=MINUTE)
+    found = find_study_groups(availability, 0, 90 * MINUTE, size=3, min_size=2, max_size=4, slot_minutes=1)
+
+    grouped = [user for window in found.groups for user in window.members]
+    assert len(grouped) == len(set(grouped))
+    assert sorted(grouped + found.ungrouped) == sorted(availability)
+    assert found.complete
+    for window in found.groups:
+        assert 2 <= len(window.members) <= 4
+        shared = set.intersection(*(free_points([(s // MINUTE, e // MINUTE) for s, e in availability[u]])
+                                    for u in window.members))
+        # The reported window is shared and is the members' longest one
+        assert set(range(window.start // MINUTE, window.end // MINUTE)) <= shared
+        assert window.duration // MINUTE == longest_run(shared)
+    assert [w.duration for w in found.groups] == sorted((w.duration for w in found.groups), reverse=True)
+
+
+def test_finds_the_two_obvious_groups():
+    morning = [(0, 60 * MINUTE)]
+    evening = [(120 * MINUTE, 180 * MINUTE)]
+    availability = {"a": morning, "b": morning, "c": morning, "x": evening, "y": evening, "z": evening}
+    found = find_study_groups(availability, 0, 180 * MINUTE, size=3, min_size=3, max_size=3)
+    assert sorted(sorted(w.members) for w in found.groups) == [["a", "b", "c"], ["x", "y", "z"]]
+    assert found.ungrouped == []
+
+
+def test_users_who_are_never_free_are_left_over():
+    availability = {"a": [(0, 60 * MINUTE)], "b": [(0, 60 * MINUTE)], "c": [], "d": [(0, 60 * MINUTE)]}
+    found = find_study_groups(availability, 0, 60 * MINUTE, size=3, min_size=2, max_size=3)
+    assert [sorted(w.members) for w in found.groups] == [["a", "b", "d"]]
+    assert found.ungrouped == ["c"]
+
+
+def test_rejects_impossible_sizes():
+    with pytest.raises(ValueError):
+        find_study_groups({}, 0, 60, size=2, min_size=3)
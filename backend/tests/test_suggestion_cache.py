@@ -0,0 +1,138 @@
+import pytest
+
+import db_utils
+from suggestion_cache import SuggestionCache, suggestion_cache
+
+DUE = "2025-04-07T23:59:00+00:00"
+
+
+def free(hour_from, hour_to, day=6):
+    return f"2025-04-{day:02d}T{hour_from:02d}:00:00+00:00", f"2025-04-{day:02d}T{hour_to:02d}:00:00+00:00"
+
+
+def enroll(store, email, title="Homework 7 [CS 70 SP25]", due=DUE, blocks=((9, 12),)):
+    store.create_user(email.split("@")[0], email)
+    store.add_assignment(email, title, due)
+    for hours in blocks:
+        store.add_free_time(email, *free(*hours))
+
+
+def suggestion(email):
+    return db_utils.get_suggestions_for_email(email)
+
+
+def test_put_tracks_dependencies_and_evicts_oldest():
+    cache = SuggestionCache(max_entries=2)
+    cache.put("a", 1, ["x@x.com"], ["hw"])
+    cache.put("b", 2, ["y@x.com"], ["hw"])
+    cache.put("c", 3, ["y@x.com"], ["quiz"])
+    assert "a" not in cache and len(cache) == 2
+
+    cache.invalidate_user("y@x.com")
+    assert len(cache) == 0
+    assert cache.get("b", "gone") == "gone"
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_invalidation_listeners_get_the_stale_users():
+    cache = SuggestionCache()
+    stale = []
+    cache.add_invalidation_listener(stale.append)
+    cache.put("a", 1, ["x@x.com", "y@x.com"], ["hw"])
+    cache.put("b", 2, ["z@x.com"], ["quiz"])
+
+    cache.invalidate_assignment("hw")
+    cache.invalidate_assignment("hw")
+    assert stale == [{"x@x.com", "y@x.com"}]
+    cache.clear()
+    assert stale[-1] == {"z@x.com"}
+
+
+def test_cached_suggestion_is_reused(store):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    first = suggestion("a@x.com")
+    assert [(s["start"], s["end"]) for s in first] == [free(10, 12)]
+
+    hits = suggestion_cache.hits
+    assert suggestion("a@x.com") == first
+    assert suggestion_cache.hits == hits + 1
+
+
+def test_free_time_of_a_cohort_member_invalidates(store):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    suggestion("a@x.com")
+
+    store.add_free_time("b@x.com", *free(14, 20))
+    store.add_free_time("a@x.com", *free(14, 20))
+    assert [(s["start"], s["end"]) for s in suggestion("a@x.com")] == [free(14, 20)]
+
+
+def test_unrelated_writes_keep_the_entry(store):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    enroll(store, "c@x.com", title="Essay 2", blocks=((0, 23),))
+    suggestion("a@x.com")
+    entries = len(suggestion_cache)
+
+    store.add_free_time("c@x.com", *free(1, 2, day=5))
+    assert len(suggestion_cache) == entries
+
+
+def test_new_classmate_invalidates(store):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    assert suggestion("a@x.com")[0]["group_size"] == 2
+
+    enroll(store, "c@x.com", blocks=((10, 11),))
+    assert suggestion("a@x.com")[0]["group_size"] == 3
+
+
+def test_fuzzy_copy_invalidates_its_near_duplicates(store):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    assert suggestion("a@x.com")[0]["group_size"] == 2
+
+    # Same work under another course suffix: a new id, but the same cohort
+    enroll(store, "c@x.com", title="Homework 7 [CS 70 FA25]", blocks=((10, 11),))
+    assert suggestion("a@x.com")[0]["group_size"] == 3
+
+
+def test_exact_matching_keeps_copies_apart(store, exact_matching):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    enroll(store, "c@x.com", title="Homework 7 [CS 70 FA25]", blocks=((10, 11),))
+    assert suggestion("a@x.com")[0]["group_size"] == 2
+
+
+def test_replacing_the_store_clears_the_cache(store):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    suggestion("a@x.com")
+    assert len(suggestion_cache)
+
+    db_utils.save_data({"users": {}})
+    assert len(suggestion_cache) == 0
+    assert suggestion("a@x.com") is None
+
+
+@pytest.mark.parametrize("engine", ["sweep", "grid"])
+def test_cache_keys_include_the_engine(store, engine):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    assert suggestion("a@x.com") is not None
+    result = db_utils.get_suggestions_for_email("a@x.com", engine=engine)
+    assert result[0]["group_size"] == 2
+
+
+def test_fuzzy_copy_after_a_removal_invalidates(store):
+    enroll(store, "a@x.com")
+    enroll(store, "b@x.com", blocks=((10, 13),))
+    enroll(store, "c@x.com", title="Essay 2")
+    suggestion("a@x.com")
+
+    # Removing one enrollment must not stop near-duplicate invalidation
+    store.remove_assignment("c@x.com", "Essay 2", DUE)
+    enroll(store, "d@x.com", title="Homework 7 [CS 70 FA25]", blocks=((10, 11),))
+    assert suggestion("a@x.com")[0]["group_size"] == 3